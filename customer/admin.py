@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import KOMForm, KOMLineItem, KOMEquipmentRequired
+from .models import KOMForm, KOMLineItem, KOMEquipmentRequired, KOMFileLocation, KOMImportJob, KOMSummary
 
 
 class KOMLineItemInline(admin.TabularInline):
@@ -20,6 +20,15 @@ class KOMFormAdmin(admin.ModelAdmin):
     date_hierarchy = 'proposal_date'
     inlines = [KOMLineItemInline, KOMEquipmentRequiredInline]
     readonly_fields = ['created_at', 'updated_at', 'created_by', 'source_file']
+    actions = ['export_tables']
+    
+    @admin.action(description='Export selected KOM forms as CSV tables (.zip)')
+    def export_tables(self, request, queryset):
+        from django.http import StreamingHttpResponse
+        from .kom_tables import iter_csv_zip
+        response = StreamingHttpResponse(iter_csv_zip(queryset), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="kom_tables.zip"'
+        return response
 
 
 @admin.register(KOMLineItem)
@@ -34,3 +43,27 @@ class KOMEquipmentRequiredAdmin(admin.ModelAdmin):
     list_display = ['kom_form', 'equipment_type', 'qty', 'kn_number', 'description']
     list_filter = ['equipment_type', 'kom_form']
     search_fields = ['equipment_type', 'kn_number', 'description']
+
+
+@admin.register(KOMImportJob)
+class KOMImportJobAdmin(admin.ModelAdmin):
+    list_display = ['source_file', 'status', 'kom_form', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['source_file', 'error']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(KOMFileLocation)
+class KOMFileLocationAdmin(admin.ModelAdmin):
+    list_display = ['kom_form', 'path', 'missing', 'verified_at']
+    list_filter = ['missing']
+    search_fields = ['path', 'sha256']
+    readonly_fields = ['verified_at']
+
+
+@admin.register(KOMSummary)
+class KOMSummaryAdmin(admin.ModelAdmin):
+    list_display = ['period', 'industry', 'sales_rep', 'equipment_type', 'form_count', 'capital_sell_price',
+                    'capital_net_revenue']
+    list_filter = ['period', 'equipment_type']
+    search_fields = ['industry', 'sales_rep']
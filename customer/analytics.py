@@ -0,0 +1,156 @@
+"""
+KOM analytics: capital, install and labor totals rolled up into KOMSummary rows keyed by
+(month, industry, sales rep, equipment type).
+Only the latest revision of each job is counted (see kom_diff.revision_sort_key), so a job
+quoted three times is not summed three times. Imports refresh just the months they touch;
+refresh_kom_summary() with no periods rebuilds the whole table.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .kom_diff import revision_sort_key
+from .models import KOMEquipmentRequired, KOMForm, KOMSummary
+
+# KOMForm columns summed into KOMSummary
+SUMMARY_FIELDS = (
+    'capital_sell_price', 'capital_equip_cost', 'capital_freight', 'capital_net_revenue',
+    'install_sell_price', 'install_net_revenue',
+    'labor_pkg', 'labor_fab', 'labor_wiring',
+)
+SUMMARY_KEYS = ('period', 'industry', 'sales_rep', 'equipment_type')
+
+
+def kom_period(kom_form):
+    """Month a form is reported in: its proposal date, or its import date when that is missing"""
+    day = kom_form.proposal_date or kom_form.created_at.date()
+    return date(day.year, day.month, 1)
+
+
+def _next_month(period):
+    return date(period.year + period.month // 12, period.month % 12 + 1, 1)
+
+
+def _in_periods(periods):
+    """Filter for forms reported in any of the given months (see kom_period)"""
+    condition = Q(pk__in=[])
+    for period in periods:
+        month = Q(proposal_date__gte=period, proposal_date__lt=_next_month(period))
+        # A plain range on created_at (in UTC, like kom_period) rather than created_at__date,
+        # which SQLite evaluates row by row
+        start = datetime.combine(period, time.min, tzinfo=timezone.utc)
+        end = datetime.combine(_next_month(period), time.min, tzinfo=timezone.utc)
+        imported = Q(proposal_date__isnull=True, created_at__gte=start, created_at__lt=end)
+        condition |= month | imported
+    return condition
+
+
+# Just what picking the latest revision needs (revision_sort_key and kom_period work on it)
+_Revision = namedtuple('_Revision', 'pk job_number proposal_number proposal_date created_at')
+
+
+def _latest_revisions(kom_forms):
+    """
+    The latest revision of each job number in the kom_forms queryset, as _Revision tuples
+    (forms without a job number all count)
+    """
+    latest = {}
+    for revision in kom_forms.values_list(*_Revision._fields).iterator(chunk_size=5000):
+        revision = _Revision(*revision)
+        key = revision.job_number or ('', revision.pk)
+        if key not in latest or revision_sort_key(revision) >= revision_sort_key(latest[key]):
+            latest[key] = revision
+    return latest.values()
+
+
+def summarize(kom_forms, equipment_types):
+    """
+    Unsaved KOMSummary rows for the given forms; equipment_types maps form pk to the set of
+    equipment types it requires
+    """
+    rows = {}
+    for kom_form in kom_forms:
+        period = kom_period(kom_form)
+        for equipment_type in ['', *sorted(equipment_types.get(kom_form.pk, ()))]:
+            key = (period, kom_form.industry.strip(), kom_form.sales_rep.strip(), equipment_type)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = KOMSummary(**dict(zip(SUMMARY_KEYS, key)))
+                for name in SUMMARY_FIELDS:
+                    setattr(row, name, Decimal(0))
+            row.form_count += 1
+            for name in SUMMARY_FIELDS:
+                value = getattr(kom_form, name)
+                if value is not None:
+                    setattr(row, name, getattr(row, name) + value)
+    return [rows[key] for key in sorted(rows)]
+
+
+def affected_periods(kom_forms):
+    """
+    Months whose totals change when kom_forms are saved or deleted: their own months, plus the
+    months of other revisions of the same jobs (which may stop or start being the latest)
+    """
+    periods = {kom_period(kom_form) for kom_form in kom_forms}
+    job_numbers = {kom_form.job_number for kom_form in kom_forms if kom_form.job_number}
+    if job_numbers:
+        for proposal_date, created_at in KOMForm.objects.filter(job_number__in=job_numbers).values_list(
+                'proposal_date', 'created_at').distinct():
+            periods.add(kom_period(_Revision(None, None, None, proposal_date, created_at)))
+    return periods
+
+
+def refresh_kom_summary(periods=None):
+    """
+    Recompute the KOMSummary rows of the given months (every month when periods is None).
+    Returns the number of rows written.
+    """
+    kom_forms = KOMForm.objects.all()
+    summaries = KOMSummary.objects.all()
+    if periods is not None:
+        periods = set(periods)
+        if not periods:
+            return 0
+        # Every revision of the jobs reported in these months, so the latest one can be picked
+        job_numbers = KOMForm.objects.filter(_in_periods(periods)).exclude(job_number='').values('job_number')
+        kom_forms = kom_forms.filter(Q(job_number__in=job_numbers) | (Q(job_number='') & _in_periods(periods)))
+        summaries = summaries.filter(period__in=periods)
+    pks = [revision.pk for revision in _latest_revisions(kom_forms)
+           if periods is None or kom_period(revision) in periods]
+    # Summed columns are only read for the forms that count
+    fields = ('job_number', 'proposal_date', 'created_at', 'industry', 'sales_rep', *SUMMARY_FIELDS)
+    kom_forms = []
+    for start in range(0, len(pks), 500):
+        kom_forms.extend(KOMForm.objects.filter(pk__in=pks[start:start + 500]).only(*fields))
+
+    equipment = KOMEquipmentRequired.objects.exclude(equipment_type='')
+    if periods is not None:
+        equipment = equipment.filter(kom_form__in=pks)
+    equipment_types = {}
+    for kom_form_id, equipment_type in equipment.values_list('kom_form_id', 'equipment_type').distinct():
+        equipment_types.setdefault(kom_form_id, set()).add(equipment_type)
+
+    rows = summarize(kom_forms, equipment_types)
+    with transaction.atomic():
+        summaries.delete()
+        KOMSummary.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def summary_totals(summaries, group_by):
+    """
+    Totals of KOMSummary rows grouped by one key ('period', 'industry', 'sales_rep' or
+    'equipment_type'), as dicts with the summed fields and the capital margin in percent
+    """
+    totals = []
+    for row in summaries.values(group_by).annotate(
+        form_count=Sum('form_count'), **{name: Sum(name) for name in SUMMARY_FIELDS}
+    ).order_by(group_by):
+        sell_price = row['capital_sell_price'] or 0
+        row['capital_margin'] = row['capital_net_revenue'] / sell_price * 100 if sell_price else None
+        row['labor_hours'] = (row['labor_pkg'] or 0) + (row['labor_fab'] or 0) + (row['labor_wiring'] or 0)
+        totals.append(row)
+    return totals
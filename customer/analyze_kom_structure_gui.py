@@ -3,207 +3,16 @@ GUI tool to analyze and compare KOM Excel file structures
 Uses tkinter for file selection and results display
 """
 import os
-import sys
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox, ttk
-from collections import defaultdict
-from openpyxl import load_workbook
 import json
 from datetime import datetime
 
-
-def get_cell_value(ws, row, col):
-    """Safely get cell value"""
-    try:
-        val = ws.cell(row=row, column=col).value
-        if val is None:
-            return ''
-        return str(val).strip()
-    except:
-        return ''
-
-
-def find_section_headers(ws, max_row=200):
-    """Find all section headers in the worksheet"""
-    sections = []
-    for row in range(1, max_row):
-        for col in range(1, 15):
-            val = get_cell_value(ws, row, col)
-            if val:
-                val_upper = val.upper()
-                section_keywords = [
-                    'TO BE COMPLETED BY SALES',
-                    'TO BE COMPLETED BY APPS',
-                    'TO BE COMPLETED BY ENG',
-                    'TO BE COMPLETED BY ACCT',
-                    'BILL TO',
-                    'SHIP TO',
-                    'TAX',
-                    'PAYMENT MILESTONES',
-                    'SHIPPING',
-                    'SPECIFICATIONS',
-                    'APPROVAL PRINTS',
-                    'EQUIPMENT',
-                    'HTR - 1',
-                    'HTR - 2',
-                    'STK ECON',
-                    'STACK',
-                    'HR',
-                    'TANKS',
-                    'PUMPS',
-                    'STEAM HEATERS',
-                    'SOFTENER',
-                    'PANEL',
-                    'OTHER',
-                    'UTILITIES',
-                    'LABOR HOURS',
-                    'CAPITAL',
-                    'INSTALL',
-                    'PROJECT NAME',
-                ]
-                for keyword in section_keywords:
-                    if keyword in val_upper:
-                        sections.append({
-                            'row': row,
-                            'col': col,
-                            'text': val,
-                            'keyword': keyword
-                        })
-                        break
-    return sections
-
-
-def analyze_tanks_section(ws, tanks_row):
-    """Analyze the tanks section structure"""
-    tanks_data = []
-    for row in range(tanks_row, tanks_row + 10):
-        marker = get_cell_value(ws, row, 1)
-        if marker and marker.startswith('#'):
-            tank_info = {
-                'row': row,
-                'marker': marker,
-                'cells': {}
-            }
-            for col in range(1, 16):
-                val = get_cell_value(ws, row, col)
-                if val and val not in ['', '#1:', '#2:', '#3:', 'Type:', 'Dia (in):', 'Ht (ft):', 'GA:', "Mat'l:"]:
-                    tank_info['cells'][col] = val
-            tanks_data.append(tank_info)
-    return tanks_data
-
-
-def analyze_line_items_section(ws, line_items_start_row):
-    """Analyze line items structure"""
-    line_items = []
-    for row in range(line_items_start_row, line_items_start_row + 20):
-        item_num = get_cell_value(ws, row, 1)
-        if item_num and item_num not in ['ITEM', 'DESCRIPTION', 'TO BE COMPLETED BY APPS', 'LABOR HOURS']:
-            if item_num and not item_num.endswith(':') and len(item_num) > 0:
-                item_data = {
-                    'row': row,
-                    'item_number': item_num,
-                    'description_col': None,
-                    'value_cols': []
-                }
-                desc = get_cell_value(ws, row, 4)
-                if desc:
-                    item_data['description_col'] = 4
-                    item_data['description'] = desc
-                
-                for col in range(6, 13):
-                    val = ws.cell(row=row, column=col).value
-                    if val is not None:
-                        try:
-                            float(str(val).replace('$', '').replace(',', ''))
-                            item_data['value_cols'].append({
-                                'col': col,
-                                'value': val
-                            })
-                        except:
-                            pass
-                
-                if item_data['value_cols']:
-                    line_items.append(item_data)
-    return line_items
-
-
-def analyze_file(file_path, progress_callback=None):
-    """Analyze a single KOM Excel file"""
-    if progress_callback:
-        progress_callback(f"Analyzing: {os.path.basename(file_path)}")
-    
-    try:
-        wb = load_workbook(file_path, data_only=True)
-        ws = wb.active
-        
-        analysis = {
-            'filename': os.path.basename(file_path),
-            'filepath': file_path,
-            'max_row': ws.max_row,
-            'max_col': ws.max_column,
-            'sections': find_section_headers(ws),
-            'tanks': [],
-            'line_items': [],
-            'sample_data': {}
-        }
-        
-        for section in analysis['sections']:
-            if 'TANKS' in section['keyword']:
-                tanks_data = analyze_tanks_section(ws, section['row'])
-                analysis['tanks'] = tanks_data
-        
-        for section in analysis['sections']:
-            if 'TO BE COMPLETED BY APPS' in section['keyword']:
-                line_items = analyze_line_items_section(ws, section['row'] + 2)
-                analysis['line_items'] = line_items
-        
-        analysis['sample_data'] = {
-            'proposal_number': get_cell_value(ws, 2, 3),
-            'htr1_type': get_cell_value(ws, 61, 7),
-            'htr1_size': get_cell_value(ws, 63, 3),
-            'labor_pkg': get_cell_value(ws, 143, 4),
-            'equipment_qty': get_cell_value(ws, 143, 7),
-        }
-        
-        return analysis
-        
-    except Exception as e:
-        if progress_callback:
-            progress_callback(f"ERROR: {str(e)}")
-        return None
-
-
-def compare_files(analyses):
-    """Compare multiple file analyses"""
-    if not analyses:
-        return {}
-    
-    comparison = {
-        'section_positions': defaultdict(list),
-        'tank_columns': defaultdict(set),
-        'value_columns': defaultdict(set),
-        'desc_columns': set(),
-    }
-    
-    for analysis in analyses:
-        for section in analysis['sections']:
-            comparison['section_positions'][section['keyword']].append({
-                'file': analysis['filename'],
-                'row': section['row'],
-                'col': section['col']
-            })
-        
-        for tank in analysis['tanks']:
-            for col in tank['cells'].keys():
-                comparison['tank_columns'][tank['marker']].add(col)
-        
-        for item in analysis['line_items']:
-            if item['description_col']:
-                comparison['desc_columns'].add(item['description_col'])
-            for val in item['value_cols']:
-                comparison['value_columns'][val['col']].add(analysis['filename'])
-    
-    return comparison
+try:
+    from customer.kom_structure import analyze_file, compare_files
+except ImportError:
+    # Run as a script from the customer directory
+    from kom_structure import analyze_file, compare_files
 
 
 class KOMAnalyzerGUI:
@@ -0,0 +1,129 @@
+"""Background KOM imports: uploads are saved as KOMImportJob rows and processed by a local thread pool"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import KOMForm, KOMImportJob
+from .services import parse_kom_cached, save_parsed_kom
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# Jobs this process already resubmitted (see recover_stale_job)
+_resubmitted = set()
+
+
+def get_executor():
+    """Thread pool shared by all requests in this process, created on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'KOM_IMPORT_WORKERS', 2),
+            thread_name_prefix='kom-import',
+        )
+    return _executor
+
+
+def submit_import_job(job):
+    """
+    Queue a job for the worker pool once the current transaction commits.
+    With KOM_IMPORT_WORKERS = 0 the job runs immediately in the calling thread.
+    """
+    if getattr(settings, 'KOM_IMPORT_WORKERS', 2) <= 0:
+        run_import_job(job.pk)
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+
+
+def _run_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        # Worker threads get their own database connections; don't leak them
+        connections.close_all()
+
+
+def recover_stale_job(job):
+    """
+    Rescue a job the worker pool lost, e.g. to a server restart or an on_commit callback
+    that never ran, so its progress page does not poll forever.
+    A job still queued after KOM_IMPORT_JOB_TIMEOUT seconds is submitted again (the claim in
+    run_import_job keeps it from running twice); one stuck parsing or saving that long is failed.
+    """
+    if job.is_finished:
+        return
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'KOM_IMPORT_JOB_TIMEOUT', 300))
+    if job.status == 'queued' and job.created_at < cutoff:
+        if job.pk not in _resubmitted:
+            _resubmitted.add(job.pk)
+            logger.warning('Resubmitting KOM import job %s, queued since %s', job.pk, job.created_at)
+            submit_import_job(job)
+            job.refresh_from_db()
+    elif job.status != 'queued' and job.started_at and job.started_at < cutoff:
+        if KOMImportJob.objects.filter(pk=job.pk, status=job.status).update(
+                status='failed', error='The import was interrupted, please upload the file again.',
+                finished_at=timezone.now()):
+            logger.warning('KOM import job %s stuck %s since %s, marked failed', job.pk, job.status, job.started_at)
+        job.refresh_from_db()
+
+
+class JobInterrupted(Exception):
+    """The job's status changed under the worker, e.g. recover_stale_job failed it"""
+
+
+def set_status(job, status, expected, **fields):
+    """
+    Save a status change (and any other fields) without touching the rest of the row, only if the
+    job is still in the expected status. Raises JobInterrupted otherwise.
+    """
+    if not KOMImportJob.objects.filter(pk=job.pk, status=expected).update(status=status, **fields):
+        raise JobInterrupted(f'KOM import job {job.pk} is no longer {expected}')
+    job.status = status
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run_import_job(job_id):
+    """Parse and save one queued job, recording progress and the outcome on the job"""
+    # Claim the job so it is never processed twice
+    if not KOMImportJob.objects.filter(pk=job_id, status='queued').update(status='parsing', started_at=timezone.now()):
+        return
+    job = KOMImportJob.objects.get(pk=job_id)
+
+    try:
+        if not os.path.isfile(job.file_path):
+            raise Exception(f"Cannot save KOM: File does not exist at {job.file_path}")
+        parsed_data = parse_kom_cached(job.file_path, job.file_sha256)
+
+        set_status(job, 'saving', expected='parsing')
+        job_messages = []
+        previous = KOMForm.objects.filter(file_sha256=job.file_sha256).exclude(file_sha256='').order_by('-created_at').first()
+        if previous:
+            job_messages.append(['info', f'This file was already imported as Proposal #{previous.proposal_number} on {previous.created_at:%Y-%m-%d}.'])
+
+        # The form is only kept if the job is still saving once it is written
+        with transaction.atomic():
+            kom_form = save_parsed_kom(
+                parsed_data,
+                created_by=job.created_by,
+                source_file=job.source_file,
+                file_path=job.file_path,
+                file_sha256=job.file_sha256,
+            )
+            if not kom_form.job_number:
+                job_messages.append(['warning', f'Could not extract 5-digit job number from proposal number: {kom_form.proposal_number}'])
+            job_messages.extend(['warning', f'Parser Warning: {warning}'] for warning in parsed_data.get('_validation_warnings', []))
+            set_status(job, 'succeeded', expected='saving', kom_form=kom_form, messages=job_messages,
+                       finished_at=timezone.now())
+    except JobInterrupted as e:
+        # Already failed (see recover_stale_job); saving now would leave a form the user was told failed
+        logger.warning('%s, stopped without saving the form', e)
+    except Exception as e:
+        logger.exception('KOM import job %s failed', job_id)
+        KOMImportJob.objects.filter(pk=job.pk, status=job.status).update(
+            status='failed', error=str(e), finished_at=timezone.now())
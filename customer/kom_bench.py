@@ -0,0 +1,314 @@
+"""
+Parser benchmarks: synthetic KOM workbooks and timings for parse_kom_excel.
+
+The workbooks follow the KOM AND OC FORM template with the layout variants
+recorded in KOM-Report.json (the APPS / LABOR HOURS / CAPITAL sections move
+between files, equipment columns are sometimes shifted one to the right) and
+with 1-5 tanks and 0-4 pumps. Results are plain dicts so they can be written
+to and compared against a JSON baseline (see the bench_kom command).
+"""
+import os
+import platform
+import random
+import time
+import tracemalloc
+
+from openpyxl import Workbook
+
+from .utils import KOM_SECTION_PLANS, KOMSheet, load_kom_grid, parse_kom_excel, run_parse_plan
+
+
+class KOMLayout:
+    """Section rows of one KOM template variant"""
+
+    def __init__(self, name, apps_row, labor_row, capital_row, line_items):
+        self.name = name
+        self.apps_row = apps_row
+        self.labor_row = labor_row
+        self.capital_row = capital_row
+        self.line_items = line_items
+
+
+# Section rows seen in KOM-Report.json, one layout per distinct combination
+KOM_LAYOUTS = [
+    KOMLayout('standard', 125, 141, 147, 13),
+    KOMLayout('apps-127', 127, 141, 147, 9),
+    KOMLayout('short', 125, 133, 139, 1),
+    KOMLayout('apps-122', 122, 134, 140, 6),
+    KOMLayout('apps-123', 123, 137, 143, 11),
+    KOMLayout('labor-137', 125, 137, 143, 7),
+    KOMLayout('labor-138', 125, 138, 144, 9),
+]
+
+
+def bench_variants():
+    """(name, layout, tanks, pumps, shifted_equipment) for every synthetic workbook"""
+    variants = []
+    for i, layout in enumerate(KOM_LAYOUTS):
+        tanks = 1 + i % 5
+        pumps = i % 5
+        shifted = i % 2 == 1
+        name = f"{layout.name}-t{tanks}-p{pumps}{'-shifted' if shifted else ''}"
+        variants.append((name, layout, tanks, pumps, shifted))
+    return variants
+
+
+def generate_kom_workbook(path, layout, tanks=3, pumps=4, shifted_equipment=False, seed=0):
+    """Write a filled-in KOM workbook with the given layout to path"""
+    rnd = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+
+    def put(row, col, value):
+        ws.cell(row=row, column=col, value=value)
+
+    job = str(35000 + rnd.randrange(1000))
+
+    # TO BE COMPLETED BY SALES
+    put(1, 1, 'TO BE COMPLETED BY SALES')
+    put(2, 1, 'Proposal #:')
+    put(2, 3, job)
+    put(2, 5, 'Proposal Date:')
+    put(2, 6, '9/19/25')
+    put(2, 7, 'Sales Rep:')
+    put(2, 8, 'JOHN DOE')
+    put(2, 10, 'Date of OC:')
+    put(2, 11, '9/29/25')
+    put(4, 1, 'Industry:')
+    put(4, 3, 'FOOD')
+    put(4, 5, 'POULTRY')
+    put(4, 7, 'Discount:')
+    put(4, 8, f'{rnd.randrange(10)}%')
+    put(4, 10, 'PO#:')
+    put(4, 11, str(rnd.randrange(10 ** 9, 10 ** 10)))
+    put(6, 4, '100%')
+    put(6, 6, 'JOHN DOE')
+    put(6, 10, f'${rnd.randrange(10000, 50000):,}.00')
+
+    # BILL TO / SHIP TO
+    put(10, 4, 'BILL TO:')
+    put(10, 7, 'SHIP TO:')
+    for col, prefix in ((2, 'Bill'), (6, 'Ship')):
+        put(12, col, f'{prefix} Name')
+        put(14, col, '704-555-0100')
+        put(16, col, f'{prefix.lower()}@example.com')
+        put(18, col, f'{prefix} Company')
+        put(20, col, f'{rnd.randrange(100, 999)} {prefix} Street')
+    put(22, 3, 'Bill City')
+    put(24, 3, 'WI')
+    put(24, 4, '53964')
+    put(22, 6, 'Ship City')
+    put(24, 6, 'GA')
+    put(24, 9, '30643')
+
+    # Tax and payment milestones
+    put(26, 1, 'Tax Exempt?')
+    put(26, 4, 'NO')
+    put(26, 8, 'YES')
+    put(28, 1, 'TO BE COMPLETED BY ACCT')
+    put(30, 4, 'YES')
+    put(32, 1, 'Payment Milestones')
+    for i in range(1, 4):
+        put(32 + i, 2, f'#{i}:')
+        put(32 + i, 3, f'Milestone {i}')
+        put(32 + i, 4, 100 / 3)
+        put(32 + i, 5, 'Net 30')
+
+    # Project details, shipping and specifications
+    put(41, 1, 'TO BE COMPLETED BY SALES')
+    put(43, 3, 'Consultant Name')
+    put(43, 6, 'Contractor Name')
+    put(45, 3, 'ASAP')
+    put(48, 3, 'PP&A')
+    put(48, 10, 'Air Freight')
+    put(53, 4, 'NO')
+    put(53, 10, 'YES')
+    put(57, 7, 'LL & Mech: 10/17/25 ; Elect: 10/22/25')
+
+    # Heaters: HTR - 1 always, HTR - 2 on every other seed
+    heaters = (61, 65) if seed % 2 else (61,)
+    for n, row in enumerate(heaters, start=1):
+        put(row, 1, f'HTR - {n}')
+        put(row, 4, 'Qty:')
+        put(row, 5, 1)
+        put(row, 6, 'Type:')
+        put(row, 7, 'TE-100+, NSF')
+        put(row, 9, 'Emissions:')
+        put(row, 10, 'LO NOX - 30PPM')
+        put(row + 2, 2, 'Size:')
+        put(row + 2, 3, str(rnd.randrange(2, 25)))
+        put(row + 2, 4, 'x106BTU/hr')
+        put(row + 2, 5, 'Pump/Grav:')
+        put(row + 2, 6, rnd.choice(['PUMP', 'GRAV']))
+        put(row + 2, 7, "Mat'l:")
+        put(row + 2, 8, rnd.choice(['304', '316']))
+    put(73, 1, 'HR')
+    put(73, 3, 5)
+    put(73, 5, 24)
+
+    # TANKS: one marker row every other row; more than three tanks push PUMPS down
+    tanks_row = 75
+    put(tanks_row, 1, 'TANKS')
+    for i in range(1, tanks + 1):
+        row = tanks_row + 2 * i
+        for col, value in enumerate([f'#{i}:', 'Type:', rnd.choice(['HW', 'CW', 'ST']),
+                                     'Dia (in):', rnd.choice([72, 84, 90, 96, 132]),
+                                     'Ht (ft):', rnd.randrange(6, 20), 'GA:', 'STD',
+                                     "Mat'l:", rnd.choice(['304', '316'])], start=1):
+            put(row, col, value)
+
+    pumps_row = tanks_row + 2 * max(tanks, 3) + 2
+    put(pumps_row, 1, 'PUMPS')
+    put(pumps_row + 1, 5, 'Packaging:')
+    put(pumps_row + 1, 6, 'STANDARD')
+    put(pumps_row + 1, 7, 'Piping Material:')
+    put(pumps_row + 1, 8, '304')
+    for i in range(1, pumps + 1):
+        row = pumps_row + 2 * i
+        put(row, 1, f'#{i}:')
+        for col, value in ((4, 'Type:'), (5, rnd.choice(['HTR DISCH', 'HW', 'RECIRC'])),
+                           (6, 'Qty:'), (7, rnd.randrange(1, 3)),
+                           (8, 'Flow (gpm):'), (9, rnd.randrange(100, 800)),
+                           (10, 'TDH (ft):'), (11, rnd.randrange(40, 160))):
+            put(row, col, value)
+
+    # Steam heaters, panels, utilities and notes
+    put(94, 4, '12x120')
+    put(94, 6, '304')
+    put(94, 9, 'Ball Valve')
+    put(102, 3, 1)
+    put(102, 6, 'YES-COMPACT 5069')
+    put(104, 1, 'OTHER')
+    put(105, 2, 'Vent Condenser')
+    put(109, 3, '480/3/60')
+    put(109, 6, 'NG')
+    put(109, 8, '2-5')
+    put(115, 1, 'OTHER INFO')
+    put(116, 3, 'Synthetic benchmark workbook')
+
+    # TO BE COMPLETED BY APPS: header, column titles, then one row per line item
+    put(layout.apps_row, 1, 'TO BE COMPLETED BY APPS')
+    put(layout.apps_row + 1, 1, 'ITEM')
+    put(layout.apps_row + 1, 4, 'DESCRIPTION')
+    for i in range(1, layout.line_items + 1):
+        row = layout.apps_row + 1 + i
+        put(row, 1, f'{job}-{i:02d}')
+        put(row, 4, rnd.choice(['18 MMBTU DCWH, TE+, Pumped', 'Heater FGR Ducting', 'Heater Inlet',
+                                'Hot Water Makeup Valve Nest', "72\"x16' Hot water Tank"]))
+        put(row, 6, rnd.randrange(1000, 70000))
+        if rnd.random() < 0.3:
+            put(row, 9, rnd.randrange(1000, 10000))
+
+    # LABOR HOURS with the equipment required rows alongside
+    put(layout.labor_row, 1, 'LABOR HOURS')
+    for offset, label in enumerate(['HR:', 'Pkg:', 'Fab:', 'Wiring:'], start=1):
+        put(layout.labor_row + offset, 3, label)
+        put(layout.labor_row + offset, 4, '-' if offset == 1 else round(rnd.uniform(50, 250), 1))
+    qty_col = 8 if shifted_equipment else 7
+    for offset, (kn, description) in enumerate([('890-01-012', 'BURNER, GAS, EB-7'),
+                                                 ('892-01-249', 'BLOWER, 2012S, 30HP, CCWBH'),
+                                                 ('840-01-002', 'RING, PACKG CASCADE MNI RNG #3')], start=2):
+        put(layout.labor_row + offset, qty_col, rnd.randrange(1, 200))
+        put(layout.labor_row + offset, qty_col + 1, kn)
+        put(layout.labor_row + offset, qty_col + 2, description)
+
+    # CAPITAL and INSTALL
+    put(layout.capital_row, 1, 'CAPITAL')
+    put(layout.capital_row, 6, 'INSTALL')
+    for offset, (label, col) in {2: ('Sell Price:', 3), 4: ('Equip Cost:', 3), 6: ('Freight:', 3),
+                                  8: ('StartUp Cost:', 4), 9: ('Protect Cost', 3),
+                                  10: ('Net Revenue:', 3)}.items():
+        put(layout.capital_row + offset, 1, label)
+        put(layout.capital_row + offset, col, f'${rnd.randrange(1000, 400000):,}.00')
+
+    # TO BE COMPLETED BY ENG
+    put(layout.capital_row + 12, 1, 'TO BE COMPLETED BY ENG')
+    for row in (161, 163, 165):
+        for col in (3, 6, 9):
+            put(row, col, rnd.choice(['YES', 'NO']))
+
+    wb.save(path)
+    return path
+
+
+def generate_bench_workbooks(directory):
+    """Write one workbook per bench variant into directory; returns [(name, path)]"""
+    os.makedirs(directory, exist_ok=True)
+    workbooks = []
+    for seed, (name, layout, tanks, pumps, shifted) in enumerate(bench_variants()):
+        path = os.path.join(directory, f'{name}.xlsx')
+        generate_kom_workbook(path, layout, tanks, pumps, shifted, seed=seed)
+        workbooks.append((name, path))
+    return workbooks
+
+
+def _best_ms(func, repeat):
+    """Fastest of repeat runs of func() in milliseconds (least disturbed by other load, as timeit does)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 4)
+
+
+def bench_workbook(path, repeat=20):
+    """Load, per-section and total parse times (best ms) and peak parse memory (KB) for one workbook"""
+    grid = load_kom_grid(path)
+    sections = {}
+    for title, plan in KOM_SECTION_PLANS:
+        # A fresh sheet each time, so the section pays for the anchors it looks up
+        sections[title] = _best_ms(lambda: run_parse_plan(KOMSheet(grid, []), plan, {}), repeat)
+
+    tracemalloc.start()
+    try:
+        parse_kom_excel(path, profile=False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'load_ms': _best_ms(lambda: load_kom_grid(path), repeat),
+        'total_ms': _best_ms(lambda: parse_kom_excel(path, profile=False), repeat),
+        'peak_kb': round(peak / 1024, 1),
+        'sections': sections,
+    }
+
+
+def run_benchmarks(workbooks, repeat=20):
+    """Benchmark [(name, path)] and return the results with a mean over all workbooks"""
+    results = {name: bench_workbook(path, repeat) for name, path in workbooks}
+    count = len(results)
+    summary = {
+        key: round(sum(result[key] for result in results.values()) / count, 4)
+        for key in ('load_ms', 'total_ms', 'peak_kb')
+    }
+    summary['sections'] = {
+        title: round(sum(result['sections'][title] for result in results.values()) / count, 4)
+        for title, _ in KOM_SECTION_PLANS
+    }
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'summary': summary,
+        'workbooks': results,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25):
+    """
+    Regressions against a baseline as (what, baseline, current) tuples.
+    Load and total time and peak memory are checked per workbook and overall;
+    section times are too small to gate on and are only reported.
+    """
+    regressions = []
+    pairs = [('summary', results['summary'], baseline.get('summary', {}))]
+    pairs += [(name, result, baseline.get('workbooks', {}).get(name, {}))
+              for name, result in results['workbooks'].items()]
+    for name, current, expected in pairs:
+        for key in ('load_ms', 'total_ms', 'peak_kb'):
+            if key in expected and current[key] > expected[key] * (1 + tolerance):
+                regressions.append((f'{name} {key}', expected[key], current[key]))
+    return regressions
@@ -0,0 +1,155 @@
+"""
+Compact storage for KOMForm.raw_data and flat_data.
+parse_kom_excel output repeats ~180 long key names in every row. CompactJSONField stores
+it as zlib-compressed JSON of a versioned, positional record instead:
+
+    {"v": 1, "f": [values in RAW_DATA_LAYOUTS[1]['fields'] order], "m": [indexes of absent keys],
+     "line_items": [[values in row order] or {row}, ...], "equipment_required": [...],
+     "x": {any other keys}}
+
+Layouts are frozen per version: when KOM_SCHEMA gains or loses fields, add a new version
+(and bump RAW_DATA_VERSION) instead of editing an existing one, so stored rows keep decoding.
+Decoding is lossless: absent keys stay absent and rows with other keys are stored as dicts.
+flat_data (see customer.kom_diff) goes through the same record: its top-level fields are
+positional and its dotted row keys land in "x", where compression takes care of the repetition.
+"""
+import json
+import zlib
+
+from django.db import models
+
+RAW_DATA_VERSION = 1
+
+RAW_DATA_LAYOUTS = {
+    1: {
+        'fields': (
+            'proposal_number', 'proposal_date', 'sales_rep', 'date_of_oc', 'industry', 'industry_subcategory',
+            'discount', 'po_number', 'comm_1_inside_percent', 'comm_1_inside_name', 'comm_2_inside_percent',
+            'comm_2_inside_name', 'comm_outside_amount', 'comm_outside_name', 'consultant', 'contractor_name',
+            'desired_delivery', 'bill_to_name', 'bill_to_phone', 'bill_to_email', 'bill_to_company',
+            'bill_to_address', 'bill_to_city', 'bill_to_state', 'bill_to_zip', 'ship_to_name', 'ship_to_phone',
+            'ship_to_email', 'ship_to_company', 'ship_to_address', 'ship_to_city', 'ship_to_state', 'ship_to_zip',
+            'tax_exempt', 'exempt_cert_in_hand', 'tax_action_who', 'tax_action_when', 'confirm_tax_status_noted',
+            'customer_in_sage', 'payment_milestone_1_event', 'payment_milestone_1_percent',
+            'payment_milestone_1_terms', 'payment_milestone_1_notes', 'payment_milestone_2_event',
+            'payment_milestone_2_percent', 'payment_milestone_2_terms', 'payment_milestone_2_notes',
+            'payment_milestone_3_event', 'payment_milestone_3_percent', 'payment_milestone_3_terms',
+            'payment_milestone_3_notes', 'payment_milestone_4_event', 'payment_milestone_4_percent',
+            'payment_milestone_4_terms', 'payment_milestone_4_notes', 'payment_milestone_5_event',
+            'payment_milestone_5_percent', 'payment_milestone_5_terms', 'payment_milestone_5_notes', 'freight',
+            'international', 'international_freight_method', 'shipping_instructions', 'specifications_provided',
+            'specifications_agreed', 'liquidated_damages', 'liquidated_damages_rate_cap', 'passivation',
+            'passivation_in_out_both', 'approval_prints_required', 'approval_prints_electrical',
+            'approval_prints_ll_mech', 'approval_prints_elect', 'engineering_order_prior_to_approval', 'htr_1_qty',
+            'htr_1_type', 'htr_1_emissions', 'htr_1_size', 'htr_1_pump_grav', 'htr_1_material', 'htr_2_qty',
+            'htr_2_type', 'htr_2_emissions', 'htr_2_size', 'htr_2_pump_grav', 'htr_2_material', 'stk_econ_size_bhp',
+            'stk_econ_pump_grav', 'stk_econ_material', 'stack_length_ft', 'stack_total', 'stack_caps', 'hr_sections',
+            'hr_diam_in', 'hr_tubes', 'hr_material', 'tank_1_type', 'tank_1_dia_in', 'tank_1_ht_ft', 'tank_1_ga',
+            'tank_1_material', 'tank_2_type', 'tank_2_dia_in', 'tank_2_ht_ft', 'tank_2_ga', 'tank_2_material',
+            'tank_3_type', 'tank_3_dia_in', 'tank_3_ht_ft', 'tank_3_ga', 'tank_3_material', 'pump_packaging',
+            'pump_piping_material', 'pump_1_type', 'pump_1_qty', 'pump_1_flow_gpm', 'pump_1_tdh_ft', 'pump_2_type',
+            'pump_2_qty', 'pump_2_flow_gpm', 'pump_2_tdh_ft', 'pump_3_type', 'pump_3_qty', 'pump_3_flow_gpm',
+            'pump_3_tdh_ft', 'pump_4_type', 'pump_4_qty', 'pump_4_flow_gpm', 'pump_4_tdh_ft', 'steam_heater_1_dia_in',
+            'steam_heater_1_length_in', 'steam_heater_1_material', 'steam_heater_1_valve_type',
+            'steam_heater_2_dia_in', 'steam_heater_2_length_in', 'steam_heater_2_material',
+            'steam_heater_2_valve_type', 'softener_asme_coded', 'softener_tank_material',
+            'softener_face_plumbing_material', 'panel_qty', 'panel_plc', 'panel_split_volt', 'other_vent_condenser',
+            'other_shaker_screen', 'city_water_meter_in', 'electrical', 'fuel_type', 'gas_pressure_psi',
+            'onsite_gas_supply_diameter_in', 'gas_train_orientation', 'utilities_match_proposal', 'notes',
+            'other_info', 'project_name', 'project_type', 'labor_hr', 'labor_pkg', 'labor_fab', 'labor_wiring',
+            'capital_sell_price', 'capital_equip_cost', 'capital_freight', 'capital_startup_cost',
+            'capital_protect_cost', 'capital_net_revenue', 'install_sell_price', 'install_cost', 'install_trips',
+            'install_days', 'install_net_revenue', 'eng_weld_in_out', 'eng_height_greater_than_20ft',
+            'eng_crane_reqd', 'eng_hi_temp_htr', 'eng_large_hp_or_excessive_ll_pumps', 'eng_generator_need',
+            'eng_special_testing_reqd', 'eng_extra_forklift_or_scissor_lift_reqd',
+        ),
+        'rows': {
+            'line_items': ('item_number', 'description', 'value_1', 'value_2', 'value_3', 'value_4'),
+            'equipment_required': ('equipment_type', 'qty', 'kn_number', 'description'),
+        },
+    },
+}
+
+
+def _encode_rows(rows, keys):
+    # Rows with exactly the layout's keys become positional lists; anything else is kept as is
+    return [[row[key] for key in keys] if isinstance(row, dict) and tuple(row) == keys else row
+            for row in rows]
+
+
+def _decode_rows(rows, keys):
+    return [dict(zip(keys, row)) if isinstance(row, list) else row for row in rows]
+
+
+def encode_raw_data(raw_data, version=RAW_DATA_VERSION):
+    """raw_data (a dict from parse_kom_excel) as compact bytes"""
+    layout = RAW_DATA_LAYOUTS[version]
+    missing = []
+    values = []
+    for index, key in enumerate(layout['fields']):
+        if key in raw_data:
+            values.append(raw_data[key])
+        else:
+            missing.append(index)
+            values.append(None)
+    record = {'v': version, 'f': values}
+    if missing:
+        record['m'] = missing
+    fields = set(layout['fields'])
+    extra = {}
+    for key, value in raw_data.items():
+        if key in layout['rows'] and isinstance(value, list):
+            record[key] = _encode_rows(value, layout['rows'][key])
+        elif key not in fields:
+            extra[key] = value
+    if extra:
+        record['x'] = extra
+    return zlib.compress(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_raw_data(data):
+    """Inverse of encode_raw_data; plain JSON (rows written before the compact encoding) is read as is"""
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    if data[:1] in (b'{', b'['):
+        return json.loads(data)
+    record = json.loads(zlib.decompress(data))
+    layout = RAW_DATA_LAYOUTS[record['v']]
+    missing = set(record.get('m', ()))
+    raw_data = {key: value for index, (key, value) in enumerate(zip(layout['fields'], record['f']))
+                if index not in missing}
+    for key, keys in layout['rows'].items():
+        if key in record:
+            raw_data[key] = _decode_rows(record[key], keys)
+    raw_data.update(record.get('x', {}))
+    return raw_data
+
+
+class CompactJSONField(models.BinaryField):
+    """
+    A dict stored with encode_raw_data. Reads and writes like a JSONField (the attribute is
+    always the decoded dict) but has no JSON lookups: filter on the typed columns instead.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else decode_raw_data(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_raw_data(value)
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, dict):
+            value = encode_raw_data(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        # Serialized (dumpdata) as plain JSON
+        return json.dumps(self.value_from_object(obj))
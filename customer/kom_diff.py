@@ -0,0 +1,144 @@
+"""
+Structural diff of KOM forms.
+Each form's raw_data is flattened once into KOMForm.flat_data: a flat
+{key: value} dict with dotted keys for nested values and line items /
+equipment rows keyed by item number / equipment type, e.g.
+'line_items[35371-01].value_1'. Comparing any number of forms is then a
+single pass over those dicts.
+"""
+import re
+
+from .kom_schema import KOM_FIELDS
+
+# Bump whenever flatten_kom's output changes, then run reextract_koms to rebuild stored flat_data
+FLAT_DATA_VERSION = 1
+
+# Row lists are keyed by this field instead of their position
+ROW_KEYS = {
+    'line_items': 'item_number',
+    'equipment_required': 'equipment_type',
+}
+ROW_LABELS = {
+    'line_items': 'Line Item',
+    'equipment_required': 'Equipment',
+}
+
+_FIELD_ORDER = {key: index for index, key in enumerate(KOM_FIELDS)}
+
+
+def _normalize(value):
+    """Value as compared: stripped text, whole floats as ints, and empty/False as missing"""
+    if isinstance(value, str):
+        return value.strip() or None
+    if value is False:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _flatten_value(flat, key, value):
+    if isinstance(value, dict):
+        for name, item in value.items():
+            _flatten_value(flat, f'{key}.{name}', item)
+    elif isinstance(value, list):
+        for index, item in enumerate(value, start=1):
+            _flatten_value(flat, f'{key}[{index}]', item)
+    else:
+        value = _normalize(value)
+        if value is not None:
+            flat[key] = value
+
+
+def _flatten_rows(flat, name, rows, key_field):
+    seen = {}
+    for row in rows or []:
+        row_key = str(row.get(key_field) or '').strip() or '?'
+        seen[row_key] = seen.get(row_key, 0) + 1
+        if seen[row_key] > 1:
+            row_key = f'{row_key}#{seen[row_key]}'
+        # The row itself, so added and removed rows show up even when all their fields are empty
+        flat[f'{name}[{row_key}]'] = row_key
+        for field, value in row.items():
+            if field != key_field:
+                _flatten_value(flat, f'{name}[{row_key}].{field}', value)
+
+
+def flatten_kom(raw_data):
+    """Flat {key: value} form of parse_kom_excel output (see the module docstring)"""
+    flat = {'_version': FLAT_DATA_VERSION}
+    for key, value in (raw_data or {}).items():
+        # Warnings and parser timings are not part of the form
+        if key.startswith('_'):
+            continue
+        if key in ROW_KEYS:
+            _flatten_rows(flat, key, value, ROW_KEYS[key])
+        else:
+            _flatten_value(flat, key, value)
+    return flat
+
+
+def get_flat_data(kom_form):
+    """
+    kom_form.flat_data, or flattened from raw_data in memory when it is missing or out of date.
+    Stored flat_data is written on save, backfilled by migration and rebuilt by reextract_koms,
+    never from here, so comparisons stay read-only.
+    """
+    flat = kom_form.flat_data
+    if not flat or flat.get('_version') != FLAT_DATA_VERSION:
+        flat = flatten_kom(kom_form.raw_data)
+    return flat
+
+
+def key_label(key):
+    """Readable name for a flat key: the KOM_SCHEMA label, or 'Line Item 35371-01 value_1'"""
+    match = re.match(r'(\w+)\[([^\]]*)\](?:\.(.+))?$', key)
+    if match and match.group(1) in ROW_LABELS:
+        name, row_key, field = match.groups()
+        return ' '.join(part for part in (ROW_LABELS[name], row_key, field) if part)
+    field = KOM_FIELDS.get(key)
+    return field.label if field is not None else key
+
+
+def _sort_key(key):
+    # KOM_SCHEMA order first, then the row lists, then anything else
+    base = re.split(r'[.\[]', key, maxsplit=1)[0]
+    if base in _FIELD_ORDER:
+        return (0, _FIELD_ORDER[base], key)
+    if base in ROW_KEYS:
+        return (1, list(ROW_KEYS).index(base), key)
+    return (2, 0, key)
+
+
+def diff_flat(flats):
+    """
+    Compact change set of flattened forms: one row per key whose value is not the same in all
+    of them, as {'key', 'label', 'values', 'changed'} in schema order. changed[i] tells whether
+    values[i] differs from values[i - 1], so a revision chain reads left to right.
+    """
+    keys = set()
+    for flat in flats:
+        keys.update(key for key in flat if not key.startswith('_'))
+    rows = []
+    for key in sorted(keys, key=_sort_key):
+        values = [flat.get(key) for flat in flats]
+        if all(value == values[0] for value in values[1:]):
+            continue
+        rows.append({
+            'key': key,
+            'label': key_label(key),
+            'values': values,
+            'changed': [False] + [values[i] != values[i - 1] for i in range(1, len(values))],
+        })
+    return rows
+
+
+def compare_koms(kom_forms):
+    """diff_flat of the given forms, in the order given"""
+    return diff_flat([get_flat_data(kom_form) for kom_form in kom_forms])
+
+
+def revision_sort_key(kom_form):
+    """Order revisions of a job: by the R<n> suffix of the proposal number, then by import time"""
+    match = re.search(r'R(\d+)', (kom_form.proposal_number or '').upper())
+    return (int(match.group(1)) if match else 0, kom_form.created_at)
@@ -0,0 +1,153 @@
+"""
+Plain-text KOM export, laid out from KOM_SCHEMA.
+The text is produced section by section so responses can stream it, and each
+rendered export is cached by (pk, updated_at) so unchanged forms are never
+formatted twice. iter_zip streams many exports as one zip archive.
+"""
+import io
+import zipfile
+
+from django.core.cache import cache
+
+from .kom_schema import KOM_SCHEMA, BLANK, Field, Group, Rows, Subsection
+
+# Bump whenever the export layout changes so cached exports are not reused
+KOM_EXPORT_VERSION = 1
+KOM_EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def format_field(label, value, default="MISSING"):
+    """Format a field, showing MISSING if empty"""
+    if value is None or value == '' or value == '-':
+        return f"{label}: {default}"
+    if isinstance(value, bool):
+        return f"{label}: {'YES' if value else 'NO'}"
+    if hasattr(value, 'strftime'):  # Date object
+        return f"{label}: {value.strftime('%m/%d/%Y')}"
+    return f"{label}: {value}"
+
+
+def _format_fields(fields, obj, indent=''):
+    return [format_field(f"{indent}{field.label}", field.format(getattr(obj, field.key))) for field in fields]
+
+
+def iter_export_sections(kom_form):
+    """Lines of the export, one list per section (plus the header and the footer)"""
+    yield [
+        "=" * 80,
+        f"KOM FORM EXPORT - Proposal #{kom_form.proposal_number or 'N/A'}",
+        f"Project: {kom_form.project_name or 'N/A'}",
+        f"Source File: {kom_form.source_file or 'N/A'}",
+        f"Exported: {kom_form.updated_at.strftime('%Y-%m-%d %H:%M:%S')}",
+        "=" * 80,
+        "",
+    ]
+
+    # Sections, labels and display formats all come from KOM_SCHEMA
+    for section in KOM_SCHEMA:
+        output = [section.title, "-" * 80]
+        for block in section.blocks:
+            if block is BLANK:
+                output.append("")
+            elif isinstance(block, Field):
+                output.extend(_format_fields([block], kom_form))
+            elif isinstance(block, Subsection):
+                output.append(f"{block.title}:")
+                output.extend(_format_fields(block.fields, kom_form, '  '))
+            elif isinstance(block, Group):
+                for title, prefix, fields in block.items:
+                    # Optional items (tanks, pumps...) are only listed when filled in
+                    if block.show_if and not any(getattr(kom_form, prefix + name) for name in block.show_if):
+                        continue
+                    output.append(f"{title}:")
+                    output.extend(_format_fields(fields, kom_form, '  '))
+                    if block.spaced:
+                        output.append("")
+            elif isinstance(block, Rows):
+                rows = getattr(kom_form, block.key).all()
+                if rows:
+                    for row in rows:
+                        output.append(block.title(row))
+                        output.extend(_format_fields(block.fields, row, '  '))
+                        output.append("")
+                else:
+                    output.append(block.empty)
+                    output.append("")
+        # Sections ending in spaced items already end with a blank line
+        if not getattr(section.blocks[-1], 'spaced', False):
+            output.append("")
+        yield output
+
+    yield [
+        "=" * 80,
+        "END OF EXPORT",
+        "=" * 80,
+    ]
+
+
+def export_cache_key(kom_form):
+    return f'kom_export:{KOM_EXPORT_VERSION}:{kom_form.pk}:{kom_form.updated_at.timestamp()}'
+
+
+def iter_kom_export(kom_form):
+    """
+    The export text in chunks: the cached text in one piece, or else one chunk per
+    section as it is formatted (cached once the last chunk has been produced)
+    """
+    key = export_cache_key(kom_form)
+    text = cache.get(key)
+    if text is not None:
+        yield text
+        return
+    chunks = []
+    for index, lines in enumerate(iter_export_sections(kom_form)):
+        chunk = ("\n" if index else "") + "\n".join(lines)
+        chunks.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(chunks), KOM_EXPORT_CACHE_TIMEOUT)
+
+
+def export_filename(kom_form):
+    return f'kom_export_{kom_form.proposal_number or "unknown"}.txt'
+
+
+class _ZipBuffer(io.RawIOBase):
+    """Write-only, unseekable sink for ZipFile; drain() hands over what was written since the last call"""
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(kom_forms):
+    """
+    Stream a zip archive of the text exports of kom_forms (any iterable, e.g. a queryset iterator).
+    Only the export being compressed is held in memory; repeated file names get the pk appended.
+    """
+    buffer = _ZipBuffer()
+    names = set()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for kom_form in kom_forms:
+            name = export_filename(kom_form)
+            if name in names:
+                name = name.replace('.txt', f'_{kom_form.pk}.txt')
+            names.add(name)
+            info = zipfile.ZipInfo(name, date_time=kom_form.updated_at.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as entry:
+                for chunk in iter_kom_export(kom_form):
+                    entry.write(chunk.encode('utf-8'))
+            yield buffer.drain()
+    # The central directory is written on close
+    yield buffer.drain()
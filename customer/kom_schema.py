@@ -0,0 +1,452 @@
+"""
+Declarative field schema for KOM forms.
+
+Every KOMForm column is declared once here: where it lives on the KOM sheet,
+how the cell text is coerced, and how it is labelled in the text export.
+The schema is compiled at import time and shared by the Excel parser
+(customer.utils.parse_kom_excel), KOMForm.extract_from_raw_data and the
+text export view, so adding a field is a one-line change.
+
+Cell references are (row, col) for fixed cells or (anchor, offset, col) for
+cells that sit relative to a section header found in the sheet (see KOM_ANCHORS).
+Several references are tried in order and the first non-empty cell wins.
+Sections that need real logic (heaters, tanks, pumps, line items...) name an
+extractor instead of cells; the extractors live next to the parser.
+"""
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+
+# Storage types (how the value is kept on KOMForm)
+TEXT = 'text'
+DATE = 'date'
+DECIMAL = 'decimal'
+INT = 'int'
+BOOL = 'bool'
+
+# Display formats for the text export
+PERCENT = 'percent'
+MONEY = 'money'
+
+_EMPTY = {TEXT: '', DATE: None, DECIMAL: None, INT: None, BOOL: False}
+
+
+class Field:
+    """
+    One KOMForm column.
+    coerce overrides the default cell coercion for the type:
+      'percent' - decimal with a trailing % stripped
+      'yes'     - True only for the literal YES
+      'present' - True for any non-empty cell
+      'digits'  - int only when the text is all digits
+    reject / reject_containing / reject_upper / reject_colon blank out cells
+    that hold a label instead of a value.
+    """
+    __slots__ = ('key', 'label', 'type', 'cells', 'raw', 'coerce', 'reject', 'reject_containing',
+                 'reject_upper', 'reject_colon', 'default', 'display', 'extractor')
+
+    def __init__(self, key, label, type=TEXT, cells=(), raw=None, coerce=None, reject=(),
+                 reject_containing=(), reject_upper=(), reject_colon=False, default=None,
+                 display=None, extractor=None):
+        self.key = key
+        self.label = label
+        self.type = type
+        self.cells = tuple(cell if len(cell) == 3 else (None,) + tuple(cell) for cell in cells)
+        # Dates are read from the raw cell so Excel date values survive
+        self.raw = (type == DATE) if raw is None else raw
+        self.coerce = coerce
+        self.reject = frozenset(reject)
+        self.reject_containing = tuple(reject_containing)
+        self.reject_upper = frozenset(reject_upper)
+        self.reject_colon = reject_colon
+        self.default = _EMPTY[type] if default is None else default
+        self.display = display
+        self.extractor = extractor
+
+    def copy(self, key, label=None):
+        field = Field.__new__(Field)
+        for name in self.__slots__:
+            setattr(field, name, getattr(self, name))
+        field.key = key
+        if label is not None:
+            field.label = label
+        return field
+
+    def to_python(self, value):
+        """Convert a raw_data (JSON) value to the value stored on KOMForm"""
+        if value is None or value == '':
+            return _EMPTY[self.type]
+        if self.type == TEXT:
+            return value
+        if self.type == BOOL:
+            return bool(value)
+        if self.type == DATE:
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, date):
+                return value
+            if isinstance(value, str):
+                for fmt in ('%Y-%m-%d', '%m/%d/%y', '%m/%d/%Y'):
+                    try:
+                        return datetime.strptime(value, fmt).date()
+                    except ValueError:
+                        pass
+            return None
+        if isinstance(value, (int, float)):
+            return Decimal(str(value)) if self.type == DECIMAL else int(value)
+        try:
+            number = Decimal(str(value).replace('$', '').replace(',', '').strip())
+        except InvalidOperation:
+            return None
+        return number if self.type == DECIMAL else int(number)
+
+    def format(self, value):
+        """Value as shown in the text export (None when there is nothing to show)"""
+        if self.display == PERCENT:
+            return f"{value}%" if value else None
+        if self.display == MONEY:
+            return f"${value}" if value else None
+        return value
+
+
+class Group:
+    """
+    A block of fields repeated count times, e.g. tank_{i}_type for tanks 1-3.
+    Fields are declared with the per-item suffix and expanded at import;
+    show_if lists the suffixes of which one must be set for the export to show an item,
+    spaced puts a blank line after each item in the export.
+    """
+    def __init__(self, title, prefix, count, fields, extractor, show_if=None, spaced=True):
+        self.title = title
+        self.extractor = extractor
+        self.show_if = show_if
+        self.spaced = spaced
+        self.items = []
+        for i in range(1, count + 1):
+            item_prefix = prefix.format(i=i)
+            item_fields = []
+            for field in fields:
+                field = field.copy(item_prefix + field.key)
+                field.extractor = extractor
+                item_fields.append(field)
+            self.items.append((title.format(i=i), item_prefix, item_fields))
+
+
+class Subsection:
+    """Indented run of fields under its own heading (e.g. COMMISSIONS)"""
+    def __init__(self, title, fields):
+        self.title = title
+        self.fields = fields
+
+
+class Rows:
+    """Related rows (line items, equipment) read by an extractor into a list; title(row) heads each row"""
+    spaced = True
+
+    def __init__(self, key, extractor, title, fields, empty):
+        self.key = key
+        self.extractor = extractor
+        self.title = title
+        self.fields = fields
+        self.empty = empty
+
+
+class Section:
+    """A titled section of the KOM sheet; blocks are Fields, Groups, Subsections, Rows or BLANK"""
+    def __init__(self, title, blocks):
+        self.title = title
+        self.blocks = blocks
+
+
+class Anchor:
+    """A section header located in the sheet, with the row assumed when it is missing"""
+    def __init__(self, keyword, rows, default, warning, cols=(1,)):
+        self.keyword = keyword
+        self.rows = rows
+        self.default = default
+        self.warning = warning
+        self.cols = cols
+
+
+# Blank line in the export
+BLANK = None
+
+
+KOM_ANCHORS = {
+    'tanks': Anchor('TANKS', range(70, 85), 75, 'TANKS section not found, using default row 75'),
+    'pumps': Anchor('PUMPS', range(80, 95), 82, 'PUMPS section not found, using default row 82'),
+    'apps': Anchor('TO BE COMPLETED BY APPS', range(120, 135), 125,
+                   'TO BE COMPLETED BY APPS section not found, using default row 127'),
+    'labor_hours': Anchor('LABOR HOURS', range(130, 145), 141,
+                          'LABOR HOURS section not found for labor hours extraction, using default row 141',
+                          cols=(1, 2)),
+    'capital': Anchor('CAPITAL', range(135, 150), 147, 'CAPITAL section not found, using default row 147'),
+}
+
+
+def _address(prefix, col):
+    """Bill To / Ship To blocks share rows 12-24 and differ only by column"""
+    zip_col = 4 if col == 3 else 9
+    return [
+        Field(f'{prefix}_name', 'Name', cells=[(12, col)]),
+        Field(f'{prefix}_phone', 'Phone', cells=[(14, col)]),
+        Field(f'{prefix}_email', 'Email', cells=[(16, col)]),
+        Field(f'{prefix}_company', 'Company', cells=[(18, col)]),
+        Field(f'{prefix}_address', 'Address', cells=[(20, col)]),
+        Field(f'{prefix}_city', 'City', cells=[(22, col)]),
+        Field(f'{prefix}_state', 'State', cells=[(24, col)]),
+        Field(f'{prefix}_zip', 'ZIP', cells=[(24, zip_col)]),
+    ]
+
+
+def _chain(row, *cols):
+    return [(row, col) for col in cols]
+
+
+KOM_SCHEMA = [
+    Section('TO BE COMPLETED BY SALES', [
+        Field('proposal_number', 'Proposal #', cells=[(2, 3)]),
+        Field('proposal_date', 'Proposal Date', DATE, cells=[(2, 6)]),
+        Field('sales_rep', 'Sales Rep', cells=[(2, 8)]),
+        Field('date_of_oc', 'Date of OC', DATE, cells=[(2, 11)]),
+        Field('industry', 'Industry', cells=[(4, 3)]),
+        Field('industry_subcategory', 'Industry Subcategory', cells=[(4, 5)]),
+        Field('discount', 'Discount', DECIMAL, display=PERCENT, extractor='discount'),
+        Field('po_number', 'PO#', cells=[(4, 11)]),
+        BLANK,
+        Subsection('COMMISSIONS', [
+            Field('comm_1_inside_percent', 'Comm #1 (Inside) %', DECIMAL, cells=[(6, 4)], coerce='percent',
+                  display=PERCENT),
+            Field('comm_1_inside_name', 'Comm #1 (Inside) Name', cells=[(6, 6)]),
+            Field('comm_2_inside_percent', 'Comm #2 (Inside) %', DECIMAL, cells=[(8, 4)], coerce='percent',
+                  display=PERCENT),
+            Field('comm_2_inside_name', 'Comm #2 (Inside) Name', cells=[(8, 6)]),
+            Field('comm_outside_amount', 'Comm (Outside) Amount', DECIMAL, cells=[(6, 10)], display=MONEY),
+            Field('comm_outside_name', 'Comm (Outside) Name', cells=_chain(8, 11, 10, 9), reject=['Name:']),
+        ]),
+        BLANK,
+        Field('consultant', 'Consultant', cells=[(43, 4)], reject_colon=True,
+              reject=['Consultant:', 'Desired Delivery:', 'Contractor Name:', 'None']),
+        Field('contractor_name', 'Contractor Name', cells=[(43, 7)], reject_colon=True,
+              reject=['Contractor Name:', 'Desired Delivery:', 'TBD']),
+        Field('desired_delivery', 'Desired Delivery', cells=[(45, 4)], reject_containing=['Desired Delivery'],
+              reject_colon=True),
+    ]),
+    Section('BILL TO', _address('bill_to', 3)),
+    Section('SHIP TO', _address('ship_to', 7)),
+    Section('TAX INFORMATION', [
+        Field('tax_exempt', 'Tax Exempt', BOOL, cells=[(26, 4)], coerce='yes'),
+        Field('exempt_cert_in_hand', 'Exempt Cert in Hand', BOOL, cells=[(26, 8)]),
+        Field('tax_action_who', 'Tax Action Who', cells=_chain(26, 13, 12, 11), reject_upper=['WHO', 'WHEN']),
+        Field('tax_action_when', 'Tax Action When', DATE, cells=_chain(27, 13, 12, 11)),
+        Field('confirm_tax_status_noted', 'Confirm Tax Status Noted', BOOL, cells=[(30, 4)]),
+        Field('customer_in_sage', 'Customer in Sage', BOOL, cells=[(30, 6)]),
+    ]),
+    Section('PAYMENT MILESTONES', [
+        Group('Milestone {i}', 'payment_milestone_{i}_', 5, [
+            Field('event', 'Event'),
+            Field('percent', 'Percent', DECIMAL, display=PERCENT),
+            Field('terms', 'Terms'),
+            Field('notes', 'Notes'),
+        ], extractor='payment_milestones', show_if=('event', 'percent', 'terms', 'notes'), spaced=False),
+    ]),
+    Section('SHIPPING', [
+        Field('freight', 'Freight', cells=[(48, 3)]),
+        Field('international', 'International', BOOL, cells=[(48, 6)], coerce='yes'),
+        Field('international_freight_method', 'International Freight Method', cells=[(48, 10)]),
+        Field('shipping_instructions', 'Shipping Instructions', cells=[(50, 3)],
+              reject_containing=['Instructions:']),
+    ]),
+    Section('SPECIFICATIONS AND TERMS & CONDITIONS', [
+        Field('specifications_provided', 'Specifications Provided', BOOL, cells=[(53, 4)]),
+        Field('specifications_agreed', 'Specifications Agreed', BOOL, cells=[(53, 6)]),
+        Field('liquidated_damages', 'Liquidated Damages', BOOL, cells=[(53, 10)]),
+        Field('liquidated_damages_rate_cap', 'Liquidated Damages Rate & Cap', cells=[(54, 10)]),
+        Field('passivation', 'Passivation', BOOL, cells=[(55, 3)]),
+        Field('passivation_in_out_both', 'Passivation In/Out/Both', cells=[(55, 6)]),
+    ]),
+    Section('APPROVAL PRINTS', [
+        Field('approval_prints_required', 'Approval Prints Required', BOOL, cells=[(58, 4)]),
+        Field('approval_prints_electrical', 'Approval Prints Electrical', BOOL, cells=[(58, 6)]),
+        Field('approval_prints_ll_mech', 'LL & Mech Approval', extractor='approval_prints'),
+        Field('approval_prints_elect', 'Elect Approval', extractor='approval_prints'),
+        Field('engineering_order_prior_to_approval', 'Engineering Order Prior to Approval', BOOL,
+              cells=[(59, 6)]),
+    ]),
+    Section('EQUIPMENT - HEATERS', [
+        Group('HTR - {i}', 'htr_{i}_', 2, [
+            Field('qty', 'Qty', INT),
+            Field('type', 'Type'),
+            Field('emissions', 'Emissions'),
+            Field('size', 'Size'),
+            Field('pump_grav', 'Pump/Grav'),
+            Field('material', 'Material'),
+        ], extractor='heaters'),
+    ]),
+    Section('STACK ECONOMIZER', [
+        Field('stk_econ_size_bhp', 'Size (BHP)', cells=_chain(69, 4, 3), reject_colon=True,
+              reject=['Size (BHP):', 'TOTAL', 'Cap(s)?', 'Tubes:']),
+        Field('stk_econ_pump_grav', 'Pump/Grav', cells=_chain(69, 7, 6), reject_colon=True,
+              reject=['Pump/Grav:', 'TOTAL', 'Cap(s)?', 'Tubes:']),
+        Field('stk_econ_material', 'Material', cells=_chain(69, 9, 8), reject_colon=True,
+              reject=["Mat'l:", 'TOTAL', 'Cap(s)?', 'Tubes:']),
+    ]),
+    Section('STACK(S)', [
+        Field('stack_length_ft', 'Length (ft)', DECIMAL, cells=[(71, 5)]),
+        Field('stack_total', 'Total', cells=[(71, 7)], reject_upper=['TOTAL', 'YES', 'NO'],
+              reject=['Tubes:', 'TOTAL', 'Cap(s)?'], reject_colon=True),
+        Field('stack_caps', 'Caps', BOOL, cells=[(71, 10)], reject=['TOTAL', 'Tubes:', 'Cap(s)?']),
+    ]),
+    Section('HR', [
+        Field('hr_sections', '# Sections', INT, cells=[(73, 5)]),
+        Field('hr_diam_in', 'Diam (in)', DECIMAL, cells=[(73, 7)], reject_containing=['Diam (in):']),
+        Field('hr_tubes', 'Tubes', cells=[(73, 9)], reject_containing=['Tubes:']),
+        Field('hr_material', 'Material', cells=[(73, 11)], reject_containing=["Mat'l:"]),
+    ]),
+    Section('TANKS', [
+        Group('Tank {i}', 'tank_{i}_', 3, [
+            Field('type', 'Type'),
+            Field('dia_in', 'Dia (in)', INT),
+            Field('ht_ft', 'Ht (ft)', INT),
+            Field('ga', 'GA'),
+            Field('material', 'Material'),
+        ], extractor='tanks', show_if=('type', 'dia_in')),
+    ]),
+    Section('PUMPS', [
+        Field('pump_packaging', 'Packaging', extractor='pumps'),
+        Field('pump_piping_material', 'Piping Material', extractor='pumps'),
+        BLANK,
+        Group('Pump {i}', 'pump_{i}_', 4, [
+            Field('type', 'Type'),
+            Field('qty', 'Qty', INT),
+            Field('flow_gpm', 'Flow (gpm)', INT),
+            Field('tdh_ft', 'TDH (ft)', INT),
+        ], extractor='pumps', show_if=('type', 'qty')),
+    ]),
+    Section('STEAM HEATERS', [
+        Group('Steam Heater {i}', 'steam_heater_{i}_', 2, [
+            Field('dia_in', 'Dia (in)', DECIMAL),
+            Field('length_in', 'Length (in)', DECIMAL),
+            Field('material', 'Material'),
+            Field('valve_type', 'Valve Type'),
+        ], extractor='steam_heaters', show_if=('dia_in', 'material')),
+    ]),
+    Section('SOFTENER', [
+        Field('softener_asme_coded', 'ASME Coded', BOOL, cells=_chain(99, 5, 4, 3)),
+        Field('softener_tank_material', 'Tank Material', cells=_chain(99, 8, 7, 6),
+              reject_containing=["Tank Mat'l"], reject_colon=True),
+        Field('softener_face_plumbing_material', 'Face Plumbing Material', cells=_chain(99, 11, 10, 9),
+              reject_containing=["Face Plumbing Mat'l:"], reject_colon=True),
+    ]),
+    Section('PANEL(S)', [
+        Field('panel_qty', 'Qty', INT, cells=_chain(100, 4, 3) + _chain(102, 4, 3), raw=True),
+        Field('panel_plc', 'PLC', cells=_chain(100, 6, 5) + _chain(102, 7, 6),
+              reject_containing=['PLC(s):'], reject_colon=True),
+        Field('panel_split_volt', 'Split Volt', cells=_chain(100, 8, 7) + _chain(102, 11, 10, 9),
+              reject=['SPLIT VOLT'], reject_colon=True),
+    ]),
+    Section('OTHER EQUIPMENT', [
+        Field('other_vent_condenser', 'Vent Condenser', BOOL, cells=[(105, 2)], coerce='present'),
+        Field('other_shaker_screen', 'Shaker Screen', BOOL, cells=[(105, 4)], coerce='present'),
+    ]),
+    Section('UTILITIES', [
+        Field('city_water_meter_in', 'City Water Meter (in)', DECIMAL, cells=[(107, 9)],
+              reject_containing=['City Water Meter']),
+        Field('electrical', 'Electrical', cells=[(109, 3)], reject_containing=['Electrical:'], reject_colon=True),
+        Field('fuel_type', 'Fuel Type', cells=[(109, 6)], reject_containing=['Fuel Type:'], reject_colon=True),
+        Field('gas_pressure_psi', 'Gas Pressure (psi)', extractor='gas_pressure'),
+        Field('onsite_gas_supply_diameter_in', 'Onsite Gas Supply Diameter (in)', DECIMAL, cells=[(111, 9)],
+              reject_containing=['Onsite Gas Supply Diameter']),
+        Field('gas_train_orientation', 'Gas Train Orientation', cells=[(111, 10)],
+              reject_containing=['Gas Train Orientation:'], reject_colon=True),
+        Field('utilities_match_proposal', 'Utilities Match Proposal', BOOL, cells=[(113, 8)]),
+    ]),
+    Section('OTHER INFO', [
+        Field('notes', 'Notes', cells=_chain(114, 3, 2) + _chain(116, 3, 2), reject_containing=['Notes:']),
+        Field('other_info', 'Other Info', cells=[(118, 2)]),
+        Field('project_name', 'Project Name', cells=[(123, 4)]),
+        Field('project_type', 'Project Type', cells=[(123, 8)]),
+    ]),
+    Section('LINE ITEMS (TO BE COMPLETED BY APPS)', [
+        Rows('line_items', 'line_items', lambda item: f"Item: {item.item_number or 'N/A'}", [
+            Field('description', 'Description'),
+            Field('value_1', 'Value 1', DECIMAL, display=MONEY),
+            Field('value_2', 'Value 2', DECIMAL, display=MONEY),
+            Field('value_3', 'Value 3', DECIMAL, display=MONEY),
+            Field('value_4', 'Value 4', DECIMAL, display=MONEY),
+        ], empty='MISSING - No line items found'),
+    ]),
+    Section('LABOR HOURS', [
+        Field('labor_hr', 'HR', cells=[('labor_hours', 1, 4), (142, 4)], reject=['HR:'], reject_colon=True,
+              default='-'),
+        Field('labor_pkg', 'Pkg', DECIMAL, cells=[('labor_hours', 2, 4), (143, 4)], raw=True, reject=['Pkg:']),
+        Field('labor_fab', 'Fab', DECIMAL, cells=[('labor_hours', 3, 4), (144, 4)], raw=True, reject=['Fab:']),
+        Field('labor_wiring', 'Wiring', DECIMAL, cells=[('labor_hours', 4, 4), (145, 4)], raw=True,
+              reject=['Wiring:']),
+    ]),
+    Section('EQUIPMENT REQUIRED', [
+        Rows('equipment_required', 'equipment_required', lambda eq: f"{eq.equipment_type}:", [
+            Field('qty', 'Qty', INT),
+            Field('kn_number', 'KN Number'),
+            Field('description', 'Description'),
+        ], empty='MISSING - No equipment required found'),
+    ]),
+    Section('CAPITAL', [
+        Field('capital_sell_price', 'Sell Price', DECIMAL, cells=[('capital', 2, 3), (149, 3)],
+              reject_containing=['Sell Price:'], display=MONEY),
+        Field('capital_equip_cost', 'Equip Cost', DECIMAL, cells=[('capital', 4, 3), (151, 3)],
+              reject_containing=['Equip Cost:'], display=MONEY),
+        Field('capital_freight', 'Freight', DECIMAL, cells=[('capital', 6, 3), (153, 3)],
+              reject_containing=['Freight:'], display=MONEY),
+        Field('capital_startup_cost', 'Startup Cost', DECIMAL, cells=[('capital', 8, 4), (155, 4)],
+              reject_containing=['StartUp Cost:'], display=MONEY),
+        Field('capital_protect_cost', 'Protect Cost', DECIMAL, cells=[('capital', 9, 3), (156, 3)],
+              reject_containing=['Protect Cost'], display=MONEY),
+        Field('capital_net_revenue', 'Net Revenue', DECIMAL, cells=[('capital', 10, 3), (157, 3)],
+              reject_containing=['Net Revenue:'], display=MONEY),
+    ]),
+    Section('INSTALL', [
+        Field('install_sell_price', 'Sell Price', DECIMAL, cells=_chain(138, 9, 8) + _chain(149, 10, 9, 8),
+              reject_containing=['Sell Price:'], display=MONEY),
+        Field('install_cost', 'Install Cost', DECIMAL, display=MONEY, extractor='install_cost'),
+        Field('install_trips', '# of Trips', INT, cells=_chain(143, 9, 8) + _chain(154, 10, 9, 8),
+              coerce='digits'),
+        Field('install_days', '# of Days', INT, cells=_chain(144, 9, 8) + _chain(155, 10, 9, 8),
+              coerce='digits'),
+        Field('install_net_revenue', 'Net Revenue', DECIMAL, cells=_chain(146, 9, 8) + _chain(157, 10, 9, 8),
+              reject_containing=['Net Revenue:'], display=MONEY),
+    ]),
+    Section('TO BE COMPLETED BY ENG', [
+        Field('eng_weld_in_out', 'Weld In&Out', BOOL, cells=[(161, 3)]),
+        Field('eng_height_greater_than_20ft', "Height Greater than 20'", BOOL, cells=[(161, 6)]),
+        Field('eng_crane_reqd', "Crane Req'd", BOOL, cells=[(161, 9)]),
+        Field('eng_hi_temp_htr', 'Hi Temp Htr', BOOL, cells=[(163, 3)]),
+        Field('eng_large_hp_or_excessive_ll_pumps', 'Large HP or Excessive LL Pumps', BOOL, cells=[(163, 6)]),
+        Field('eng_generator_need', 'Generator Need', BOOL, cells=[(163, 9)]),
+        Field('eng_special_testing_reqd', 'Special Testing Reqd', BOOL, cells=[(165, 3)]),
+        Field('eng_extra_forklift_or_scissor_lift_reqd', 'Extra Fork Lift or Scissor Lift Reqd', BOOL,
+              cells=[(165, 6)]),
+    ]),
+]
+
+
+def iter_blocks(schema=KOM_SCHEMA):
+    """Yield every Field and Rows block in schema order, with groups expanded"""
+    for section in schema:
+        for block in section.blocks:
+            if isinstance(block, Group):
+                for _, _, fields in block.items:
+                    yield from fields
+            elif isinstance(block, Subsection):
+                yield from block.fields
+            elif block is not BLANK:
+                yield block
+
+
+# KOMForm column name -> Field, in schema order
+KOM_FIELDS = {block.key: block for block in iter_blocks() if isinstance(block, Field)}
+
+
+def model_values(raw_data):
+    """Map parsed raw_data onto KOMForm column values for every schema field"""
+    return {key: field.to_python(raw_data.get(key)) for key, field in KOM_FIELDS.items()}
@@ -0,0 +1,253 @@
+"""
+Analyze and compare KOM Excel file structures (section header positions,
+tank and line item columns). Used by the analyze_kom_structure command and
+the Tkinter tool in analyze_kom_structure_gui.py; nothing here needs a display.
+"""
+import os
+from collections import defaultdict
+from openpyxl import load_workbook
+
+
+def get_cell_value(ws, row, col):
+    """Safely get cell value"""
+    try:
+        val = ws.cell(row=row, column=col).value
+        if val is None:
+            return ''
+        return str(val).strip()
+    except:
+        return ''
+
+
+def find_section_headers(ws, max_row=200):
+    """Find all section headers in the worksheet"""
+    sections = []
+    for row in range(1, max_row):
+        for col in range(1, 15):
+            val = get_cell_value(ws, row, col)
+            if val:
+                val_upper = val.upper()
+                section_keywords = [
+                    'TO BE COMPLETED BY SALES',
+                    'TO BE COMPLETED BY APPS',
+                    'TO BE COMPLETED BY ENG',
+                    'TO BE COMPLETED BY ACCT',
+                    'BILL TO',
+                    'SHIP TO',
+                    'TAX',
+                    'PAYMENT MILESTONES',
+                    'SHIPPING',
+                    'SPECIFICATIONS',
+                    'APPROVAL PRINTS',
+                    'EQUIPMENT',
+                    'HTR - 1',
+                    'HTR - 2',
+                    'STK ECON',
+                    'STACK',
+                    'HR',
+                    'TANKS',
+                    'PUMPS',
+                    'STEAM HEATERS',
+                    'SOFTENER',
+                    'PANEL',
+                    'OTHER',
+                    'UTILITIES',
+                    'LABOR HOURS',
+                    'CAPITAL',
+                    'INSTALL',
+                    'PROJECT NAME',
+                ]
+                for keyword in section_keywords:
+                    if keyword in val_upper:
+                        sections.append({
+                            'row': row,
+                            'col': col,
+                            'text': val,
+                            'keyword': keyword
+                        })
+                        break
+    return sections
+
+
+def analyze_tanks_section(ws, tanks_row):
+    """Analyze the tanks section structure"""
+    tanks_data = []
+    for row in range(tanks_row, tanks_row + 10):
+        marker = get_cell_value(ws, row, 1)
+        if marker and marker.startswith('#'):
+            tank_info = {
+                'row': row,
+                'marker': marker,
+                'cells': {}
+            }
+            for col in range(1, 16):
+                val = get_cell_value(ws, row, col)
+                if val and val not in ['', '#1:', '#2:', '#3:', 'Type:', 'Dia (in):', 'Ht (ft):', 'GA:', "Mat'l:"]:
+                    tank_info['cells'][col] = val
+            tanks_data.append(tank_info)
+    return tanks_data
+
+
+def analyze_line_items_section(ws, line_items_start_row):
+    """Analyze line items structure"""
+    line_items = []
+    for row in range(line_items_start_row, line_items_start_row + 20):
+        item_num = get_cell_value(ws, row, 1)
+        if item_num and item_num not in ['ITEM', 'DESCRIPTION', 'TO BE COMPLETED BY APPS', 'LABOR HOURS']:
+            if item_num and not item_num.endswith(':') and len(item_num) > 0:
+                item_data = {
+                    'row': row,
+                    'item_number': item_num,
+                    'description_col': None,
+                    'value_cols': []
+                }
+                desc = get_cell_value(ws, row, 4)
+                if desc:
+                    item_data['description_col'] = 4
+                    item_data['description'] = desc
+                
+                for col in range(6, 13):
+                    val = ws.cell(row=row, column=col).value
+                    if val is not None:
+                        try:
+                            float(str(val).replace('$', '').replace(',', ''))
+                            item_data['value_cols'].append({
+                                'col': col,
+                                'value': val
+                            })
+                        except:
+                            pass
+                
+                if item_data['value_cols']:
+                    line_items.append(item_data)
+    return line_items
+
+
+def analyze_file(file_path, progress_callback=None):
+    """Analyze a single KOM Excel file"""
+    if progress_callback:
+        progress_callback(f"Analyzing: {os.path.basename(file_path)}")
+    
+    try:
+        wb = load_workbook(file_path, data_only=True)
+        ws = wb.active
+        
+        analysis = {
+            'filename': os.path.basename(file_path),
+            'filepath': file_path,
+            'max_row': ws.max_row,
+            'max_col': ws.max_column,
+            'sections': find_section_headers(ws),
+            'tanks': [],
+            'line_items': [],
+            'sample_data': {}
+        }
+        
+        for section in analysis['sections']:
+            if 'TANKS' in section['keyword']:
+                tanks_data = analyze_tanks_section(ws, section['row'])
+                analysis['tanks'] = tanks_data
+        
+        for section in analysis['sections']:
+            if 'TO BE COMPLETED BY APPS' in section['keyword']:
+                line_items = analyze_line_items_section(ws, section['row'] + 2)
+                analysis['line_items'] = line_items
+        
+        analysis['sample_data'] = {
+            'proposal_number': get_cell_value(ws, 2, 3),
+            'htr1_type': get_cell_value(ws, 61, 7),
+            'htr1_size': get_cell_value(ws, 63, 3),
+            'labor_pkg': get_cell_value(ws, 143, 4),
+            'equipment_qty': get_cell_value(ws, 143, 7),
+        }
+        
+        return analysis
+        
+    except Exception as e:
+        if progress_callback:
+            progress_callback(f"ERROR: {str(e)}")
+        return None
+
+
+def analyze_kom_file(file_path):
+    """
+    analyze_file for a worker process (see the analyze_kom_structure command).
+    Never raises: returns the analysis, or {'filename', 'filepath', 'error'} when the file can't be read.
+    """
+    messages = []
+    analysis = analyze_file(file_path, progress_callback=messages.append)
+    if analysis is None:
+        error = messages[-1][len('ERROR: '):] if len(messages) > 1 else 'Analysis failed'
+        return {'filename': os.path.basename(file_path), 'filepath': file_path, 'error': error}
+    return analysis
+
+
+class StructureComparison:
+    """
+    compare_files built up one analysis at a time, so a large run never
+    needs every analysis in memory at once
+    """
+    def __init__(self):
+        self.files = 0
+        self.comparison = {
+            'section_positions': defaultdict(list),
+            'tank_columns': defaultdict(set),
+            'value_columns': defaultdict(set),
+            'desc_columns': set(),
+        }
+    
+    def add(self, analysis):
+        comparison = self.comparison
+        self.files += 1
+        for section in analysis['sections']:
+            comparison['section_positions'][section['keyword']].append({
+                'file': analysis['filename'],
+                'row': section['row'],
+                'col': section['col']
+            })
+        
+        for tank in analysis['tanks']:
+            # Columns come back as strings from JSON
+            for col in tank['cells'].keys():
+                comparison['tank_columns'][tank['marker']].add(int(col))
+        
+        for item in analysis['line_items']:
+            if item['description_col']:
+                comparison['desc_columns'].add(item['description_col'])
+            for val in item['value_cols']:
+                comparison['value_columns'][val['col']].add(analysis['filename'])
+    
+    def to_json(self):
+        """The comparison with sets as sorted lists, plus a per-keyword summary of rows seen"""
+        comparison = self.comparison
+        return {
+            'files_analyzed': self.files,
+            'section_positions': dict(comparison['section_positions']),
+            'section_rows': {
+                keyword: _count_values(position['row'] for position in positions)
+                for keyword, positions in comparison['section_positions'].items()
+            },
+            'tank_columns': {marker: sorted(cols) for marker, cols in comparison['tank_columns'].items()},
+            'value_columns': {col: sorted(files) for col, files in sorted(comparison['value_columns'].items())},
+            'desc_columns': sorted(comparison['desc_columns']),
+        }
+
+
+def _count_values(values):
+    """{value: count}, most common first"""
+    counts = defaultdict(int)
+    for value in values:
+        counts[value] += 1
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def compare_files(analyses):
+    """Compare multiple file analyses"""
+    if not analyses:
+        return {}
+    
+    comparison = StructureComparison()
+    for analysis in analyses:
+        comparison.add(analysis)
+    return comparison.comparison
+
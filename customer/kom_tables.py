@@ -0,0 +1,138 @@
+"""
+Flat, columnar exports of the KOM archive for analysts: one table of forms, one of line items
+and one of equipment rows, joined by kom_form_id.
+Rows are read with values_list(...).iterator(), so no model instances are built and memory
+stays bounded by the chunk size however many forms there are. Tables are written as CSV, or
+as Parquet when pyarrow is installed.
+"""
+import csv
+import zipfile
+
+from django.db import models
+
+from .kom_export import _ZipBuffer
+from .models import KOMEquipmentRequired, KOMForm, KOMLineItem
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_CHUNK_SIZE = 2000
+
+# JSON columns are left out: they hold the same data as the columns
+_SKIPPED_FIELDS = {'raw_data', 'flat_data'}
+
+# table name -> (model, field holding the form id)
+KOM_TABLES = {
+    'kom_forms': (KOMForm, 'id'),
+    'kom_line_items': (KOMLineItem, 'kom_form_id'),
+    'kom_equipment_required': (KOMEquipmentRequired, 'kom_form_id'),
+}
+
+
+def table_fields(table):
+    """Concrete model fields exported for a table, in model order"""
+    model, _ = KOM_TABLES[table]
+    return [field for field in model._meta.concrete_fields if field.name not in _SKIPPED_FIELDS]
+
+
+def table_columns(table):
+    return [field.attname for field in table_fields(table)]
+
+
+def iter_table_rows(table, kom_forms=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Lists of up to chunk_size row tuples of a table, in form order.
+    kom_forms (a KOMForm queryset) restricts the export to those forms and their rows.
+    """
+    model, form_key = KOM_TABLES[table]
+    rows = model.objects.all()
+    if kom_forms is not None:
+        rows = rows.filter(**{f'{form_key.removesuffix("_id")}__in': kom_forms.values('pk')})
+    rows = rows.order_by(form_key, 'pk').values_list(*table_columns(table))
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back what is written"""
+    def write(self, value):
+        return value
+
+
+def iter_table_csv(table, kom_forms=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV text of a table in chunks: the header, then one chunk per chunk of rows"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(table_columns(table))
+    for chunk in iter_table_rows(table, kom_forms, chunk_size):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def iter_csv_zip(kom_forms=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a zip archive with one CSV per table (see iter_table_csv)"""
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table in KOM_TABLES:
+            with archive.open(f'{table}.csv', 'w') as entry:
+                for text in iter_table_csv(table, kom_forms, chunk_size):
+                    entry.write(text.encode('utf-8'))
+                    yield buffer.drain()
+    # The central directory is written on close
+    yield buffer.drain()
+
+
+def write_table_csv(table, path, kom_forms=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write a table to a CSV file; returns the number of rows written"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(table_columns(table))
+        for chunk in iter_table_rows(table, kom_forms, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def _arrow_type(field):
+    # IntegerField covers the auto primary keys
+    if isinstance(field, (models.IntegerField, models.ForeignKey)):
+        return pyarrow.int64()
+    if isinstance(field, models.BooleanField):
+        return pyarrow.bool_()
+    if isinstance(field, models.DecimalField):
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def arrow_schema(table):
+    return pyarrow.schema([(field.attname, _arrow_type(field)) for field in table_fields(table)])
+
+
+def write_table_parquet(table, path, kom_forms=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write a table to a Parquet file, one row group per chunk; returns the number of rows written.
+    Requires pyarrow.
+    """
+    if pyarrow is None:
+        raise ImportError('Parquet export requires pyarrow (pip install pyarrow)')
+    schema = arrow_schema(table)
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in iter_table_rows(table, kom_forms, chunk_size):
+            columns = [pyarrow.array(column, type=schema.field(index).type)
+                       for index, column in enumerate(zip(*chunk))]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+            count += len(chunk)
+    return count
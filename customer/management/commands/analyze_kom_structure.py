@@ -0,0 +1,97 @@
+"""Headless KOM structure analysis: manage.py analyze_kom_structure <dir-or-glob> [...]"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customer.kom_structure import StructureComparison, analyze_kom_file
+from customer.management.commands.import_koms import find_kom_files
+
+
+def read_records(path):
+    """Analyses already written to a JSON Lines file; a line cut short by a crash is ignored"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+class Command(BaseCommand):
+    help = ('Analyze KOM workbook structure (section positions, tank and line item columns) in a process pool, '
+            'writing one JSON line per workbook and a cross-file comparison')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Directories (searched recursively) or glob patterns')
+        parser.add_argument('--output', default='KOM-Structure.jsonl',
+                            help='JSON Lines file, one analysis per workbook (default: KOM-Structure.jsonl)')
+        parser.add_argument('--comparison',
+                            help='Cross-file comparison JSON (default: the output name ending in .comparison.json)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of analyzer processes (default: one per CPU)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Append to an existing output, skipping workbooks already analyzed in it')
+
+    def handle(self, *args, **options):
+        files = find_kom_files(options['paths'])
+        if not files:
+            raise CommandError('No KOM workbooks found.')
+        output = options['output']
+        comparison_path = options['comparison'] or os.path.splitext(output)[0] + '.comparison.json'
+
+        # The comparison is built as results arrive, so no analysis is kept in memory
+        comparison = StructureComparison()
+        done = set()
+        resume = options['resume'] and os.path.exists(output)
+        if resume:
+            for record in read_records(output):
+                done.add(record['filepath'])
+                if not record.get('error'):
+                    comparison.add(record)
+        to_analyze = [path for path in files if path not in done]
+
+        failed = 0
+        verbose = options['verbosity'] >= 2
+        start = time.perf_counter()
+        self.stdout.write(f'Analyzing {len(to_analyze)} file(s), {len(files) - len(to_analyze)} already in {output}...')
+        with open(output, 'a' if resume else 'w') as out, ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            if resume and out.tell():
+                # Start on a fresh line in case the last run died mid-write
+                out.write('\n')
+            # map() yields in submission order, so the output is stable between runs
+            for record in executor.map(analyze_kom_file, to_analyze, chunksize=4):
+                out.write(json.dumps(record, default=str) + '\n')
+                # Flushed per file so everything analyzed so far survives a crash
+                out.flush()
+                if record.get('error'):
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f"FAILED {record['filepath']}: {record['error']}"))
+                    continue
+                comparison.add(record)
+                if verbose:
+                    self.stdout.write(f"OK     {record['filepath']} ({len(record['sections'])} section(s))")
+
+        report = comparison.to_json()
+        with open(comparison_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+        self.report(report)
+        summary = (f'Analyzed {len(to_analyze) - failed} file(s) in {time.perf_counter() - start:.1f}s; '
+                   f'{failed} failed. Comparison of {comparison.files} file(s) written to {comparison_path}.')
+        self.stdout.write(self.style.ERROR(summary) if failed else self.style.SUCCESS(summary))
+
+    def report(self, report):
+        """Section keywords found on more than one row across the files"""
+        varying = {keyword: rows for keyword, rows in report['section_rows'].items() if len(rows) > 1}
+        if not varying:
+            return
+        self.stdout.write('Sections found on different rows:')
+        for keyword, rows in sorted(varying.items()):
+            counts = ', '.join(f'{row} ({count})' for row, count in list(rows.items())[:6])
+            more = f', ... {len(rows) - 6} more' if len(rows) > 6 else ''
+            self.stdout.write(f'  {keyword:<26} {counts}{more}')
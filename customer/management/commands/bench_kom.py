@@ -0,0 +1,69 @@
+"""Parser benchmark: manage.py bench_kom [--save-baseline] [--repeat N]"""
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customer.kom_bench import compare_to_baseline, generate_bench_workbooks, run_benchmarks
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'kom_bench_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark parse_kom_excel on synthetic KOM workbooks and compare against a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement (default: 20)')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help='Baseline JSON file (default: customer/kom_bench_baseline.json)')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results as the new baseline instead of comparing')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown or memory growth as a fraction (default: 0.25)')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+        parser.add_argument('--workbooks', help='Directory to keep the generated workbooks in (default: temporary)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            workbooks = generate_bench_workbooks(options['workbooks'] or tmp_dir)
+            results = run_benchmarks(workbooks, repeat=options['repeat'])
+
+        self.report(results)
+        if options['output']:
+            self.write_json(options['output'], results)
+
+        if options['save_baseline']:
+            self.write_json(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                f"No baseline at {options['baseline']}; run with --save-baseline to create one."))
+            return
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, options['tolerance'])
+        for what, expected, current in regressions:
+            self.stderr.write(self.style.ERROR(f'REGRESSION {what}: {expected} -> {current}'))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) over {options['tolerance']:.0%} tolerance.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions over {options['tolerance']:.0%} tolerance."))
+
+    def report(self, results):
+        """Per-workbook table, then the slowest sections on average"""
+        self.stdout.write(f"{'workbook':<32} {'load ms':>9} {'total ms':>9} {'peak KB':>9}")
+        for name, result in results['workbooks'].items():
+            self.stdout.write(f"{name:<32} {result['load_ms']:>9.2f} {result['total_ms']:>9.2f} {result['peak_kb']:>9.1f}")
+        summary = results['summary']
+        self.stdout.write(f"{'mean':<32} {summary['load_ms']:>9.2f} {summary['total_ms']:>9.2f} {summary['peak_kb']:>9.1f}")
+
+        self.stdout.write('\nSlowest sections (mean ms, grid already loaded):')
+        sections = sorted(summary['sections'].items(), key=lambda item: item[1], reverse=True)
+        for title, ms in sections[:10]:
+            self.stdout.write(f'  {title:<40} {ms:.4f}')
+
+    def write_json(self, path, results):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
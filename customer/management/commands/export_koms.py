@@ -0,0 +1,37 @@
+"""Columnar export of the KOM archive: manage.py export_koms [--format csv|parquet] [--output-dir DIR]"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customer import kom_tables
+from customer.kom_tables import EXPORT_CHUNK_SIZE, KOM_TABLES, write_table_csv, write_table_parquet
+from customer.models import KOMForm
+
+
+class Command(BaseCommand):
+    help = ('Export every KOM form, line item and equipment row to flat tables (one file per table, '
+            'joined by kom_form_id) for spreadsheets and analysis tools')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='.', help='Directory the table files are written to (default: .)')
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                            help='csv (default) or parquet (requires pyarrow)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help=f'Rows read per query and written per chunk (default: {EXPORT_CHUNK_SIZE})')
+        parser.add_argument('--job', help='Only forms whose job number starts with this')
+
+    def handle(self, *args, **options):
+        if options['format'] == 'parquet' and kom_tables.pyarrow is None:
+            raise CommandError('Parquet export requires pyarrow (pip install pyarrow).')
+        write = write_table_parquet if options['format'] == 'parquet' else write_table_csv
+        os.makedirs(options['output_dir'], exist_ok=True)
+        kom_forms = KOMForm.objects.filter(job_number__startswith=options['job']) if options['job'] else None
+
+        start = time.perf_counter()
+        for table in KOM_TABLES:
+            path = os.path.join(options['output_dir'], f'{table}.{options["format"]}')
+            table_start = time.perf_counter()
+            count = write(table, path, kom_forms, options['chunk_size'])
+            self.stdout.write(f'{path}: {count} row(s) in {time.perf_counter() - table_start:.1f}s')
+        self.stdout.write(self.style.SUCCESS(f'Exported {len(KOM_TABLES)} table(s) in {time.perf_counter() - start:.1f}s.'))
@@ -0,0 +1,169 @@
+"""Bulk import of KOM Excel files: manage.py import_koms <dir-or-glob> [...]"""
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from customer.models import KOMForm
+from customer.services import (
+    build_kom_form, cache_parses, get_cached_parses, hash_file, save_kom_forms, store_kom_file,
+)
+from customer.utils import parse_kom_file
+
+
+def is_kom_workbook(name):
+    """openpyxl-readable workbook, skipping Excel's ~$ lock files"""
+    return name.lower().endswith(('.xlsx', '.xlsm')) and not name.startswith('~$')
+
+
+def find_kom_files(patterns):
+    """Expand directories (searched recursively) and glob patterns into a sorted list of workbook paths"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in files if is_kom_workbook(name))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True)
+                         if os.path.isfile(path) and is_kom_workbook(os.path.basename(path)))
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+class Command(BaseCommand):
+    help = 'Import KOM Excel files in bulk, parsing them in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Directories (searched recursively) or glob patterns')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of parser processes (default: one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of files saved per transaction (default: 100)')
+        parser.add_argument('--no-copy', dest='copy', action='store_false',
+                            help='Record the original path instead of copying each file into '
+                                 'MEDIA_ROOT/kom_files like the upload form')
+        parser.add_argument('--user', help='Username recorded as created_by')
+        parser.add_argument('--force', action='store_true',
+                            help='Also import files whose path or content has already been imported')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and report without saving')
+        parser.add_argument('--profile', action='store_true',
+                            help='Record per-section parse timings (_profile) and re-parse cached files')
+
+    def handle(self, *args, **options):
+        files = find_kom_files(options['paths'])
+        if not files:
+            raise CommandError('No KOM workbooks found.')
+
+        self.user = None
+        self.new_parses = {}
+        if options['user']:
+            try:
+                self.user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        # Hash up front: already-imported content is skipped and cached parses are reused
+        hashes = {path: hash_file(path) for path in files}
+        skipped = 0
+        if not options['force']:
+            existing = set(KOMForm.objects.exclude(file_sha256='').values_list('file_sha256', flat=True))
+            # Copies get a new path, so only the content hash tells them apart
+            existing_paths = set() if options['copy'] else set(
+                KOMForm.objects.exclude(file_path=None).values_list('file_path', flat=True))
+            kept = []
+            for path in files:
+                if path in existing_paths or hashes[path] in existing:
+                    skipped += 1
+                    continue
+                # Identical copies within this run are imported once
+                existing.add(hashes[path])
+                kept.append(path)
+            files = kept
+
+        # Profiling needs a fresh parse of every file
+        cached = {} if options['profile'] else get_cached_parses({hashes[path] for path in files})
+        to_parse = [path for path in files if hashes[path] not in cached]
+
+        self.imported = 0
+        self.failed = 0
+        verbose = options['verbosity'] >= 2
+        start = time.perf_counter()
+        pending = []
+
+        self.stdout.write(f'Parsing {len(to_parse)} file(s), {len(files) - len(to_parse)} cached...')
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            # map() yields in submission order, so the report is stable between runs
+            parse = partial(parse_kom_file, profile=True) if options['profile'] else parse_kom_file
+            parsed = executor.map(parse, to_parse, chunksize=4)
+            for path in files:
+                sha256 = hashes[path]
+                if sha256 in cached:
+                    data, seconds, error, status = cached[sha256], 0.0, None, 'CACHED'
+                else:
+                    _, data, seconds, error = next(parsed)
+                    status = 'OK'
+                if error:
+                    self.failed += 1
+                    self.stderr.write(self.style.ERROR(f'FAILED {path} ({seconds:.2f}s): {error}'))
+                    continue
+
+                warnings = data.get('_validation_warnings', [])
+                line = f'{status:<6} {path} ({seconds:.2f}s, {len(warnings)} warning(s))'
+                self.stdout.write(self.style.WARNING(line) if warnings else line)
+                if verbose:
+                    for warning in warnings:
+                        self.stdout.write(f'         {warning}')
+
+                if status == 'OK':
+                    cached[sha256] = data
+                    self.new_parses[sha256] = data
+                if options['dry_run']:
+                    continue
+                file_path = store_kom_file(path, os.path.basename(path), sha256=sha256) if options['copy'] else path
+                pending.append((path, file_path, sha256, data))
+                if len(pending) >= options['batch_size']:
+                    self.save_batch(pending)
+                    pending = []
+
+        if pending:
+            self.save_batch(pending)
+        self.flush_cache()
+
+        elapsed = time.perf_counter() - start
+        if options['dry_run']:
+            summary = f'Parsed {len(files) - self.failed} file(s) in {elapsed:.1f}s (dry run)'
+        else:
+            summary = f'Imported {self.imported} file(s) in {elapsed:.1f}s'
+        summary += f'; {self.failed} failed, {skipped} already imported.'
+        self.stdout.write(self.style.ERROR(summary) if self.failed else self.style.SUCCESS(summary))
+
+    def flush_cache(self):
+        """Store parse results from this run so later imports of the same content skip parsing"""
+        if self.new_parses:
+            cache_parses(self.new_parses)
+            self.new_parses = {}
+
+    def build(self, path, file_path, sha256, data):
+        return build_kom_form(data, created_by=self.user, source_file=os.path.basename(path),
+                              file_path=file_path, file_sha256=sha256)
+
+    def save_batch(self, pending):
+        """Save parsed files in one transaction; if that fails, retry one by one to isolate the bad file"""
+        self.flush_cache()
+        if len(pending) > 1:
+            try:
+                save_kom_forms([self.build(*item) for item in pending])
+                self.imported += len(pending)
+                return
+            except Exception:
+                pass
+        for item in pending:
+            try:
+                save_kom_forms([self.build(*item)])
+                self.imported += 1
+            except Exception as e:
+                self.failed += 1
+                self.stderr.write(self.style.ERROR(f'FAILED {item[0]} (save): {type(e).__name__}: {e}'))
@@ -0,0 +1,19 @@
+"""Rebuild the KOM full-text search index: manage.py rebuild_kom_search"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from customer.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search document of every KOM form (migration 0011 indexes existing forms; run this if search results look stale)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of forms indexed per query (default: 500)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} KOM form(s) in {time.perf_counter() - start:.1f}s.'))
@@ -0,0 +1,116 @@
+"""Check and repair the KOM file-location index: manage.py reconcile_kom_files [--search DIR ...]"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from customer.models import KOMFileLocation, KOMForm
+from customer.services import hash_file, resolve_kom_file
+
+
+class Command(BaseCommand):
+    help = ('Check that every KOM form still points at its workbook; files that were moved or renamed '
+            'are found again by content hash and missing ones are flagged for the KOM list')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', action='append', default=[], metavar='DIR',
+                            help='Extra directory searched for moved files (repeatable; MEDIA_ROOT/kom_files is always searched)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without saving anything')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        now = timezone.now()
+
+        # Forms imported before the index existed (or saved outside save_kom_forms)
+        unindexed = (KOMForm.objects.filter(file_location__isnull=True).exclude(file_path=None).exclude(file_path='')
+                     .only('file_path', 'file_sha256'))
+        new_locations = [KOMFileLocation(kom_form=kom_form, sha256=kom_form.file_sha256, path=kom_form.file_path)
+                         for kom_form in unindexed]
+        if new_locations and not dry_run:
+            KOMFileLocation.objects.bulk_create(new_locations, ignore_conflicts=True)
+
+        locations = list(KOMFileLocation.objects.select_related('kom_form').only(
+            'path', 'sha256', 'missing', 'verified_at', 'kom_form__file_path', 'kom_form__file_sha256',
+            'kom_form__source_file', 'kom_form__proposal_number',
+        ))
+        if dry_run:
+            locations += new_locations
+
+        ok, repaired, missing = [], [], []
+        unresolved = []
+        for location in locations:
+            path = resolve_kom_file(location.kom_form, location)
+            if path is None:
+                unresolved.append(location)
+            elif path == location.path and not location.missing:
+                ok.append(location)
+            else:
+                location.path = path
+                repaired.append(location)
+
+        if unresolved:
+            # One walk over the search roots, then candidates are matched by name and confirmed by hash
+            by_name = self.index_files(options['search'])
+            for location in unresolved:
+                path = self.find_by_hash(location, by_name)
+                if path is None:
+                    missing.append(location)
+                else:
+                    location.path = path
+                    repaired.append(location)
+
+        for location in ok + repaired:
+            location.missing = False
+            location.verified_at = now
+        for location in missing:
+            location.missing = True
+            location.verified_at = now
+
+        if not dry_run:
+            KOMFileLocation.objects.bulk_update(ok + repaired + missing, ['path', 'missing', 'verified_at'], batch_size=500)
+            kom_forms = []
+            for location in repaired:
+                if location.kom_form.file_path != location.path:
+                    location.kom_form.file_path = location.path
+                    kom_forms.append(location.kom_form)
+            KOMForm.objects.bulk_update(kom_forms, ['file_path'], batch_size=500)
+
+        for location in repaired:
+            self.stdout.write(f'Repaired {location.kom_form.proposal_number or location.kom_form_id}: {location.path}')
+        for location in missing:
+            self.stdout.write(self.style.WARNING(
+                f'Missing {location.kom_form.proposal_number or location.kom_form_id}: {location.kom_form.source_file} (last seen at {location.path})'
+            ))
+        prefix = '[dry run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{len(ok)} ok, {len(repaired)} repaired, {len(missing)} missing ({len(new_locations)} newly indexed).'
+        ))
+
+    def index_files(self, search_dirs):
+        """{file name: [absolute paths]} of every file under MEDIA_ROOT/kom_files and the search dirs"""
+        roots = list(search_dirs)
+        if settings.MEDIA_ROOT:
+            roots.insert(0, os.path.join(str(settings.MEDIA_ROOT), 'kom_files'))
+        by_name = {}
+        for root_dir in roots:
+            for root, dirs, files in os.walk(root_dir):
+                for name in files:
+                    by_name.setdefault(name, []).append(os.path.abspath(os.path.join(root, name)))
+        return by_name
+
+    def find_by_hash(self, location, by_name):
+        sha256 = location.sha256 or location.kom_form.file_sha256
+        names = {location.kom_form.source_file, os.path.basename(location.path), os.path.basename(location.kom_form.file_path)}
+        candidates = [path for name in names if name for path in by_name.get(name, [])]
+        if not sha256:
+            # Without a hash only an unambiguous name match is trusted
+            return candidates[0] if len(set(candidates)) == 1 else None
+        for path in candidates:
+            try:
+                if hash_file(path) == sha256:
+                    return path
+            except OSError:
+                continue
+        return None
@@ -0,0 +1,83 @@
+"""Re-derive KOM form columns and rows after a parser fix: manage.py reextract_koms [--reparse]"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from customer.models import KOMEquipmentRequired, KOMForm, KOMLineItem
+from customer.services import hash_file, parse_kom_cached, reextract_kom_form, resolve_kom_file, save_reextracted
+
+
+class Command(BaseCommand):
+    help = ('Re-derive every structured column, flat_data and line item / equipment row of saved KOM forms '
+            'from raw_data (or, with --reparse, from the stored workbook); only forms that changed are written')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of forms read and written per batch (default: 500)')
+        parser.add_argument('--reparse', action='store_true',
+                            help='Parse the stored workbook again first (forms whose file is missing keep their raw_data)')
+        parser.add_argument('--ids', type=int, nargs='+', metavar='ID', help='Only these KOM form ids')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without saving')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        kom_forms = KOMForm.objects.order_by('pk').prefetch_related(
+            Prefetch('line_items', queryset=KOMLineItem.objects.order_by('pk')),
+            Prefetch('equipment_required', queryset=KOMEquipmentRequired.objects.order_by('pk')),
+        )
+        if options['ids']:
+            kom_forms = kom_forms.filter(pk__in=options['ids'])
+        if options['reparse']:
+            kom_forms = kom_forms.select_related('file_location')
+
+        start = time.perf_counter()
+        self.checked = self.updated = self.unreadable = 0
+        self.fields = {}
+        batch = []
+        for kom_form in kom_forms.iterator(chunk_size=batch_size):
+            raw_data = self.reparse(kom_form) if options['reparse'] else None
+            changed, line_items, equipment_required = reextract_kom_form(kom_form, raw_data)
+            batch.append((kom_form, changed, line_items, equipment_required))
+            if len(batch) >= batch_size:
+                self.save_batch(batch, dry_run)
+                batch = []
+        if batch:
+            self.save_batch(batch, dry_run)
+
+        for name, count in sorted(self.fields.items(), key=lambda item: (-item[1], item[0])):
+            self.stdout.write(f'  {name}: {count}')
+        elapsed = time.perf_counter() - start
+        summary = (f'{"Would update" if dry_run else "Updated"} {self.updated} of {self.checked} KOM form(s) '
+                   f'in {elapsed:.1f}s')
+        if options['reparse']:
+            summary += f'; {self.unreadable} workbook(s) missing or unreadable'
+        self.stdout.write(self.style.SUCCESS(summary + '.'))
+
+    def reparse(self, kom_form):
+        """Fresh parse of the form's workbook, or None to keep its raw_data"""
+        path = resolve_kom_file(kom_form, getattr(kom_form, 'file_location', None))
+        if path is None:
+            self.unreadable += 1
+            return None
+        try:
+            return parse_kom_cached(path, kom_form.file_sha256 or hash_file(path))
+        except Exception as e:
+            self.unreadable += 1
+            self.stderr.write(self.style.ERROR(f'FAILED {path}: {type(e).__name__}: {e}'))
+            return None
+
+    def save_batch(self, batch, dry_run):
+        self.checked += len(batch)
+        changed = [result for result in batch if result[1] or result[2] is not None or result[3] is not None]
+        for _, fields, line_items, equipment_required in changed:
+            for name in fields:
+                self.fields[name] = self.fields.get(name, 0) + 1
+            if line_items is not None:
+                self.fields['line items'] = self.fields.get('line items', 0) + 1
+            if equipment_required is not None:
+                self.fields['equipment rows'] = self.fields.get('equipment rows', 0) + 1
+        self.updated += len(changed)
+        if not dry_run:
+            save_reextracted(changed)
@@ -0,0 +1,15 @@
+"""Rebuild the KOM analytics summary table: manage.py refresh_kom_summary"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from customer.analytics import refresh_kom_summary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the KOM analytics rollup from every KOM form (run once after upgrading; imports keep it current)'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = refresh_kom_summary()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} summary row(s) in {time.perf_counter() - start:.1f}s.'))
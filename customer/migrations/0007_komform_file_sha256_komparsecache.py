@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0006_komform_job_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='komform',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the imported workbook', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='KOMParseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('parser_version', models.PositiveIntegerField()),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'KOM Parse Cache',
+                'verbose_name_plural': 'KOM Parse Cache',
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'parser_version'), name='unique_kom_parse_cache')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0007_komform_file_sha256_komparsecache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KOMImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('parsing', 'Parsing'), ('saving', 'Saving'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('source_file', models.CharField(blank=True, max_length=255)),
+                ('file_path', models.CharField(max_length=1000)),
+                ('file_sha256', models.CharField(blank=True, max_length=64)),
+                ('messages', models.JSONField(blank=True, default=list, help_text='[level, text] pairs shown once the import finishes')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('kom_form', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='customer.komform')),
+            ],
+            options={
+                'verbose_name': 'KOM Import Job',
+                'verbose_name_plural': 'KOM Import Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
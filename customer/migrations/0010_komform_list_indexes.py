@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0008_komimportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='komform',
+            index=models.Index(fields=['job_number', '-created_at', '-id'], name='komform_list_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='komform',
+            index=models.Index(fields=['bill_to_company'], name='komform_bill_to_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='komform',
+            index=models.Index(fields=['sales_rep'], name='komform_sales_rep_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='komform',
+            index=models.Index(fields=['proposal_date'], name='komform_proposal_date_idx'),
+        ),
+    ]
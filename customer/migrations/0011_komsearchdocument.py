@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# SQLite: FTS5 index over customer_komsearchdocument (external content), kept in sync by triggers
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE customer_komsearch_fts USING fts5("
+    "document, content='customer_komsearchdocument', content_rowid='kom_form_id')",
+    "CREATE TRIGGER customer_komsearch_ai AFTER INSERT ON customer_komsearchdocument BEGIN "
+    "INSERT INTO customer_komsearch_fts(rowid, document) VALUES (new.kom_form_id, new.document); END",
+    "CREATE TRIGGER customer_komsearch_ad AFTER DELETE ON customer_komsearchdocument BEGIN "
+    "INSERT INTO customer_komsearch_fts(customer_komsearch_fts, rowid, document) "
+    "VALUES ('delete', old.kom_form_id, old.document); END",
+    "CREATE TRIGGER customer_komsearch_au AFTER UPDATE ON customer_komsearchdocument BEGIN "
+    "INSERT INTO customer_komsearch_fts(customer_komsearch_fts, rowid, document) "
+    "VALUES ('delete', old.kom_form_id, old.document); "
+    "INSERT INTO customer_komsearch_fts(rowid, document) VALUES (new.kom_form_id, new.document); END",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS customer_komsearch_ai",
+    "DROP TRIGGER IF EXISTS customer_komsearch_ad",
+    "DROP TRIGGER IF EXISTS customer_komsearch_au",
+    "DROP TABLE IF EXISTS customer_komsearch_fts",
+]
+# Postgres: GIN index on the same tsvector expression customer.search queries with
+POSTGRES_CREATE = [
+    "CREATE INDEX customer_komsearch_gin ON customer_komsearchdocument "
+    "USING GIN (to_tsvector('simple', document))",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS customer_komsearch_gin"]
+
+
+def run_for_vendor(sqlite, postgres):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in sqlite if vendor == 'sqlite' else postgres if vendor == 'postgresql' else []:
+            schema_editor.execute(sql)
+    return run
+
+
+def _search_document(kom_form):
+    # Frozen copy of customer.search.build_search_document at the time: the KOM_SCHEMA values are
+    # raw_data's top-level scalars (in schema order), skipping flags and the _warnings/_profile keys
+    lines = [
+        str(value) for key, value in (kom_form.raw_data or {}).items()
+        if not key.startswith('_') and not isinstance(value, (bool, list, dict)) and value not in (None, '')
+    ]
+    for item in kom_form.line_items.all():
+        lines.append(' '.join(part for part in (item.item_number, item.description) if part))
+    for eq in kom_form.equipment_required.all():
+        lines.append(' '.join(part for part in (eq.equipment_type, eq.kn_number, eq.description) if part))
+    return '\n'.join(line for line in lines if line.strip())
+
+
+def index_existing_forms(apps, schema_editor):
+    """Index the forms saved before search existed, 500 at a time (the triggers above fill the FTS5 table)"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    KOMSearchDocument = apps.get_model('customer', 'KOMSearchDocument')
+    kom_forms = KOMForm.objects.only('raw_data').prefetch_related('line_items', 'equipment_required').order_by('pk')
+    batch = []
+    for kom_form in kom_forms.iterator(chunk_size=500):
+        batch.append(KOMSearchDocument(kom_form=kom_form, document=_search_document(kom_form)))
+        if len(batch) >= 500:
+            KOMSearchDocument.objects.bulk_create(batch)
+            batch = []
+    KOMSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0010_komform_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KOMSearchDocument',
+            fields=[
+                ('kom_form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='customer.komform')),
+                ('document', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'KOM Search Document',
+                'verbose_name_plural': 'KOM Search Documents',
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor(SQLITE_CREATE, POSTGRES_CREATE),
+            run_for_vendor(SQLITE_DROP, POSTGRES_DROP),
+        ),
+        migrations.RunPython(index_existing_forms, migrations.RunPython.noop),
+    ]
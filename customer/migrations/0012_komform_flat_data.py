@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0011_komsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='komform',
+            name='flat_data',
+            field=models.JSONField(blank=True, default=dict, help_text='Flattened raw_data used by KOM comparisons'),
+        ),
+    ]
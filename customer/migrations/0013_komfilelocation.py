@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_locations(apps, schema_editor):
+    """Start every existing form's location at its stored file_path; reconcile_kom_files verifies them"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    KOMFileLocation = apps.get_model('customer', 'KOMFileLocation')
+    batch = []
+    forms = KOMForm.objects.exclude(file_path=None).exclude(file_path='').values_list('pk', 'file_sha256', 'file_path')
+    for pk, sha256, file_path in forms.iterator(chunk_size=500):
+        batch.append(KOMFileLocation(kom_form_id=pk, sha256=sha256, path=file_path))
+        if len(batch) >= 500:
+            KOMFileLocation.objects.bulk_create(batch)
+            batch = []
+    KOMFileLocation.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0012_komform_flat_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KOMFileLocation',
+            fields=[
+                ('kom_form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='file_location', serialize=False, to='customer.komform')),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('path', models.CharField(max_length=1000)),
+                ('missing', models.BooleanField(db_index=True, default=False, help_text='File was not found at path when last checked')),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'KOM File Location',
+                'verbose_name_plural': 'KOM File Locations',
+            },
+        ),
+        migrations.RunPython(backfill_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0013_komfilelocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KOMSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month of the proposal date (import date when missing)')),
+                ('industry', models.CharField(blank=True, max_length=100)),
+                ('sales_rep', models.CharField(blank=True, max_length=100)),
+                ('equipment_type', models.CharField(blank=True, max_length=50)),
+                ('form_count', models.IntegerField(default=0)),
+                ('capital_sell_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('capital_equip_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('capital_freight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('capital_net_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('install_sell_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('install_net_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('labor_pkg', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('labor_fab', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('labor_wiring', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'KOM Summary',
+                'verbose_name_plural': 'KOM Summaries',
+                'ordering': ['period', 'industry', 'sales_rep', 'equipment_type'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'industry', 'sales_rep', 'equipment_type'), name='komsummary_unique_key')],
+            },
+        ),
+    ]
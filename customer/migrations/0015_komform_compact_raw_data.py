@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:10
+
+import customer.kom_codec
+from django.db import migrations
+
+
+def pack_raw_data(apps, schema_editor):
+    """Copy each form's JSON raw_data into the compact column, 500 rows at a time"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, raw_data in KOMForm.objects.values_list('pk', 'raw_data').iterator(chunk_size=500):
+        batch.append(KOMForm(pk=pk, raw_data_packed=raw_data))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['raw_data_packed'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['raw_data_packed'])
+
+
+def unpack_raw_data(apps, schema_editor):
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, raw_data in KOMForm.objects.values_list('pk', 'raw_data_packed').iterator(chunk_size=500):
+        batch.append(KOMForm(pk=pk, raw_data=raw_data))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['raw_data'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['raw_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0014_komsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='komform',
+            name='raw_data_packed',
+            field=customer.kom_codec.CompactJSONField(blank=True, default=dict, null=True),
+        ),
+        migrations.RunPython(pack_raw_data, unpack_raw_data),
+        migrations.RemoveField(
+            model_name='komform',
+            name='raw_data',
+        ),
+        migrations.RenameField(
+            model_name='komform',
+            old_name='raw_data_packed',
+            new_name='raw_data',
+        ),
+        migrations.AlterField(
+            model_name='komform',
+            name='raw_data',
+            field=customer.kom_codec.CompactJSONField(blank=True, default=dict, help_text='Raw parsed data from Excel file', null=True),
+        ),
+    ]
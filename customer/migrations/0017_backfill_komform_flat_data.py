@@ -0,0 +1,83 @@
+from django.db import migrations
+
+# Frozen copy of customer.kom_diff.flatten_kom at FLAT_DATA_VERSION 1, so this migration keeps writing
+# the same flat_data whatever happens to kom_diff later (reextract_koms rebuilds it for newer versions)
+FLAT_DATA_VERSION = 1
+
+ROW_KEYS = {
+    'line_items': 'item_number',
+    'equipment_required': 'equipment_type',
+}
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip() or None
+    if value is False:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _flatten_value(flat, key, value):
+    if isinstance(value, dict):
+        for name, item in value.items():
+            _flatten_value(flat, f'{key}.{name}', item)
+    elif isinstance(value, list):
+        for index, item in enumerate(value, start=1):
+            _flatten_value(flat, f'{key}[{index}]', item)
+    else:
+        value = _normalize(value)
+        if value is not None:
+            flat[key] = value
+
+
+def _flatten_rows(flat, name, rows, key_field):
+    seen = {}
+    for row in rows or []:
+        row_key = str(row.get(key_field) or '').strip() or '?'
+        seen[row_key] = seen.get(row_key, 0) + 1
+        if seen[row_key] > 1:
+            row_key = f'{row_key}#{seen[row_key]}'
+        flat[f'{name}[{row_key}]'] = row_key
+        for field, value in row.items():
+            if field != key_field:
+                _flatten_value(flat, f'{name}[{row_key}].{field}', value)
+
+
+def flatten_kom(raw_data):
+    flat = {'_version': FLAT_DATA_VERSION}
+    for key, value in (raw_data or {}).items():
+        if key.startswith('_'):
+            continue
+        if key in ROW_KEYS:
+            _flatten_rows(flat, key, value, ROW_KEYS[key])
+        else:
+            _flatten_value(flat, key, value)
+    return flat
+
+
+def backfill_flat_data(apps, schema_editor):
+    """Flatten raw_data of forms saved before flat_data existed, 500 rows at a time"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, raw_data, flat_data in KOMForm.objects.values_list('pk', 'raw_data', 'flat_data').iterator(chunk_size=500):
+        if flat_data and flat_data.get('_version') == FLAT_DATA_VERSION:
+            continue
+        batch.append(KOMForm(pk=pk, flat_data=flatten_kom(raw_data)))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['flat_data'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['flat_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0015_komform_compact_raw_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_flat_data, migrations.RunPython.noop),
+    ]
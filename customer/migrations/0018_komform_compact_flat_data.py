@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+import customer.kom_codec
+from django.db import migrations
+
+
+def pack_flat_data(apps, schema_editor):
+    """Copy each form's JSON flat_data into the compact column, 500 rows at a time"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, flat_data in KOMForm.objects.values_list('pk', 'flat_data').iterator(chunk_size=500):
+        batch.append(KOMForm(pk=pk, flat_data_packed=flat_data or {}))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['flat_data_packed'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['flat_data_packed'])
+
+
+def unpack_flat_data(apps, schema_editor):
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, flat_data in KOMForm.objects.values_list('pk', 'flat_data_packed').iterator(chunk_size=500):
+        batch.append(KOMForm(pk=pk, flat_data=flat_data or {}))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['flat_data'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['flat_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0017_backfill_komform_flat_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='komform',
+            name='flat_data_packed',
+            field=customer.kom_codec.CompactJSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(pack_flat_data, unpack_flat_data),
+        migrations.RemoveField(
+            model_name='komform',
+            name='flat_data',
+        ),
+        migrations.RenameField(
+            model_name='komform',
+            old_name='flat_data_packed',
+            new_name='flat_data',
+        ),
+        migrations.AlterField(
+            model_name='komform',
+            name='flat_data',
+            field=customer.kom_codec.CompactJSONField(blank=True, default=dict, help_text='Flattened raw_data used by KOM comparisons'),
+        ),
+    ]
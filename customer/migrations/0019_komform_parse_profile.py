@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_parse_profiles(apps, schema_editor):
+    """Copy raw_data['_profile'] of forms parsed with profiling into parse_profile, 500 rows at a time"""
+    KOMForm = apps.get_model('customer', 'KOMForm')
+    batch = []
+    for pk, raw_data in KOMForm.objects.values_list('pk', 'raw_data').iterator(chunk_size=500):
+        if not raw_data or '_profile' not in raw_data:
+            continue
+        batch.append(KOMForm(pk=pk, parse_profile=raw_data['_profile']))
+        if len(batch) >= 500:
+            KOMForm.objects.bulk_update(batch, ['parse_profile'])
+            batch = []
+    KOMForm.objects.bulk_update(batch, ['parse_profile'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0018_komform_compact_flat_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='komform',
+            name='parse_profile',
+            field=models.JSONField(blank=True, help_text='Per-section parse timings, when profiled', null=True),
+        ),
+        migrations.RunPython(copy_parse_profiles, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='komform',
+            index=models.Index(condition=models.Q(('parse_profile__isnull', False)), fields=['created_at'], name='komform_profiled_idx'),
+        ),
+    ]
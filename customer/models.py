@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .kom_codec import CompactJSONField
+
 
 class KOMForm(models.Model):
     """Main KOM (Kick Off Meeting) form - captures everything from the CSV"""
@@ -260,7 +262,12 @@ class KOMForm(models.Model):
     eng_extra_forklift_or_scissor_lift_reqd = models.BooleanField(default=False)
     
     # Raw parsed data stored as JSON for comparison and flexible extraction
-    raw_data = models.JSONField(default=dict, blank=True, null=True, help_text="Raw parsed data from Excel file as JSON")
+    # Stored compactly (versioned positional record, compressed); reads back as the parsed dict, see customer.kom_codec
+    raw_data = CompactJSONField(default=dict, blank=True, null=True, help_text="Raw parsed data from Excel file")
+    # raw_data flattened to key -> value for comparing forms (see customer.kom_diff), stored with the same codec
+    flat_data = CompactJSONField(default=dict, blank=True, help_text="Flattened raw_data used by KOM comparisons")
+    # raw_data['_profile'] of forms parsed with profiling on (NULL otherwise), kept queryable for the profile page
+    parse_profile = models.JSONField(blank=True, null=True, help_text="Per-section parse timings, when profiled")
     
     def get_raw_data(self):
         """Safely get raw_data, returning empty dict if None or field doesn't exist"""
@@ -276,9 +283,13 @@ class KOMForm(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     source_file = models.CharField(max_length=255, blank=True)  # Original filename
     file_path = models.CharField(max_length=1000, blank=True, null=True)  # Full path to the original file
+    file_sha256 = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the imported workbook")
     
     def extract_from_raw_data(self):
-        """Extract structured fields from raw_data JSON"""
+        """
+        Extract structured fields from raw_data JSON using the shared KOM field schema.
+        Saved forms (with their line items and equipment rows) are re-derived in bulk by reextract_koms.
+        """
         try:
             if not self.raw_data:
                 return
@@ -286,104 +297,27 @@ class KOMForm(models.Model):
             # Field doesn't exist yet
             return
         
-        from decimal import Decimal
-        from datetime import datetime
-        
-        def get_value(key, default=None):
-            """Helper to get value from raw_data with type conversion"""
-            val = self.raw_data.get(key, default)
-            if val is None or val == '':
-                return default
-            return val
-        
-        def parse_date_from_json(val):
-            """Parse date from JSON string"""
-            if not val:
-                return None
-            if isinstance(val, str):
-                for fmt in ('%Y-%m-%d', '%m/%d/%y', '%m/%d/%Y'):
-                    try:
-                        return datetime.strptime(val, fmt).date()
-                    except ValueError:
-                        pass
-            return None
-        
-        def parse_decimal_from_json(val):
-            """Parse decimal from JSON"""
-            if val is None or val == '':
-                return None
-            if isinstance(val, (int, float)):
-                return Decimal(str(val))
-            if isinstance(val, str):
-                val_str = val.replace('$', '').replace(',', '').strip()
-                try:
-                    return Decimal(val_str)
-                except:
-                    return None
-            return None
-        
-        # Extract all fields from raw_data
-        # This allows flexible field mapping and handles variations in file formats
-        self.proposal_number = get_value('proposal_number', '')
-        self.proposal_date = parse_date_from_json(get_value('proposal_date'))
-        self.sales_rep = get_value('sales_rep', '')
-        self.date_of_oc = parse_date_from_json(get_value('date_of_oc'))
-        self.industry = get_value('industry', '')
-        self.industry_subcategory = get_value('industry_subcategory', '')
-        self.discount = parse_decimal_from_json(get_value('discount'))
-        self.po_number = get_value('po_number', '')
-        
-        # Commissions
-        self.comm_1_inside_percent = parse_decimal_from_json(get_value('comm_1_inside_percent'))
-        self.comm_1_inside_name = get_value('comm_1_inside_name', '')
-        self.comm_2_inside_percent = parse_decimal_from_json(get_value('comm_2_inside_percent'))
-        self.comm_2_inside_name = get_value('comm_2_inside_name', '')
-        self.comm_outside_amount = parse_decimal_from_json(get_value('comm_outside_amount'))
-        self.comm_outside_name = get_value('comm_outside_name', '')
+        from .kom_schema import model_values
         
-        # BILL TO
-        self.bill_to_name = get_value('bill_to_name', '')
-        self.bill_to_phone = get_value('bill_to_phone', '')
-        self.bill_to_email = get_value('bill_to_email', '')
-        self.bill_to_company = get_value('bill_to_company', '')
-        self.bill_to_address = get_value('bill_to_address', '')
-        self.bill_to_city = get_value('bill_to_city', '')
-        self.bill_to_state = get_value('bill_to_state', '')
-        self.bill_to_zip = get_value('bill_to_zip', '')
-        
-        # SHIP TO
-        self.ship_to_name = get_value('ship_to_name', '')
-        self.ship_to_phone = get_value('ship_to_phone', '')
-        self.ship_to_email = get_value('ship_to_email', '')
-        self.ship_to_company = get_value('ship_to_company', '')
-        self.ship_to_address = get_value('ship_to_address', '')
-        self.ship_to_city = get_value('ship_to_city', '')
-        self.ship_to_state = get_value('ship_to_state', '')
-        self.ship_to_zip = get_value('ship_to_zip', '')
-        
-        # Tax Information
-        self.tax_exempt = bool(get_value('tax_exempt', False))
-        self.exempt_cert_in_hand = bool(get_value('exempt_cert_in_hand', False))
-        self.tax_action_who = get_value('tax_action_who', '')
-        self.tax_action_when = parse_date_from_json(get_value('tax_action_when'))
-        self.confirm_tax_status_noted = bool(get_value('confirm_tax_status_noted', False))
-        self.customer_in_sage = bool(get_value('customer_in_sage', False))
-        
-        # Payment Milestones
-        for i in range(1, 6):
-            setattr(self, f'payment_milestone_{i}_event', get_value(f'payment_milestone_{i}_event', ''))
-            setattr(self, f'payment_milestone_{i}_percent', parse_decimal_from_json(get_value(f'payment_milestone_{i}_percent')))
-            setattr(self, f'payment_milestone_{i}_terms', get_value(f'payment_milestone_{i}_terms', ''))
-            setattr(self, f'payment_milestone_{i}_notes', get_value(f'payment_milestone_{i}_notes', ''))
-        
-        # Continue with all other fields...
-        # (This is a simplified version - you'd want to extract all fields)
-        # For now, we'll extract the most common ones and let the import view handle the rest
+        # Every column declared in KOM_SCHEMA, coerced to its model type
+        for key, value in model_values(self.raw_data).items():
+            setattr(self, key, value)
     
     class Meta:
         verbose_name = "KOM Form"
         verbose_name_plural = "KOM Forms"
         ordering = ['-proposal_date', '-created_at']
+        indexes = [
+            # KOM list order and keyset pagination (see views.KOM_LIST_ORDER)
+            models.Index(fields=['job_number', '-created_at', '-id'], name='komform_list_order_idx'),
+            # KOM list filters
+            models.Index(fields=['bill_to_company'], name='komform_bill_to_company_idx'),
+            models.Index(fields=['sales_rep'], name='komform_sales_rep_idx'),
+            models.Index(fields=['proposal_date'], name='komform_proposal_date_idx'),
+            # Profile page (only the few profiled forms are indexed)
+            models.Index(fields=['created_at'], condition=models.Q(parse_profile__isnull=False),
+                         name='komform_profiled_idx'),
+        ]
     
     def __str__(self):
         return f"KOM {self.proposal_number} - {self.project_name or 'No Project Name'}"
@@ -422,3 +356,126 @@ class KOMEquipmentRequired(models.Model):
     
     def __str__(self):
         return f"{self.equipment_type} - {self.description}"
+
+
+class KOMSearchDocument(models.Model):
+    """
+    Flattened text of a KOM form (raw_data values, line items, equipment) for full-text search.
+    Indexed by SQLite FTS5 or a Postgres GIN index, see customer.search.
+    """
+    kom_form = models.OneToOneField(KOMForm, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    document = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "KOM Search Document"
+        verbose_name_plural = "KOM Search Documents"
+    
+    def __str__(self):
+        return f"Search document for {self.kom_form}"
+
+
+class KOMSummary(models.Model):
+    """
+    Precomputed KOM totals per month, industry, sales rep and equipment type, for the analytics
+    dashboard. Rows with an empty equipment_type cover every form; the other rows only the forms
+    requiring that equipment. Refreshed on import, see customer.analytics.
+    """
+    period = models.DateField(help_text="First day of the month of the proposal date (import date when missing)")
+    industry = models.CharField(max_length=100, blank=True)
+    sales_rep = models.CharField(max_length=100, blank=True)
+    equipment_type = models.CharField(max_length=50, blank=True)
+    form_count = models.IntegerField(default=0)
+    capital_sell_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    capital_equip_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    capital_freight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    capital_net_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    install_sell_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    install_net_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    labor_pkg = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    labor_fab = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    labor_wiring = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    
+    class Meta:
+        verbose_name = "KOM Summary"
+        verbose_name_plural = "KOM Summaries"
+        ordering = ['period', 'industry', 'sales_rep', 'equipment_type']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'industry', 'sales_rep', 'equipment_type'],
+                                    name='komsummary_unique_key'),
+        ]
+    
+    def __str__(self):
+        return f"KOM summary {self.period:%Y-%m} {self.industry or '-'} / {self.sales_rep or '-'} / {self.equipment_type or 'all'}"
+
+
+class KOMFileLocation(models.Model):
+    """
+    Where a KOM form's workbook currently is, by form and content hash.
+    Written on import and repaired by the reconcile_kom_files command.
+    """
+    kom_form = models.OneToOneField(KOMForm, on_delete=models.CASCADE, primary_key=True, related_name='file_location')
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    path = models.CharField(max_length=1000)
+    missing = models.BooleanField(default=False, db_index=True, help_text="File was not found at path when last checked")
+    verified_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "KOM File Location"
+        verbose_name_plural = "KOM File Locations"
+    
+    def __str__(self):
+        return f"{self.kom_form_id}: {self.path}{' (missing)' if self.missing else ''}"
+
+
+class KOMParseCache(models.Model):
+    """parse_kom_excel output for a workbook, keyed by its SHA-256 and the parser version"""
+    sha256 = models.CharField(max_length=64)
+    parser_version = models.PositiveIntegerField()
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "KOM Parse Cache"
+        verbose_name_plural = "KOM Parse Cache"
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'parser_version'], name='unique_kom_parse_cache'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} (parser v{self.parser_version})"
+
+
+class KOMImportJob(models.Model):
+    """A KOM upload waiting for, or done with, parsing and saving in the background"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('parsing', 'Parsing'),
+        ('saving', 'Saving'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    source_file = models.CharField(max_length=255, blank=True)  # Original filename
+    file_path = models.CharField(max_length=1000)  # Stored copy that the worker parses
+    file_sha256 = models.CharField(max_length=64, blank=True)
+    kom_form = models.ForeignKey(KOMForm, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    messages = models.JSONField(default=list, blank=True, help_text="[level, text] pairs shown once the import finishes")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "KOM Import Job"
+        verbose_name_plural = "KOM Import Jobs"
+        ordering = ['-created_at']
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+    
+    def __str__(self):
+        return f"{self.source_file} ({self.status})"
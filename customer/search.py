@@ -0,0 +1,149 @@
+"""
+Full-text search over KOM forms.
+Each form is flattened into one KOMSearchDocument (raw_data values, line items,
+equipment). SQLite searches it through the customer_komsearch_fts FTS5 table and
+Postgres through a GIN index on to_tsvector('simple', document); both are created
+by migration 0011, which also indexes the forms saved before it. Other databases
+fall back to a plain substring match.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .kom_schema import KOM_FIELDS
+from .models import KOMForm, KOMSearchDocument
+
+# Highlight markers used inside snippets; swapped for <mark> after escaping
+_START, _STOP = '\x02', '\x03'
+
+SQLITE_SEARCH_SQL = """
+    SELECT rowid, bm25(customer_komsearch_fts) AS rank,
+           snippet(customer_komsearch_fts, 0, %s, %s, '...', 16)
+    FROM customer_komsearch_fts
+    WHERE customer_komsearch_fts MATCH %s
+    ORDER BY rank
+    LIMIT %s
+"""
+
+# Ranked and limited first, so ts_headline only runs on the rows shown
+POSTGRES_SEARCH_SQL = """
+    SELECT kom_form_id, rank, ts_headline('simple', document, query, %s)
+    FROM (
+        SELECT kom_form_id, document, query, ts_rank(to_tsvector('simple', document), query) AS rank
+        FROM customer_komsearchdocument, websearch_to_tsquery('simple', %s) query
+        WHERE to_tsvector('simple', document) @@ query
+        ORDER BY rank DESC
+        LIMIT %s
+    ) hits
+    ORDER BY rank DESC
+"""
+
+
+def build_search_document(kom_form):
+    """
+    Text indexed for a form: every non-empty KOM_SCHEMA value from raw_data, one per line,
+    then its line items and equipment rows (prefetched rows are used when available)
+    """
+    raw_data = kom_form.raw_data or {}
+    lines = []
+    for key in KOM_FIELDS:
+        value = raw_data.get(key)
+        # Flags are True/False for every form, so they would only add noise
+        if value in (None, '') or isinstance(value, bool):
+            continue
+        lines.append(str(value))
+    for item in kom_form.line_items.all():
+        lines.append(' '.join(part for part in (item.item_number, item.description) if part))
+    for eq in kom_form.equipment_required.all():
+        lines.append(' '.join(part for part in (eq.equipment_type, eq.kn_number, eq.description) if part))
+    return '\n'.join(line for line in lines if line.strip())
+
+
+def index_kom_forms(kom_forms):
+    """Create or refresh the search documents of saved forms"""
+    KOMSearchDocument.objects.bulk_create(
+        [KOMSearchDocument(kom_form=kom_form, document=build_search_document(kom_form)) for kom_form in kom_forms],
+        update_conflicts=True,
+        unique_fields=['kom_form'],
+        update_fields=['document', 'updated_at'],
+    )
+
+
+def rebuild_search_index(batch_size=500):
+    """Re-index every KOM form; returns the number of forms indexed"""
+    count = 0
+    kom_forms = KOMForm.objects.only('raw_data').prefetch_related('line_items', 'equipment_required').order_by('pk')
+    batch = []
+    for kom_form in kom_forms.iterator(chunk_size=batch_size):
+        batch.append(kom_form)
+        if len(batch) >= batch_size:
+            index_kom_forms(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        index_kom_forms(batch)
+        count += len(batch)
+    if connection.vendor == 'sqlite':
+        # Rebuild the FTS5 index from the documents table in case it drifted
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO customer_komsearch_fts(customer_komsearch_fts) VALUES ('rebuild')")
+    return count
+
+
+def fts5_query(query):
+    """
+    FTS5 MATCH expression for free text: each whitespace-separated term becomes a quoted
+    phrase of its words, prefix-matched, so punctuation (35371-01, O'Brien) can't break the syntax
+    """
+    phrases = []
+    for term in query.split():
+        words = re.findall(r'\w+', term)
+        if words:
+            phrases.append('"%s"*' % ' '.join(words))
+    return ' '.join(phrases)
+
+
+def highlight(snippet):
+    """Snippet as safe HTML with the matched words in <mark>"""
+    return mark_safe(escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search_koms(query, limit=50):
+    """
+    Best matches for query as [(kom_form_id, snippet_html), ...], best first.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_SEARCH_SQL, [_START, _STOP, match, limit])
+            rows = cursor.fetchall()
+    elif connection.vendor == 'postgresql':
+        options = f'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=20, MinWords=5'
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_SEARCH_SQL, [options, query, limit])
+            rows = cursor.fetchall()
+    else:
+        rows = _search_substring(query, limit)
+    return [(kom_form_id, highlight(snippet)) for kom_form_id, _, snippet in rows]
+
+
+def _search_substring(query, limit):
+    """Unranked fallback: documents containing every term, with a snippet around the first one"""
+    documents = KOMSearchDocument.objects.all()
+    terms = query.split()
+    for term in terms:
+        documents = documents.filter(document__icontains=term)
+    rows = []
+    for kom_form_id, document in documents.order_by('-kom_form_id').values_list('kom_form_id', 'document')[:limit]:
+        at = document.lower().find(terms[0].lower())
+        start = max(at - 60, 0)
+        snippet = document[start:at] + _START + document[at:at + len(terms[0])] + _STOP + document[at + len(terms[0]):at + 100]
+        rows.append((kom_form_id, 0, snippet))
+    return rows
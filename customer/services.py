@@ -0,0 +1,308 @@
+"""Storing imported KOM files and saving parsed KOM data to the database"""
+import hashlib
+import os
+import shutil
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import affected_periods, refresh_kom_summary
+from .kom_diff import flatten_kom
+from .kom_schema import model_values
+from .models import KOMForm, KOMLineItem, KOMEquipmentRequired, KOMFileLocation, KOMParseCache
+from .search import index_kom_forms
+from .utils import extract_job_number, parse_kom_excel, KOM_PARSER_VERSION
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def stored_kom_dir(sha256):
+    """Directory of the content-addressed copy of a workbook (see store_kom_file)"""
+    return os.path.join(settings.MEDIA_ROOT, 'kom_files', 'sha256', sha256[:2], sha256)
+
+
+def find_stored_kom_file(sha256):
+    """Absolute path of the stored copy of the workbook with this hash, or None"""
+    if not sha256:
+        return None
+    dest_dir = stored_kom_dir(sha256)
+    if os.path.isdir(dest_dir):
+        for existing in sorted(os.listdir(dest_dir)):
+            existing_path = os.path.join(dest_dir, existing)
+            if os.path.isfile(existing_path):
+                return str(os.path.abspath(existing_path))
+    return None
+
+
+def store_kom_file(src_path, name, sha256=None):
+    """
+    Copy a KOM workbook into MEDIA_ROOT so it can be reliably opened later.
+    Files are content-addressed under kom_files/sha256/<ab>/<hash>/<name>: identical
+    workbooks share one copy, named after the first upload.
+    Returns the absolute path of the stored copy.
+    """
+    sha256 = sha256 or hash_file(src_path)
+    existing_path = find_stored_kom_file(sha256)
+    if existing_path:
+        return existing_path
+    dest_dir = stored_kom_dir(sha256)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    # Create a safe filename, without any path components that might be in the name
+    safe_name = os.path.basename(name.replace(' ', '_').replace('/', '_').replace('\\', '_')) or f'{sha256}.xlsx'
+    dest_path = os.path.join(dest_dir, safe_name)
+
+    # Use shutil.copy2 to preserve metadata
+    shutil.copy2(src_path, dest_path)
+    file_path = str(os.path.abspath(dest_path))
+    if not os.path.isfile(file_path):
+        raise Exception(f"File was not saved correctly to {file_path}")
+    return file_path
+
+
+def record_file_locations(kom_forms):
+    """Point the KOMFileLocation of each saved form at its file_path"""
+    now = timezone.now()
+    KOMFileLocation.objects.bulk_create(
+        [KOMFileLocation(kom_form=kom_form, sha256=kom_form.file_sha256, path=kom_form.file_path, verified_at=now)
+         for kom_form in kom_forms if kom_form.file_path],
+        update_conflicts=True,
+        unique_fields=['kom_form'],
+        update_fields=['sha256', 'path', 'missing', 'verified_at'],
+    )
+
+
+def resolve_kom_file(kom_form, location=None):
+    """
+    Current absolute path of a form's workbook, or None when it can't be found.
+    Tries the KOMFileLocation path, the stored file_path (absolute or relative to
+    MEDIA_ROOT) and the content-addressed copy for the form's hash - no directory walks.
+    """
+    candidates = []
+    if location is not None:
+        candidates.append(location.path)
+    if kom_form.file_path:
+        file_path = str(kom_form.file_path).strip()
+        candidates.append(os.path.abspath(file_path))
+        if settings.MEDIA_ROOT and not os.path.isabs(file_path):
+            candidates.append(os.path.abspath(os.path.join(str(settings.MEDIA_ROOT), file_path.lstrip('/'))))
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return str(os.path.abspath(candidate))
+    return find_stored_kom_file(kom_form.file_sha256 or (location.sha256 if location is not None else ''))
+
+
+def update_file_location(kom_form, path):
+    """Record where a form's workbook was found (path) or that it is missing (None)"""
+    fields = {'missing': path is None, 'verified_at': timezone.now()}
+    if path is not None:
+        fields['path'] = path
+        if path != kom_form.file_path:
+            KOMForm.objects.filter(pk=kom_form.pk).update(file_path=path)
+            kom_form.file_path = path
+    updated = KOMFileLocation.objects.filter(kom_form_id=kom_form.pk).update(**fields)
+    if not updated and path is not None:
+        KOMFileLocation.objects.create(kom_form_id=kom_form.pk, sha256=kom_form.file_sha256, **fields)
+
+
+def is_media_file(path):
+    """Whether path is inside MEDIA_ROOT, i.e. a copy the app made rather than a user's original"""
+    if not settings.MEDIA_ROOT:
+        return False
+    media_root = os.path.realpath(str(settings.MEDIA_ROOT))
+    try:
+        return os.path.commonpath([media_root, os.path.realpath(path)]) == media_root
+    except ValueError:  # On another drive
+        return False
+
+
+def delete_kom_file(kom_form):
+    """
+    Remove the workbook of a form that is being deleted, if nothing else needs it.
+    Only files inside MEDIA_ROOT are removed (bulk imports may point at the original file),
+    and only when no other form or file location has the same path or content hash,
+    since identical uploads share one content-addressed copy (see store_kom_file).
+    Returns the removed path, or None when the file was kept or is already gone.
+    """
+    path = resolve_kom_file(kom_form)
+    if not path or not is_media_file(path):
+        return None
+    others = KOMForm.objects.exclude(pk=kom_form.pk)
+    locations = KOMFileLocation.objects.exclude(kom_form_id=kom_form.pk)
+    paths = {path, str(kom_form.file_path or '')} - {''}
+    if others.filter(file_path__in=paths).exists() or locations.filter(path__in=paths).exists():
+        return None
+    if kom_form.file_sha256 and (others.filter(file_sha256=kom_form.file_sha256).exists()
+                                 or locations.filter(sha256=kom_form.file_sha256).exists()):
+        return None
+    os.remove(path)
+    return path
+
+
+def get_cached_parses(sha256s):
+    """Map of sha256 -> cached parse_kom_excel output for the current parser version"""
+    sha256s = list(sha256s)
+    cached = {}
+    # Chunked to stay under the database's query parameter limit
+    for start in range(0, len(sha256s), 500):
+        cached.update(KOMParseCache.objects.filter(
+            parser_version=KOM_PARSER_VERSION, sha256__in=sha256s[start:start + 500],
+        ).values_list('sha256', 'data'))
+    return cached
+
+
+def cache_parses(parses):
+    """Store parse_kom_excel output given as {sha256: data} for the current parser version"""
+    KOMParseCache.objects.bulk_create(
+        [KOMParseCache(sha256=sha256, parser_version=KOM_PARSER_VERSION, data=data) for sha256, data in parses.items()],
+        ignore_conflicts=True,
+    )
+
+
+def parse_kom_cached(file_path, sha256):
+    """parse_kom_excel, skipped when this exact workbook was parsed before by the same parser version"""
+    cached = get_cached_parses([sha256])
+    if sha256 in cached:
+        return cached[sha256]
+    data = parse_kom_excel(file_path)
+    cache_parses({sha256: data})
+    return data
+
+
+def build_kom_form(parsed_data, **fields):
+    """
+    Build an unsaved KOMForm with its line items and equipment rows from parse_kom_excel output.
+    Extra keyword arguments (created_by, source_file, file_path...) are set on the form.
+    Returns (kom_form, line_items, equipment_required).
+    """
+    field_data = model_values(parsed_data)
+    kom_form = KOMForm(
+        job_number=extract_job_number(field_data['proposal_number'].strip()),
+        raw_data=parsed_data,
+        flat_data=flatten_kom(parsed_data),
+        parse_profile=parsed_data.get('_profile'),
+        **field_data,
+        **fields
+    )
+    line_items = [
+        KOMLineItem(kom_form=kom_form, **item_data)
+        for item_data in parsed_data.get('line_items', [])
+        if item_data.get('item_number') or item_data.get('description')
+    ]
+    equipment_required = [
+        KOMEquipmentRequired(kom_form=kom_form, **eq_data)
+        for eq_data in parsed_data.get('equipment_required', [])
+        if eq_data.get('equipment_type') or eq_data.get('description')
+    ]
+    return kom_form, line_items, equipment_required
+
+
+def save_kom_forms(built, batch_size=500):
+    """
+    Insert forms from build_kom_form in one transaction, with their search documents and file locations,
+    and refresh the analytics of the months they fall in.
+    Returns the saved KOMForm objects (with primary keys set). Their line_items and
+    equipment_required are cached as if prefetched, so reading them costs no queries
+    (index_kom_forms builds the search documents from them).
+    """
+    kom_forms = [kom_form for kom_form, _, _ in built]
+    with transaction.atomic():
+        KOMForm.objects.bulk_create(kom_forms, batch_size=batch_size)
+        # Rows were built against the unsaved forms; bulk_create picks up the new primary keys
+        KOMLineItem.objects.bulk_create(
+            [item for _, line_items, _ in built for item in line_items], batch_size=batch_size)
+        KOMEquipmentRequired.objects.bulk_create(
+            [eq for _, _, equipment_required in built for eq in equipment_required], batch_size=batch_size)
+        for kom_form, line_items, equipment_required in built:
+            kom_form._prefetched_objects_cache = {
+                'line_items': line_items,
+                'equipment_required': equipment_required,
+            }
+        index_kom_forms(kom_forms)
+        record_file_locations(kom_forms)
+        refresh_kom_summary(affected_periods(kom_forms))
+    return kom_forms
+
+
+def _row_values(model, rows):
+    """Rows as comparable tuples of their model field values (as the database would return them)"""
+    fields = [field for field in model._meta.concrete_fields if field.name not in ('id', 'kom_form')]
+    return [tuple(field.to_python(getattr(row, field.attname)) for field in fields) for row in rows]
+
+
+def reextract_kom_form(kom_form, raw_data=None):
+    """
+    Re-derive a saved form's columns, flat_data, parse_profile and child rows from raw_data (or from the given
+    newly parsed raw_data), updating kom_form in place. kom_form's line_items and
+    equipment_required must be prefetched in pk order.
+    Returns (changed field names, new line items, new equipment rows); the row lists are None
+    when the stored rows already match.
+    """
+    changed = []
+    if raw_data is not None and raw_data != kom_form.raw_data:
+        kom_form.raw_data = raw_data
+        changed.append('raw_data')
+    built, line_items, equipment_required = build_kom_form(kom_form.raw_data or {})
+    for name in ('job_number', 'flat_data', 'parse_profile', *model_values(kom_form.raw_data or {})):
+        field = KOMForm._meta.get_field(name)
+        value = field.to_python(getattr(built, name))
+        if field.to_python(getattr(kom_form, name)) != value:
+            setattr(kom_form, name, value)
+            changed.append(name)
+    rows = {}
+    for name, model, new_rows in (('line_items', KOMLineItem, line_items),
+                                  ('equipment_required', KOMEquipmentRequired, equipment_required)):
+        old_rows = list(getattr(kom_form, name).all())
+        if _row_values(model, old_rows) == _row_values(model, new_rows):
+            rows[name] = None
+            continue
+        for row in new_rows:
+            row.kom_form = kom_form
+        rows[name] = new_rows
+        kom_form._prefetched_objects_cache[name] = new_rows
+    return changed, rows['line_items'], rows['equipment_required']
+
+
+def save_reextracted(results, batch_size=500):
+    """
+    Write reextract_kom_form results [(kom_form, changed, line_items, equipment_required)]:
+    one bulk_update of the changed columns (plus updated_at, so cached exports are rebuilt),
+    child rows replaced only for the forms whose rows changed, and search documents and
+    analytics refreshed.
+    """
+    results = [result for result in results if result[1] or result[2] is not None or result[3] is not None]
+    if not results:
+        return []
+    now = timezone.now()
+    kom_forms = []
+    fields = {'updated_at'}
+    for kom_form, changed, _, _ in results:
+        kom_form.updated_at = now
+        fields.update(changed)
+        kom_forms.append(kom_form)
+    with transaction.atomic():
+        # Months the forms were reported in before and after the update
+        periods = affected_periods(KOMForm.objects.filter(pk__in=[kom_form.pk for kom_form in kom_forms]).only(
+            'job_number', 'proposal_date', 'created_at'))
+        KOMForm.objects.bulk_update(kom_forms, sorted(fields), batch_size=batch_size)
+        for name, model, index in (('line_items', KOMLineItem, 2), ('equipment_required', KOMEquipmentRequired, 3)):
+            replaced = [result for result in results if result[index] is not None]
+            if replaced:
+                model.objects.filter(kom_form__in=[result[0] for result in replaced]).delete()
+                model.objects.bulk_create([row for result in replaced for row in result[index]], batch_size=batch_size)
+        index_kom_forms(kom_forms)
+        refresh_kom_summary(periods | affected_periods(kom_forms))
+    return kom_forms
+
+
+def save_parsed_kom(parsed_data, **fields):
+    """Build and save one KOM form with all its rows (see build_kom_form and save_kom_forms)"""
+    return save_kom_forms([build_kom_form(parsed_data, **fields)])[0]
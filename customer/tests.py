@@ -1,14 +1,16 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from datetime import datetime, date
 from decimal import Decimal
+import json
 import os
 import tempfile
 from openpyxl import Workbook
 
-from .models import KOMForm, KOMLineItem, KOMEquipmentRequired
-from .utils import parse_kom_excel
+from .models import KOMForm, KOMLineItem, KOMFileLocation, KOMImportJob, KOMSummary
+from .utils import parse_kom_excel, load_kom_grid, KOMGrid
+from .kom_schema import KOM_FIELDS, KOM_SCHEMA, Field, BOOL, DATE, DECIMAL, INT
 
 
 def create_test_kom_excel():
@@ -662,6 +664,1050 @@ class KOMImportParserTest(TestCase):
         self.assertTrue(data['eng_extra_forklift_or_scissor_lift_reqd'])
 
 
+class KOMGridTest(TestCase):
+    """Test the read-only grid snapshot used by the parser"""
+    
+    def setUp(self):
+        """Create test Excel file"""
+        self.test_file = create_test_kom_excel()
+    
+    def tearDown(self):
+        """Clean up test file"""
+        if os.path.exists(self.test_file):
+            os.unlink(self.test_file)
+    
+    def test_grid_matches_worksheet(self):
+        """Every cell in the snapshot matches the full openpyxl worksheet"""
+        from openpyxl import load_workbook
+        ws = load_workbook(self.test_file, data_only=True).active
+        grid = load_kom_grid(self.test_file)
+        
+        self.assertEqual(grid.max_row, ws.max_row)
+        for row in range(1, ws.max_row + 1):
+            for col in range(1, ws.max_column + 1):
+                self.assertEqual(grid.raw(row, col), ws.cell(row=row, column=col).value)
+    
+    def test_out_of_range_lookups_are_empty(self):
+        """Lookups outside the used range return empty values instead of raising"""
+        grid = KOMGrid([('a', None), ('b',)])
+        
+        self.assertEqual(grid.text(1, 1), 'a')
+        self.assertIsNone(grid.raw(2, 2))
+        self.assertEqual(grid.text(0, 1), '')
+        self.assertEqual(grid.text(99, 1), '')
+        self.assertIsNone(grid.raw(1, 99))
+    
+    def test_label_index_lookups(self):
+        """Label lookups are whitespace- and case-insensitive and return row-major cells"""
+        grid = KOMGrid([
+            ('HTR - 1', 'Qty:', 1),
+            ('Dia  (in):', None, 'dia (in):'),
+            ('CAPITAL', 'Net Revenue:', 5),
+        ])
+        
+        self.assertEqual(grid.find_cells('Dia (in):'), [(2, 1), (2, 3)])
+        self.assertEqual(grid.find_cells('qty', 'prefix'), [(1, 2)])
+        self.assertEqual(grid.find_cells('REV', 'contains'), [(3, 2)])
+        self.assertEqual(grid.find_cells('Dia (in):', cols=(3,)), [(2, 3)])
+        self.assertEqual(grid.find_cells('HTR', 'contains', rows=range(2, 4)), [])
+        self.assertNotIn('1', grid.labels)  # Only text cells are indexed
+    
+    def test_section_found_outside_usual_rows(self):
+        """Sections that moved outside the usual row windows are still found"""
+        wb = Workbook()
+        ws = wb.active
+        ws.cell(row=160, column=1, value="CAPITAL")
+        ws.cell(row=162, column=3, value="$1,000.00")
+        ws.cell(row=164, column=3, value="$400.00")
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+        wb.save(temp_file.name)
+        temp_file.close()
+        try:
+            data = parse_kom_excel(temp_file.name)
+        finally:
+            os.unlink(temp_file.name)
+        
+        self.assertEqual(data['capital_sell_price'], 1000.0)
+        self.assertEqual(data['capital_equip_cost'], 400.0)
+        self.assertNotIn('CAPITAL section not found, using default row 147', data['_validation_warnings'])
+        self.assertIn('CAPITAL section found outside its usual rows, at row 160', data['_validation_warnings'])
+    
+    def test_stray_text_is_not_taken_for_a_moved_section(self):
+        """Outside the usual rows only a bare header counts, not notes that mention it"""
+        wb = Workbook()
+        ws = wb.active
+        ws.cell(row=20, column=1, value="tanks to be shipped separately")
+        ws.cell(row=30, column=1, value="HTR - 1 replaced in 2019")
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+        wb.save(temp_file.name)
+        temp_file.close()
+        try:
+            data = parse_kom_excel(temp_file.name)
+        finally:
+            os.unlink(temp_file.name)
+        
+        self.assertIn('TANKS section not found, using default row 75', data['_validation_warnings'])
+        self.assertIn('HTR-1 section not found dynamically, using default rows', data['_validation_warnings'])
+        self.assertFalse([w for w in data['_validation_warnings'] if 'outside its usual rows' in w])
+    
+    def test_parse_accepts_loaded_grid(self):
+        """Parsing a pre-loaded grid gives the same result as parsing the file"""
+        grid = load_kom_grid(self.test_file)
+        self.assertEqual(parse_kom_excel(grid), parse_kom_excel(self.test_file))
+
+
+class KOMSchemaTest(TestCase):
+    """Test the KOM field schema shared by the parser, extract_from_raw_data and the export"""
+    
+    def setUp(self):
+        """Create test Excel file"""
+        self.test_file = create_test_kom_excel()
+    
+    def tearDown(self):
+        """Clean up test file"""
+        if os.path.exists(self.test_file):
+            os.unlink(self.test_file)
+    
+    def test_schema_matches_parser_and_model(self):
+        """The parser emits exactly the schema fields, and every schema field is a KOMForm column"""
+        data = parse_kom_excel(self.test_file)
+        
+        self.assertEqual(set(data) - {'_validation_warnings', 'line_items', 'equipment_required'}, set(KOM_FIELDS))
+        for key in KOM_FIELDS:
+            KOMForm._meta.get_field(key)
+    
+    def test_extract_from_raw_data_covers_all_fields(self):
+        """extract_from_raw_data fills every schema field with the model's type"""
+        kom_form = KOMForm(raw_data=parse_kom_excel(self.test_file))
+        kom_form.extract_from_raw_data()
+        
+        self.assertEqual(kom_form.proposal_date, date(2025, 9, 19))
+        self.assertEqual(kom_form.capital_sell_price, Decimal('360000.0'))
+        self.assertEqual(kom_form.hr_sections, 24)
+        self.assertEqual(kom_form.htr_1_type, kom_form.raw_data['htr_1_type'])
+        self.assertFalse(kom_form.tax_exempt)
+        self.assertIsNone(kom_form.tank_1_dia_in)
+    
+    def test_field_to_python(self):
+        """raw_data values are coerced by the field type"""
+        self.assertEqual(Field('x', 'X', DECIMAL).to_python('$1,200.50'), Decimal('1200.50'))
+        self.assertEqual(Field('x', 'X', DECIMAL).to_python(5490.5), Decimal('5490.5'))
+        self.assertEqual(Field('x', 'X', INT).to_python(84.0), 84)
+        self.assertEqual(Field('x', 'X', DATE).to_python('2025-09-19'), date(2025, 9, 19))
+        self.assertIsNone(Field('x', 'X', DATE).to_python('soon'))
+        self.assertEqual(Field('x', 'X').to_python(None), '')
+        self.assertFalse(Field('x', 'X', BOOL).to_python(None))
+    
+    def test_export_lists_schema_sections(self):
+        """The text export is laid out from the schema"""
+        User.objects.create_user(username='exporter', password='testpass123', is_superuser=True)
+        self.client.login(username='exporter', password='testpass123')
+        kom_form = KOMForm(raw_data=parse_kom_excel(self.test_file), source_file='test_kom.xlsx')
+        kom_form.extract_from_raw_data()
+        kom_form.save()
+        
+        response = self.client.get(f'/customer/kom/{kom_form.pk}/export/')
+        content = b''.join(response.streaming_content).decode()
+        
+        for section in KOM_SCHEMA:
+            self.assertIn(f"{section.title}\n{'-' * 80}", content)
+        self.assertIn('Proposal #: 35371', content)
+        self.assertIn('Sell Price: $360000.00', content)
+        self.assertIn('MISSING - No line items found', content)
+
+
+class KOMImportCommandTest(TestCase):
+    """Test the import_koms bulk import command"""
+    
+    def setUp(self):
+        """Create a directory with two KOM files, a broken file and an Excel lock file"""
+        import shutil
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        from openpyxl import load_workbook
+        test_file = create_test_kom_excel()
+        shutil.copy(test_file, os.path.join(self.test_dir, '35371 KOM AND OC FORM.xlsx'))
+        # Second proposal in a subdirectory, with different content
+        os.makedirs(os.path.join(self.test_dir, 'sub'))
+        wb = load_workbook(test_file)
+        wb.active.cell(row=2, column=3, value="35372")
+        wb.save(os.path.join(self.test_dir, 'sub', '35372 KOM AND OC FORM.xlsx'))
+        os.unlink(test_file)
+        with open(os.path.join(self.test_dir, 'broken.xlsx'), 'w') as f:
+            f.write('not a workbook')
+        with open(os.path.join(self.test_dir, '~$35371 KOM AND OC FORM.xlsx'), 'w') as f:
+            f.write('lock')
+    
+    def run_command(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out, err = StringIO(), StringIO()
+        call_command('import_koms', self.test_dir, '--workers', '1', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+    
+    def test_import_directory(self):
+        """Workbooks are found recursively, saved with their rows, and failures are reported"""
+        out, err = self.run_command('--batch-size', '1')
+        
+        self.assertEqual(KOMForm.objects.count(), 2)
+        kom_form = KOMForm.objects.get(job_number='35371')
+        self.assertEqual(kom_form.raw_data['proposal_number'], '35371')
+        self.assertTrue(os.path.isfile(kom_form.file_path))
+        # Copied like an upload, so deleting the form never touches the original
+        self.assertTrue(kom_form.file_path.startswith(os.path.join(self.media_root, 'kom_files')))
+        self.assertEqual(len(kom_form.file_sha256), 64)
+        self.assertEqual(kom_form.line_items.count(), 3)
+        self.assertEqual(KOMLineItem.objects.count(), 6)
+        self.assertIn('FAILED', err)
+        self.assertIn('broken.xlsx', err)
+        self.assertIn('Imported 2 file(s)', out)
+    
+    def test_already_imported_files_are_skipped(self):
+        """Running the command twice does not duplicate forms"""
+        self.run_command()
+        out, _ = self.run_command()
+        
+        self.assertEqual(KOMForm.objects.count(), 2)
+        self.assertIn('2 already imported', out)
+    
+    def test_no_copy_records_original_path(self):
+        """--no-copy leaves the files where they are"""
+        self.run_command('--no-copy')
+        
+        kom_form = KOMForm.objects.get(job_number='35371')
+        self.assertEqual(kom_form.file_path, os.path.join(self.test_dir, '35371 KOM AND OC FORM.xlsx'))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'kom_files')))
+    
+    def test_identical_copies_are_imported_once(self):
+        """A copy of an already-imported workbook is skipped by content hash"""
+        import shutil
+        shutil.copy(os.path.join(self.test_dir, '35371 KOM AND OC FORM.xlsx'),
+                    os.path.join(self.test_dir, 'copy of 35371.xlsx'))
+        out, _ = self.run_command()
+        
+        self.assertEqual(KOMForm.objects.count(), 2)
+        self.assertIn('1 already imported', out)
+    
+    def test_parse_results_are_cached(self):
+        """Parses are cached by content hash and reused on the next run"""
+        from .models import KOMParseCache
+        self.run_command('--dry-run')
+        self.assertEqual(KOMParseCache.objects.count(), 2)
+        
+        out, _ = self.run_command()
+        self.assertIn('Parsing 1 file(s), 2 cached', out)  # the broken file is not cached
+        self.assertEqual(out.count('CACHED'), 2)
+        self.assertEqual(KOMForm.objects.get(job_number='35372').raw_data['proposal_number'], '35372')
+    
+    def test_dry_run_saves_nothing(self):
+        """--dry-run parses and reports without touching the database"""
+        out, _ = self.run_command('--dry-run')
+        
+        self.assertEqual(KOMForm.objects.count(), 0)
+        self.assertIn('Parsed 2 file(s)', out)
+
+
+class KOMParseProfileTest(TestCase):
+    """Test per-section parse profiling"""
+    
+    def setUp(self):
+        self.test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, self.test_file)
+    
+    def test_profile_adds_trace_without_changing_data(self):
+        """profile=True adds _profile and leaves every other key as-is"""
+        plain = parse_kom_excel(self.test_file)
+        profiled = parse_kom_excel(self.test_file, profile=True)
+        profile = profiled.pop('_profile')
+        
+        self.assertNotIn('_profile', plain)
+        self.assertEqual(profiled, plain)
+        self.assertEqual([entry['section'] for entry in profile['sections']], [section.title for section in KOM_SCHEMA])
+        tanks = next(entry for entry in profile['sections'] if entry['section'] == 'TANKS')
+        self.assertGreater(tanks['cell_reads'], 0)
+        self.assertGreater(tanks['label_scans'], 0)
+        self.assertGreaterEqual(profile['total_ms'], profile['load_ms'])
+    
+    @override_settings(KOM_PARSE_PROFILE=True)
+    def test_profile_setting(self):
+        """KOM_PARSE_PROFILE turns profiling on for calls that don't say otherwise"""
+        self.assertIn('_profile', parse_kom_excel(self.test_file))
+        self.assertNotIn('_profile', parse_kom_excel(self.test_file, profile=False))
+    
+    def test_profile_view_lists_slowest_sections(self):
+        """The profile page aggregates _profile across imports"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import save_parsed_kom
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        save_parsed_kom(parse_kom_excel(self.test_file))
+        for _ in range(2):
+            save_parsed_kom(parse_kom_excel(self.test_file, profile=True))
+        # The trace is copied into a column the profile page filters on in the database
+        self.assertEqual(KOMForm.objects.filter(parse_profile__isnull=False).count(), 2)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/customer/kom/profile/')
+        self.assertFalse(any('raw_data' in query['sql'] for query in queries))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count'], 2)
+        sections = response.context['sections']
+        self.assertEqual(len(sections), len(KOM_SCHEMA))
+        self.assertEqual(sections[0]['count'], 2)
+        self.assertGreaterEqual(sections[0]['total_ms'], sections[-1]['total_ms'])
+
+
+class KOMListTest(TestCase):
+    """Test keyset pagination and filters on the KOM list"""
+    
+    def setUp(self):
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        # Two forms per job so the created_at/id tie-break is exercised
+        KOMForm.objects.bulk_create([
+            KOMForm(job_number=str(35000 + i // 2), proposal_number=f'{35000 + i // 2}-R{i % 2}',
+                    sales_rep='Alice' if i % 3 else 'Bob', bill_to_company=f'Company {i % 7}',
+                    proposal_date=date(2024, 1 + i % 12, 1), raw_data={'big': 'x' * 1000})
+            for i in range(120)
+        ])
+    
+    def get_page(self, **params):
+        response = self.client.get('/customer/kom/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+    
+    def test_pages_cover_every_form_once_in_order(self):
+        """Next links walk every form once; Previous links walk back to the same pages"""
+        from .views import KOM_LIST_ORDER, KOM_LIST_PAGE_SIZE
+        context = self.get_page()
+        self.assertIsNone(context['prev_pk'])
+        self.assertIn('raw_data', context['kom_forms'][0].get_deferred_fields())
+        pages = [[kom.pk for kom in context['kom_forms']]]
+        while context['next_pk']:
+            context = self.get_page(after=context['next_pk'])
+            pages.append([kom.pk for kom in context['kom_forms']])
+        
+        self.assertEqual([len(page) for page in pages], [KOM_LIST_PAGE_SIZE, KOM_LIST_PAGE_SIZE, 20])
+        expected = list(KOMForm.objects.order_by(*KOM_LIST_ORDER).values_list('pk', flat=True))
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        
+        context = self.get_page(before=pages[2][0])
+        self.assertEqual([kom.pk for kom in context['kom_forms']], pages[1])
+        context = self.get_page(before=context['prev_pk'])
+        self.assertEqual([kom.pk for kom in context['kom_forms']], pages[0])
+        self.assertIsNone(context['prev_pk'])
+    
+    def test_filters(self):
+        """Job number, company, sales rep and proposal date range narrow the list"""
+        context = self.get_page(job='35001')
+        self.assertEqual({kom.proposal_number for kom in context['kom_forms']}, {'35001-R0', '35001-R1'})
+        
+        context = self.get_page(sales_rep='Bob', company='company 0')
+        self.assertEqual(len(context['kom_forms']), 6)
+        self.assertTrue(all(kom.sales_rep == 'Bob' for kom in context['kom_forms']))
+        self.assertEqual(list(context['sales_reps']), ['Alice', 'Bob'])
+        
+        context = self.get_page(date_from='2024-03-01', date_to='2024-04-30')
+        self.assertEqual(len(context['kom_forms']), 20)
+        self.assertIn('date_from=2024-03-01', context['filter_query'])
+        
+        context = self.get_page(date_from='not a date')
+        self.assertEqual(len(context['kom_forms']), 50)
+
+
+class KOMExportTest(TestCase):
+    """Test the cached, streamed text export and the zip export"""
+    
+    def setUp(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import save_parsed_kom
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, test_file)
+        parsed = parse_kom_excel(test_file)
+        self.first = save_parsed_kom(parsed)
+        self.second = save_parsed_kom(dict(parsed, proposal_number='35999-R1', proposal_date='2024-06-01'))
+    
+    def get_text(self, kom_form):
+        response = self.client.get(f'/customer/kom/{kom_form.pk}/export/')
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_export_is_cached_until_the_form_changes(self):
+        """A repeat export is served from the cache; saving the form invalidates it"""
+        from unittest.mock import patch
+        from .kom_export import iter_export_sections
+        text = self.get_text(self.first)
+        self.assertTrue(text.startswith('=' * 80 + '\nKOM FORM EXPORT - Proposal #35371'))
+        self.assertTrue(text.endswith('END OF EXPORT\n' + '=' * 80))
+        
+        with patch('customer.kom_export.iter_export_sections', wraps=iter_export_sections) as sections:
+            self.assertEqual(self.get_text(self.first), text)
+            sections.assert_not_called()
+            self.first.project_name = 'Renamed Project'
+            self.first.save()
+            self.assertIn('Renamed Project', self.get_text(self.first))
+            sections.assert_called_once()
+    
+    def test_zip_export_follows_list_filters(self):
+        """The zip holds one text export per form matching the KOM list filters"""
+        import io
+        import zipfile
+        response = self.client.get('/customer/kom/export.zip', {'job': '359'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('kom_exports_359.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['kom_export_35999-R1.txt'])
+        self.assertEqual(archive.read('kom_export_35999-R1.txt').decode(), self.get_text(self.second))
+        
+        response = self.client.get('/customer/kom/export.zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+
+
+class KOMFileLocationTest(TestCase):
+    """Test the file-location index behind kom_open_file and reconcile_kom_files"""
+    
+    def setUp(self):
+        import shutil
+        from .services import hash_file, save_parsed_kom
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, test_file)
+        self.path = os.path.join(self.media_root, 'imports', 'KOM_35371.xlsx')
+        os.makedirs(os.path.dirname(self.path))
+        shutil.copy(test_file, self.path)
+        self.kom_form = save_parsed_kom(parse_kom_excel(self.path), source_file='KOM_35371.xlsx',
+                                        file_path=self.path, file_sha256=hash_file(self.path))
+    
+    def open_file(self):
+        return self.client.get(f'/customer/kom/{self.kom_form.pk}/open/')
+    
+    def test_location_recorded_on_save(self):
+        location = KOMFileLocation.objects.get(kom_form=self.kom_form)
+        self.assertEqual(location.path, self.path)
+        self.assertEqual(location.sha256, self.kom_form.file_sha256)
+        self.assertFalse(location.missing)
+        self.assertEqual(self.open_file().json(), {'success': True, 'file_path': self.path})
+    
+    def test_open_file_falls_back_to_stored_copy_and_flags_missing(self):
+        """A moved file is found through its content-addressed copy; otherwise it is flagged missing"""
+        from .services import store_kom_file
+        stored = store_kom_file(self.path, 'KOM_35371.xlsx', self.kom_form.file_sha256)
+        os.unlink(self.path)
+        self.assertEqual(self.open_file().json()['file_path'], stored)
+        self.kom_form.refresh_from_db()
+        self.assertEqual(self.kom_form.file_path, stored)
+        self.assertEqual(KOMFileLocation.objects.get(kom_form=self.kom_form).path, stored)
+        
+        os.unlink(stored)
+        response = self.open_file()
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['source_file'], 'KOM_35371.xlsx')
+        self.assertTrue(KOMFileLocation.objects.get(kom_form=self.kom_form).missing)
+        missing = self.client.get('/customer/kom/files/missing/').json()
+        self.assertEqual([row['id'] for row in missing['missing']], [self.kom_form.pk])
+    
+    def test_deleting_one_of_two_identical_uploads_keeps_the_shared_file(self):
+        """Identical uploads share one stored copy, which is only removed with the last form using it"""
+        from .services import save_parsed_kom, store_kom_file
+        stored = store_kom_file(self.path, 'KOM_35371.xlsx', self.kom_form.file_sha256)
+        forms = [
+            save_parsed_kom(parse_kom_excel(stored), source_file='KOM_35371.xlsx',
+                            file_path=store_kom_file(self.path, 'KOM_35371.xlsx'),
+                            file_sha256=self.kom_form.file_sha256)
+            for _ in range(2)
+        ]
+        self.assertEqual(forms[0].file_path, forms[1].file_path)
+        
+        self.client.post(f'/customer/kom/{forms[0].pk}/delete/')
+        self.assertFalse(KOMForm.objects.filter(pk=forms[0].pk).exists())
+        self.assertTrue(os.path.isfile(stored))
+        self.assertEqual(self.client.get(f'/customer/kom/{forms[1].pk}/open/').json()['file_path'], stored)
+        
+        # self.kom_form still has the same content (as its own file), so the copy is kept for it
+        self.client.post(f'/customer/kom/{forms[1].pk}/delete/')
+        self.assertTrue(os.path.isfile(stored))
+        self.client.post(f'/customer/kom/{self.kom_form.pk}/delete/')
+        self.assertFalse(os.path.isfile(self.path))
+        self.assertEqual(KOMForm.objects.count(), 0)
+    
+    def test_delete_keeps_files_outside_media_root(self):
+        """A bulk-imported form pointing at the user's original workbook does not delete it"""
+        import shutil
+        from .services import save_parsed_kom
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside, ignore_errors=True)
+        original = os.path.join(outside, 'KOM_35371.xlsx')
+        shutil.copy(self.path, original)
+        kom_form = save_parsed_kom(parse_kom_excel(original), source_file='KOM_35371.xlsx',
+                                   file_path=original, file_sha256='')
+        
+        self.client.post(f'/customer/kom/{kom_form.pk}/delete/')
+        self.assertFalse(KOMForm.objects.filter(pk=kom_form.pk).exists())
+        self.assertTrue(os.path.isfile(original))
+    
+    def test_reconcile_repairs_moved_files_by_hash(self):
+        """reconcile_kom_files finds a moved and renamed file by hash and flags files that are gone"""
+        import shutil
+        from io import StringIO
+        from django.core.management import call_command
+        search_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, search_dir, ignore_errors=True)
+        moved = os.path.join(search_dir, 'KOM_35371.xlsx')
+        os.rename(self.path, moved)
+        # Same name, different content: must not be picked
+        decoy_dir = os.path.join(self.media_root, 'kom_files', 'old')
+        os.makedirs(decoy_dir)
+        with open(os.path.join(decoy_dir, 'KOM_35371.xlsx'), 'wb') as f:
+            f.write(b'not the workbook')
+        
+        out = StringIO()
+        call_command('reconcile_kom_files', '--search', search_dir, '--dry-run', stdout=out)
+        self.assertIn('0 ok, 1 repaired, 0 missing', out.getvalue())
+        self.assertEqual(KOMFileLocation.objects.get(kom_form=self.kom_form).path, self.path)
+        
+        call_command('reconcile_kom_files', '--search', search_dir, stdout=StringIO())
+        self.kom_form.refresh_from_db()
+        self.assertEqual(self.kom_form.file_path, moved)
+        self.assertEqual(self.open_file().json()['file_path'], moved)
+        
+        os.unlink(moved)
+        out = StringIO()
+        call_command('reconcile_kom_files', stdout=out)
+        self.assertIn('0 ok, 0 repaired, 1 missing', out.getvalue())
+        self.assertTrue(KOMFileLocation.objects.get(kom_form=self.kom_form).missing)
+    
+    def test_reconcile_skips_forms_without_a_file(self):
+        """Forms saved without a file path (NULL or empty) are not indexed"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .services import save_parsed_kom
+        no_path = save_parsed_kom({'proposal_number': '35372'}, file_path=None)
+        empty_path = save_parsed_kom({'proposal_number': '35373'}, file_path='')
+        
+        for args in (['--dry-run'], []):
+            out = StringIO()
+            call_command('reconcile_kom_files', *args, stdout=out)
+            self.assertIn('1 ok, 0 repaired, 0 missing', out.getvalue())
+        self.assertFalse(KOMFileLocation.objects.filter(kom_form__in=[no_path, empty_path]).exists())
+
+
+class ReextractKOMsTest(TestCase):
+    """Test the reextract_koms command"""
+    
+    def setUp(self):
+        import shutil
+        from .kom_bench import KOM_LAYOUTS, generate_kom_workbook
+        from .services import save_parsed_kom
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        test_file = os.path.join(test_dir, 'kom.xlsx')
+        generate_kom_workbook(test_file, KOM_LAYOUTS[0], seed=1)
+        self.parsed = parse_kom_excel(test_file)
+        self.stale = KOMForm.objects.get(pk=save_parsed_kom(self.parsed).pk)
+        self.current = KOMForm.objects.get(pk=save_parsed_kom(self.parsed).pk)
+    
+    def reextract(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('reextract_koms', *args, stdout=out)
+        return out.getvalue()
+    
+    def rows(self, kom_form):
+        return (list(kom_form.line_items.order_by('pk').values_list('item_number', 'description', 'value_1')),
+                list(kom_form.equipment_required.order_by('pk').values_list('equipment_type', 'qty', 'kn_number')))
+    
+    def test_stale_columns_and_rows_are_rebuilt(self):
+        """Only forms whose derived values changed are written; a second run changes nothing"""
+        self.assertTrue(self.stale.line_items.exists())
+        self.assertTrue(self.stale.equipment_required.exists())
+        KOMForm.objects.filter(pk=self.stale.pk).update(project_name='Stale', job_number='', flat_data={})
+        self.stale.line_items.first().delete()
+        self.stale.equipment_required.update(qty=99)
+        current_updated_at = KOMForm.objects.get(pk=self.current.pk).updated_at
+        
+        self.assertIn('Would update 1 of 2', self.reextract('--dry-run'))
+        self.assertEqual(KOMForm.objects.get(pk=self.stale.pk).project_name, 'Stale')
+        
+        out = self.reextract('--batch-size', '1')
+        self.assertIn('Updated 1 of 2', out)
+        self.assertIn('line items: 1', out)
+        self.assertIn('equipment rows: 1', out)
+        stale = KOMForm.objects.get(pk=self.stale.pk)
+        current = KOMForm.objects.get(pk=self.current.pk)
+        for key in ('project_name', 'job_number', 'flat_data'):
+            self.assertEqual(getattr(stale, key), getattr(current, key))
+        self.assertEqual(self.rows(stale), self.rows(current))
+        self.assertGreater(stale.updated_at, current_updated_at)
+        self.assertEqual(current.updated_at, current_updated_at)
+        
+        self.assertIn('Updated 0 of 2', self.reextract())
+    
+    def test_reparse_reads_the_stored_workbook(self):
+        """--reparse replaces raw_data from the original file when the parser output differs"""
+        import shutil
+        from .kom_bench import KOM_LAYOUTS, generate_kom_workbook
+        from .services import hash_file
+        path = os.path.join(tempfile.mkdtemp(), 'kom.xlsx')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        generate_kom_workbook(path, KOM_LAYOUTS[0], seed=1)
+        KOMForm.objects.filter(pk=self.stale.pk).update(
+            raw_data=dict(self.parsed, project_name='Old Parser'), file_path=path, file_sha256=hash_file(path))
+        self.assertIn('Updated 1 of 2', self.reextract('--reparse'))
+        stale = KOMForm.objects.get(pk=self.stale.pk)
+        self.assertEqual(stale.raw_data['project_name'], self.parsed['project_name'])
+
+
+class KOMAnalyticsTest(TestCase):
+    """Test the KOMSummary rollup and the analytics dashboard"""
+    
+    def setUp(self):
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        self.base = {
+            'proposal_number': '35371', 'proposal_date': '2025-01-15', 'industry': 'FOOD', 'sales_rep': 'JOHN',
+            'capital_sell_price': 1000, 'capital_net_revenue': 250, 'labor_pkg': 10, 'labor_fab': 5,
+            'equipment_required': [{'equipment_type': 'Burner', 'qty': 1}, {'equipment_type': 'Blower', 'qty': 2}],
+        }
+    
+    def save(self, **values):
+        from .services import save_parsed_kom
+        return save_parsed_kom(dict(self.base, **values))
+    
+    def summary(self, **filters):
+        return KOMSummary.objects.get(**{'equipment_type': '', **filters})
+    
+    def test_import_refreshes_summary_with_latest_revision(self):
+        """Each job counts once, as its latest revision, in that revision's month"""
+        from datetime import date
+        self.save()
+        self.save(proposal_number='35400', capital_sell_price=500, equipment_required=[])
+        january = self.summary(period=date(2025, 1, 1))
+        self.assertEqual((january.form_count, january.capital_sell_price, january.labor_pkg), (2, 1500, 20))
+        self.assertEqual(self.summary(period=date(2025, 1, 1), equipment_type='Burner').form_count, 1)
+        
+        revision = self.save(proposal_number='35371-R1', proposal_date='2025-02-03', capital_sell_price=1200)
+        self.assertEqual(self.summary(period=date(2025, 1, 1)).capital_sell_price, 500)
+        self.assertEqual(self.summary(period=date(2025, 2, 1)).capital_sell_price, 1200)
+        
+        self.client.post(f'/customer/kom/{revision.pk}/delete/')
+        self.assertEqual(self.summary(period=date(2025, 1, 1)).capital_sell_price, 1500)
+        self.assertFalse(KOMSummary.objects.filter(period=date(2025, 2, 1)).exists())
+        
+        # Incremental refreshes agree with a full rebuild
+        from .analytics import SUMMARY_FIELDS, SUMMARY_KEYS, refresh_kom_summary
+        columns = [*SUMMARY_KEYS, 'form_count', *SUMMARY_FIELDS]
+        rows = list(KOMSummary.objects.values_list(*columns))
+        refresh_kom_summary()
+        self.assertEqual(list(KOMSummary.objects.values_list(*columns)), rows)
+    
+    def test_dashboard_and_csv(self):
+        self.save()
+        self.save(proposal_number='35400', industry='PAINT', capital_sell_price=500, capital_net_revenue=50)
+        response = self.client.get('/customer/kom/analytics/', {'group': 'industry'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['industry'] for row in response.context['totals']], ['FOOD', 'PAINT'])
+        self.assertEqual(response.context['totals'][0]['capital_margin'], 25)
+        
+        response = self.client.get('/customer/kom/analytics/', {'group': 'equipment_type', 'format': 'csv'})
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['equipment_type', 'form_count', 'capital_sell_price'])
+        self.assertEqual([line.split(',')[:3] for line in lines[1:]],
+                         [['Blower', '2', '1500.00'], ['Burner', '2', '1500.00']])
+
+
+class KOMTableExportTest(TestCase):
+    """Test the export_koms command and the admin table export action"""
+    
+    def setUp(self):
+        import shutil
+        from .services import save_parsed_kom
+        base = {
+            'proposal_number': '35371', 'proposal_date': '2025-01-15', 'capital_sell_price': 1234.5,
+            'line_items': [{'item_number': '35371-01', 'description': 'Washer', 'value_1': 100}],
+            'equipment_required': [{'equipment_type': 'Burner', 'qty': 2}],
+        }
+        self.first = save_parsed_kom(base)
+        self.second = save_parsed_kom(dict(base, proposal_number='35400', line_items=[]))
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+    
+    def read_csv(self, text):
+        import csv
+        import io
+        return list(csv.DictReader(io.StringIO(text)))
+    
+    def test_command_writes_one_csv_per_table(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('export_koms', '--output-dir', self.output_dir, '--chunk-size', '1', stdout=StringIO())
+        with open(os.path.join(self.output_dir, 'kom_forms.csv'), encoding='utf-8') as f:
+            forms = self.read_csv(f.read())
+        self.assertEqual([row['proposal_number'] for row in forms], ['35371', '35400'])
+        self.assertEqual(forms[0]['capital_sell_price'], '1234.50')
+        self.assertEqual(forms[0]['proposal_date'], '2025-01-15')
+        self.assertNotIn('raw_data', forms[0])
+        with open(os.path.join(self.output_dir, 'kom_line_items.csv'), encoding='utf-8') as f:
+            items = self.read_csv(f.read())
+        self.assertEqual([(row['kom_form_id'], row['item_number']) for row in items], [(str(self.first.pk), '35371-01')])
+        with open(os.path.join(self.output_dir, 'kom_equipment_required.csv'), encoding='utf-8') as f:
+            self.assertEqual(len(self.read_csv(f.read())), 2)
+    
+    def test_admin_action_streams_selected_forms(self):
+        import io
+        import zipfile
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True, is_staff=True)
+        self.client.login(username='admin', password='testpass123')
+        response = self.client.post('/admin/customer/komform/', {
+            'action': 'export_tables', '_selected_action': [self.second.pk],
+        })
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['kom_forms.csv', 'kom_line_items.csv', 'kom_equipment_required.csv'])
+        forms = self.read_csv(archive.read('kom_forms.csv').decode())
+        self.assertEqual([row['proposal_number'] for row in forms], ['35400'])
+        self.assertEqual(self.read_csv(archive.read('kom_line_items.csv').decode()), [])
+        self.assertEqual(len(self.read_csv(archive.read('kom_equipment_required.csv').decode())), 1)
+
+
+class KOMRawDataCodecTest(TestCase):
+    """Test the compact raw_data encoding"""
+    
+    def test_round_trip_is_lossless(self):
+        """Absent keys stay absent; unusual rows and unknown keys survive as they are"""
+        from .kom_codec import decode_raw_data, encode_raw_data
+        test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, test_file)
+        parsed = parse_kom_excel(test_file)
+        parsed['line_items'] = [
+            {'item_number': '35371-01', 'description': 'Washer', 'value_1': 10.5, 'value_2': None,
+             'value_3': None, 'value_4': None},
+            {'item_number': '35371-02', 'note': 'hand-entered row'},
+        ]
+        parsed['_validation_warnings'] = ['Missing HTR-2']
+        del parsed['po_number']
+        encoded = encode_raw_data(parsed)
+        self.assertEqual(decode_raw_data(encoded), parsed)
+        self.assertNotIn('po_number', decode_raw_data(encoded))
+        self.assertLess(len(encoded), len(json.dumps(parsed)) / 4)
+        # Rows saved before the compact encoding are plain JSON
+        self.assertEqual(decode_raw_data(json.dumps(parsed).encode()), parsed)
+    
+    def test_model_field_reads_back_the_dict(self):
+        from django.db import connection
+        from .services import save_parsed_kom
+        raw_data = {'proposal_number': '35371', 'project_name': 'Test Project', 'line_items': []}
+        kom_form = save_parsed_kom(raw_data)
+        self.assertEqual(KOMForm.objects.get(pk=kom_form.pk).raw_data, raw_data)
+        self.assertEqual(KOMForm.objects.filter(pk=kom_form.pk).values_list('raw_data', flat=True)[0], raw_data)
+        self.assertEqual(KOMForm.objects.get(pk=kom_form.pk).get_raw_data(), raw_data)
+        self.assertEqual(KOMForm.objects.get(pk=kom_form.pk).flat_data, kom_form.flat_data)
+        self.assertEqual(kom_form.flat_data['project_name'], 'Test Project')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT raw_data, flat_data FROM customer_komform WHERE id = %s', [kom_form.pk])
+            for value in cursor.fetchone():
+                self.assertFalse(bytes(value).startswith(b'{'))
+
+
+class KOMCompareTest(TestCase):
+    """Test the flat_data diff engine and the comparison pages"""
+    
+    def setUp(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import save_parsed_kom
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        base = {
+            'proposal_number': '35411-R1',
+            'sales_rep': 'Alice',
+            'tank_1_qty': 2.0,
+            'line_items': [{'item_number': '35411-01', 'description': 'Heater', 'value_1': 1000.0}],
+            '_validation_warnings': ['Proposal number not found'],
+        }
+        r2 = dict(base, proposal_number='35411-R2', sales_rep='Bob ',
+                  line_items=base['line_items'] + [{'item_number': '35411-02', 'description': 'Pump'}])
+        r10 = dict(r2, proposal_number='35411-R10', line_items=[dict(base['line_items'][0], value_1=1250.0)])
+        # Imported out of order on purpose
+        self.r10 = save_parsed_kom(r10)
+        self.r1 = save_parsed_kom(base)
+        self.r2 = save_parsed_kom(r2)
+    
+    def test_flatten_kom(self):
+        """Rows are keyed by item number, values normalized, and underscore keys dropped"""
+        from .kom_diff import flatten_kom
+        flat = flatten_kom(self.r2.raw_data)
+        self.assertEqual(flat['sales_rep'], 'Bob')
+        self.assertEqual(flat['tank_1_qty'], 2)
+        self.assertEqual(flat['line_items[35411-02]'], '35411-02')
+        self.assertEqual(flat['line_items[35411-01].value_1'], 1000)
+        self.assertNotIn('_validation_warnings', flat)
+        self.assertEqual(self.r2.flat_data, flat)
+    
+    def test_revision_chain(self):
+        """A job's revisions are compared in revision order with per-step change flags"""
+        response = self.client.get('/customer/kom/jobs/35411/revisions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([kom.pk for kom in response.context['kom_forms']], [self.r1.pk, self.r2.pk, self.r10.pk])
+        rows = {row['key']: row for row in response.context['rows']}
+        self.assertEqual(rows['sales_rep']['values'], ['Alice', 'Bob', 'Bob'])
+        self.assertEqual(rows['sales_rep']['changed'], [False, True, False])
+        self.assertEqual(rows['line_items[35411-02]']['values'], [None, '35411-02', None])
+        self.assertEqual(rows['line_items[35411-01].value_1']['changed'], [False, False, True])
+        self.assertNotIn('tank_1_qty', rows)
+        self.assertContains(response, 'Line Item 35411-01 value_1')
+    
+    def test_pairwise_and_n_way_compare(self):
+        """The two-form page and ?ids= compare the forms in the order given"""
+        response = self.client.get(f'/customer/kom/{self.r1.pk}/compare/{self.r10.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([kom.pk for kom in response.context['kom_forms']], [self.r1.pk, self.r10.pk])
+        
+        response = self.client.get('/customer/kom/compare/', {'ids': f'{self.r2.pk},{self.r1.pk},{self.r10.pk}'})
+        self.assertEqual([kom.pk for kom in response.context['kom_forms']], [self.r2.pk, self.r1.pk, self.r10.pk])
+        self.assertRedirects(self.client.get('/customer/kom/compare/', {'ids': str(self.r1.pk)}), '/customer/kom/')
+    
+    def test_missing_flat_data_is_built_once(self):
+        """Forms without flat_data are compared from raw_data without writing, and reextract_koms fills it in"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        KOMForm.objects.update(flat_data={})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/customer/kom/jobs/35411/revisions/')
+        rows = {row['key']: row for row in response.context['rows']}
+        self.assertEqual(rows['sales_rep']['values'], ['Alice', 'Bob', 'Bob'])
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(KOMForm.objects.get(pk=self.r1.pk).flat_data, {})
+        
+        call_command('reextract_koms', stdout=StringIO())
+        self.assertEqual(KOMForm.objects.get(pk=self.r1.pk).flat_data['sales_rep'], 'Alice')
+
+
+class KOMSearchTest(TestCase):
+    """Test the full-text search index over KOM forms"""
+    
+    def setUp(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import save_parsed_kom
+        User.objects.create_user(username='admin', password='testpass123', is_superuser=True)
+        self.client.login(username='admin', password='testpass123')
+        test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, test_file)
+        self.first = save_parsed_kom(parse_kom_excel(test_file))
+        self.second = save_parsed_kom({
+            'proposal_number': '35999-R1',
+            'bill_to_company': "O'Brien Boilers",
+            'line_items': [{'item_number': '35999-01', 'description': 'Heater FGR Ducting'}],
+            'equipment_required': [{'equipment_type': 'Burner', 'kn_number': 'KN-4411', 'description': 'Low NOx burner'}],
+        })
+    
+    def search_ids(self, query):
+        from .search import search_koms
+        return [kom_form_id for kom_form_id, _ in search_koms(query)]
+    
+    def test_search_covers_fields_line_items_and_equipment(self):
+        """raw_data values, line items and equipment rows are all searchable"""
+        self.assertEqual(self.search_ids("o'brien"), [self.second.pk])
+        self.assertEqual(self.search_ids('fgr ducting'), [self.second.pk])
+        self.assertEqual(self.search_ids('KN-4411'), [self.second.pk])
+        self.assertEqual(self.search_ids('35999-01'), [self.second.pk])
+        self.assertEqual(self.search_ids('boil'), [self.second.pk])
+        self.assertEqual(self.search_ids(self.first.proposal_number), [self.first.pk])
+        self.assertEqual(self.search_ids('"(*'), [])
+    
+    def test_index_follows_delete_and_rebuild(self):
+        """Deleted forms leave the index; rebuild_kom_search restores missing documents"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import KOMSearchDocument
+        self.second.delete()
+        self.assertEqual(self.search_ids('burner'), [])
+        
+        KOMSearchDocument.objects.all().delete()
+        self.assertEqual(self.search_ids(self.first.proposal_number), [])
+        call_command('rebuild_kom_search', stdout=StringIO())
+        self.assertEqual(self.search_ids(self.first.proposal_number), [self.first.pk])
+    
+    def test_search_view_highlights_matches(self):
+        """The search page lists matching forms with the matched words marked"""
+        response = self.client.get('/customer/kom/search/', {'q': 'burner'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([kom.pk for kom, _ in response.context['results']], [self.second.pk])
+        self.assertContains(response, '<mark>burner</mark>')
+        self.assertContains(response, 'O&#x27;Brien Boilers')
+
+
+class KOMStructureCommandTest(TestCase):
+    """Test the headless analyze_kom_structure command"""
+    
+    def setUp(self):
+        import shutil
+        from .kom_bench import KOM_LAYOUTS, generate_kom_workbook
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.books = os.path.join(self.test_dir, 'books')
+        os.makedirs(self.books)
+        generate_kom_workbook(os.path.join(self.books, 'a.xlsx'), KOM_LAYOUTS[0], seed=1)
+        generate_kom_workbook(os.path.join(self.books, 'b.xlsx'), KOM_LAYOUTS[1], seed=1)
+        with open(os.path.join(self.books, 'broken.xlsx'), 'w') as f:
+            f.write('not a workbook')
+        self.output = os.path.join(self.test_dir, 'structure.jsonl')
+    
+    def run_command(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out, err = StringIO(), StringIO()
+        call_command('analyze_kom_structure', self.books, '--workers', '1', '--output', self.output,
+                     *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+    
+    def read_output(self):
+        from .management.commands.analyze_kom_structure import read_records
+        return read_records(self.output)
+    
+    def test_streams_analyses_and_comparison(self):
+        """One JSON line per workbook, failures included, and a comparison of the readable ones"""
+        import json
+        from .kom_bench import KOM_LAYOUTS
+        out, err = self.run_command()
+        
+        records = self.read_output()
+        self.assertEqual([record['filename'] for record in records], ['a.xlsx', 'b.xlsx', 'broken.xlsx'])
+        self.assertIn('error', records[2])
+        self.assertIn('FAILED', err)
+        with open(os.path.join(self.test_dir, 'structure.comparison.json')) as f:
+            comparison = json.load(f)
+        self.assertEqual(comparison['files_analyzed'], 2)
+        self.assertEqual(set(comparison['section_rows']['LABOR HOURS']),
+                         {str(KOM_LAYOUTS[0].labor_row), str(KOM_LAYOUTS[1].labor_row)})
+        self.assertIn('Sections found on different rows', out)
+    
+    def test_resume_skips_analyzed_files(self):
+        """--resume keeps complete lines, drops a cut-off one and analyzes the rest"""
+        import json
+        self.run_command()
+        with open(self.output) as f:
+            first = f.readline()
+        with open(self.output, 'w') as f:
+            f.write(first + first[:20])
+        
+        out, _ = self.run_command('--resume')
+        self.assertIn('Analyzing 2 file(s), 1 already in', out)
+        self.assertEqual([record['filename'] for record in self.read_output()[1:]], ['b.xlsx', 'broken.xlsx'])
+        with open(os.path.join(self.test_dir, 'structure.comparison.json')) as f:
+            self.assertEqual(json.load(f)['files_analyzed'], 2)
+
+
+class KOMBenchTest(TestCase):
+    """Test the synthetic benchmark workbooks and the bench_kom command"""
+    
+    def setUp(self):
+        import shutil
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+    
+    def test_generated_workbooks_parse(self):
+        """Every layout variant parses with its tanks, pumps, line items and equipment"""
+        from .kom_bench import bench_variants, generate_bench_workbooks
+        workbooks = dict(generate_bench_workbooks(self.test_dir))
+        
+        for name, layout, tanks, pumps, shifted in bench_variants():
+            data = parse_kom_excel(workbooks[name])
+            self.assertEqual(sum(1 for i in range(1, 4) if data[f'tank_{i}_type']), min(tanks, 3), name)
+            self.assertEqual(sum(1 for i in range(1, 5) if data[f'pump_{i}_type']), pumps, name)
+            self.assertEqual(len(data['line_items']), layout.line_items, name)
+            self.assertEqual([eq['kn_number'] for eq in data['equipment_required']],
+                             ['890-01-012', '892-01-249', '840-01-002'], name)
+            self.assertIsNotNone(data['capital_sell_price'], name)
+    
+    def test_bench_command_baseline(self):
+        """--save-baseline writes a baseline that later runs are checked against"""
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        baseline = os.path.join(self.test_dir, 'baseline.json')
+        
+        call_command('bench_kom', '--repeat', '1', '--baseline', baseline, '--save-baseline', stdout=StringIO())
+        with open(baseline) as f:
+            results = json.load(f)
+        self.assertIn('TANKS', results['summary']['sections'])
+        self.assertGreater(results['summary']['peak_kb'], 0)
+        
+        out = StringIO()
+        call_command('bench_kom', '--repeat', '1', '--baseline', baseline, '--tolerance', '100', stdout=out)
+        self.assertIn('No regressions', out.getvalue())
+        
+        # A baseline ten times faster than reality is a regression
+        for result in [results['summary']] + list(results['workbooks'].values()):
+            result['total_ms'] /= 10
+        with open(baseline, 'w') as f:
+            json.dump(results, f)
+        with self.assertRaises(CommandError):
+            call_command('bench_kom', '--repeat', '1', '--baseline', baseline, stdout=StringIO(), stderr=StringIO())
+
+
+class KOMPersistenceTest(TestCase):
+    """Test saving parsed KOM data with bulk inserts"""
+    
+    def setUp(self):
+        """Parse the test Excel file once"""
+        test_file = create_test_kom_excel()
+        self.parsed_data = parse_kom_excel(test_file)
+        os.unlink(test_file)
+    
+    def count_queries(self, parsed_data):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import save_parsed_kom
+        with CaptureQueriesContext(connection) as queries:
+            save_parsed_kom(parsed_data)
+        return len(queries)
+    
+    def test_query_count_does_not_grow_with_rows(self):
+        """Saving a form costs the same number of queries however many rows it has"""
+        more_rows = dict(self.parsed_data, line_items=self.parsed_data['line_items'] * 20)
+        self.assertEqual(self.count_queries(self.parsed_data), self.count_queries(more_rows))
+        self.assertEqual(KOMLineItem.objects.count(), 3 + 60)
+    
+    def test_equipment_note_reads_prefetched_rows(self):
+        """The equipment note builder reads prefetched rows without further queries"""
+        from project_notes.views import build_equipment_note_data
+        from .services import save_parsed_kom
+        kom_form = save_parsed_kom(self.parsed_data, source_file='test_kom.xlsx')
+        from_db = KOMForm.objects.prefetch_related('line_items', 'equipment_required').get(pk=kom_form.pk)
+        
+        with self.assertNumQueries(0):
+            equipment_data, line_items_data = build_equipment_note_data(from_db)
+        self.assertEqual(len(line_items_data), 3)
+        self.assertEqual(line_items_data[0]['item_number'], '35371-01')
+        self.assertIn('HTR-1', equipment_data)
+        
+        # The rows save_kom_forms leaves on the saved form match the stored ones
+        with self.assertNumQueries(0):
+            self.assertEqual(build_equipment_note_data(kom_form), (equipment_data, line_items_data))
+
+
+@override_settings(KOM_IMPORT_WORKERS=0)
 class KOMImportViewTest(TestCase):
     """Test the KOM import view"""
     
@@ -675,6 +1721,12 @@ class KOMImportViewTest(TestCase):
         self.client = Client()
         self.client.login(username='testuser', password='testpass123')
         self.test_file = create_test_kom_excel()
+        import shutil
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
     
     def tearDown(self):
         """Clean up test file"""
@@ -713,6 +1765,29 @@ class KOMImportViewTest(TestCase):
         self.assertTrue(equipment.filter(equipment_type='Blower').exists())
         self.assertTrue(equipment.filter(equipment_type='Media').exists())
     
+    def test_reimport_reuses_stored_file_and_parse(self):
+        """Uploading the same workbook again shares the stored copy and skips parsing"""
+        from unittest import mock
+        from .models import KOMParseCache
+        
+        def upload():
+            with open(self.test_file, 'rb') as f:
+                return self.client.post('/customer/kom/import/', {
+                    'kom_file': SimpleUploadedFile('test_kom.xlsx', f.read())
+                })
+        
+        self.assertEqual(upload().status_code, 302)
+        with mock.patch('customer.services.parse_kom_excel') as parse:
+            self.assertEqual(upload().status_code, 302)
+        parse.assert_not_called()
+        
+        first, second = KOMForm.objects.order_by('pk')
+        self.assertEqual(len(first.file_sha256), 64)
+        self.assertEqual(first.file_sha256, second.file_sha256)
+        self.assertEqual(first.file_path, second.file_path)
+        self.assertEqual(second.line_items.count(), 3)
+        self.assertEqual(KOMParseCache.objects.count(), 1)
+    
     def test_import_kom_all_fields_present(self):
         """Test that ALL fields from the Excel are imported"""
         with open(self.test_file, 'rb') as f:
@@ -743,3 +1818,143 @@ class KOMImportViewTest(TestCase):
         self.assertTrue(kom_form.tank_1_type)
         self.assertTrue(kom_form.pump_1_type)
         self.assertTrue(kom_form.labor_pkg is not None)
+
+
+class KOMImportJobTest(TestCase):
+    """Test background KOM imports and the job progress endpoint"""
+    
+    def setUp(self):
+        """Create test user and Excel file"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            is_superuser=True
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.test_file = create_test_kom_excel()
+        self.addCleanup(os.unlink, self.test_file)
+        import shutil
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+    
+    def upload(self):
+        with open(self.test_file, 'rb') as f:
+            return self.client.post('/customer/kom/import/', {
+                'kom_file': SimpleUploadedFile('test_kom.xlsx', f.read())
+            })
+    
+    def test_upload_queues_job(self):
+        """The upload returns right away with a queued job that is submitted after commit"""
+        from unittest import mock
+        with mock.patch('customer.jobs.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.upload()
+        
+        job = KOMImportJob.objects.get()
+        self.assertRedirects(response, f'/customer/kom/import/jobs/{job.pk}/')
+        get_executor.return_value.submit.assert_called_once()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.created_by, self.user)
+        self.assertTrue(os.path.isfile(job.file_path))
+        self.assertFalse(KOMForm.objects.exists())
+        
+        response = self.client.get(f'/customer/kom/import/jobs/{job.pk}/status/')
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertFalse(response.json()['finished'])
+        self.assertContains(self.client.get(f'/customer/kom/import/jobs/{job.pk}/'), 'Queued')
+    
+    def test_run_job_saves_kom_form(self):
+        """Running a job saves the form and the job page redirects to it"""
+        from unittest import mock
+        from .jobs import run_import_job
+        with mock.patch('customer.jobs.get_executor'):
+            self.upload()
+        job = KOMImportJob.objects.get()
+        
+        run_import_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.kom_form.proposal_number, '35371')
+        self.assertEqual(job.kom_form.line_items.count(), 3)
+        self.assertIsNotNone(job.finished_at)
+        
+        status = self.client.get(f'/customer/kom/import/jobs/{job.pk}/status/').json()
+        self.assertTrue(status['finished'])
+        self.assertEqual(status['kom_form_id'], job.kom_form_id)
+        response = self.client.get(status['redirect_url'])
+        self.assertRedirects(response, f'/customer/kom/{job.kom_form_id}/')
+        
+        # A claimed job is never run twice
+        run_import_job(job.pk)
+        self.assertEqual(KOMForm.objects.count(), 1)
+    
+    def test_failed_job_reports_error(self):
+        """A job whose file cannot be parsed is marked failed with the error"""
+        from .jobs import run_import_job
+        job = KOMImportJob.objects.create(source_file='missing.xlsx', file_path='/nonexistent/missing.xlsx')
+        
+        with self.assertLogs('customer.jobs', 'ERROR'):
+            run_import_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('does not exist', job.error)
+        self.assertRedirects(self.client.get(f'/customer/kom/import/jobs/{job.pk}/'), '/customer/kom/import/')
+    
+    def test_lost_jobs_are_recovered_when_polled(self):
+        """A job left queued or parsing by a restart is resubmitted or failed instead of polling forever"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        with mock.patch('customer.jobs.get_executor'):
+            self.upload()
+        queued = KOMImportJob.objects.get()
+        stuck = KOMImportJob.objects.create(source_file='stuck.xlsx', file_path=queued.file_path,
+                                            status='parsing', started_at=timezone.now())
+        status_url = '/customer/kom/import/jobs/{}/status/'.format
+        
+        # Recent jobs are left alone
+        self.assertEqual(self.client.get(status_url(queued.pk)).json()['status'], 'queued')
+        self.assertEqual(self.client.get(status_url(stuck.pk)).json()['status'], 'parsing')
+        
+        long_ago = timezone.now() - timedelta(hours=1)
+        KOMImportJob.objects.filter(pk=queued.pk).update(created_at=long_ago)
+        KOMImportJob.objects.filter(pk=stuck.pk).update(started_at=long_ago)
+        with override_settings(KOM_IMPORT_WORKERS=0), self.assertLogs('customer.jobs', 'WARNING'):
+            self.assertEqual(self.client.get(status_url(queued.pk)).json()['status'], 'succeeded')
+            status = self.client.get(status_url(stuck.pk)).json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertIn('interrupted', status['error'])
+        self.assertEqual(KOMForm.objects.count(), 1)
+    
+    def test_worker_stops_when_its_job_was_failed(self):
+        """A worker whose job recover_stale_job failed meanwhile keeps the failure and saves no form"""
+        from unittest import mock
+        from . import jobs
+        fail = lambda: KOMImportJob.objects.update(status='failed', error='interrupted')
+        
+        # Failed while parsing: the form is never saved
+        with mock.patch('customer.jobs.get_executor'):
+            self.upload()
+        job = KOMImportJob.objects.get()
+        parse = jobs.parse_kom_cached
+        with mock.patch('customer.jobs.parse_kom_cached', side_effect=lambda *args: (parse(*args), fail())[0]), \
+                self.assertLogs('customer.jobs', 'WARNING'):
+            jobs.run_import_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'interrupted'))
+        self.assertFalse(KOMForm.objects.exists())
+        
+        # No longer saving once the form is written: the form is rolled back
+        job = KOMImportJob.objects.create(source_file='test_kom.xlsx', file_path=job.file_path,
+                                          file_sha256=job.file_sha256)
+        save = jobs.save_parsed_kom
+        with mock.patch('customer.jobs.save_parsed_kom', side_effect=lambda *args, **kwargs: (save(*args, **kwargs), fail())[0]), \
+                self.assertLogs('customer.jobs', 'WARNING'):
+            jobs.run_import_job(job.pk)
+        job.refresh_from_db()
+        self.assertIsNone(job.kom_form)
+        self.assertFalse(KOMForm.objects.exists())
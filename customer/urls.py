@@ -6,10 +6,19 @@ app_name = 'customer'
 urlpatterns = [
     path('kom/', views.kom_list, name='kom_list'),
     path('kom/import/', views.kom_import, name='kom_import'),
+    path('kom/profile/', views.kom_profile, name='kom_profile'),
+    path('kom/analytics/', views.kom_analytics, name='kom_analytics'),
+    path('kom/search/', views.kom_search, name='kom_search'),
+    path('kom/export.zip', views.kom_export_zip, name='kom_export_zip'),
+    path('kom/files/missing/', views.kom_missing_files, name='kom_missing_files'),
+    path('kom/import/jobs/<int:pk>/', views.kom_import_job, name='kom_import_job'),
+    path('kom/import/jobs/<int:pk>/status/', views.kom_import_job_status, name='kom_import_job_status'),
     path('kom/<int:pk>/', views.kom_detail, name='kom_detail'),
     path('kom/<int:pk>/delete/', views.kom_delete, name='kom_delete'),
     path('kom/<int:pk>/export/', views.kom_export_text, name='kom_export_text'),
     path('kom/<int:pk>/open/', views.kom_open_file, name='kom_open_file'),
     path('kom/<int:pk1>/compare/<int:pk2>/', views.kom_compare, name='kom_compare'),
+    path('kom/compare/', views.kom_compare_many, name='kom_compare_many'),
+    path('kom/jobs/<str:job_number>/revisions/', views.kom_revisions, name='kom_revisions'),
 ]
 
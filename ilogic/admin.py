@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Assembly, Component, Rule, RuleVersion, Inconsistency, Configurator
+from .models import Assembly, Component, Rule, RuleVersion, Inconsistency, Configurator, RuleAnalysisJob
 
 
 @admin.register(Assembly)
@@ -21,7 +21,7 @@ class RuleAdmin(admin.ModelAdmin):
     list_display = ['rule_name', 'component', 'rule_type', 'created_by', 'created_at']
     list_filter = ['rule_type', 'created_at', 'created_by']
     search_fields = ['rule_name', 'rule_code', 'component__name']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['code_hash', 'analyzer_version', 'created_at', 'updated_at']
 
 
 @admin.register(RuleVersion)
@@ -44,3 +44,11 @@ class ConfiguratorAdmin(admin.ModelAdmin):
     list_display = ['name', 'assembly', 'created_by', 'created_at']
     list_filter = ['assembly', 'created_at', 'created_by']
     search_fields = ['name', 'description']
+
+
+@admin.register(RuleAnalysisJob)
+class RuleAnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['assembly', 'status', 'processed', 'total', 'found', 'created_by', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['assembly__name', 'error']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
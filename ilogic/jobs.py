@@ -0,0 +1,127 @@
+"""Background rule analysis: imported rules are queued as RuleAnalysisJob rows and analyzed by a local thread pool"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Rule, RuleAnalysisJob
+from .services import analyze_rules
+
+logger = logging.getLogger(__name__)
+
+# Rules analyzed (and progress saved) per step
+ANALYSIS_CHUNK_SIZE = 200
+
+_executor = None
+# Jobs this process already resubmitted (see recover_stale_job)
+_resubmitted = set()
+
+
+def get_executor():
+    """Thread pool shared by all requests in this process, created on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ILOGIC_ANALYSIS_WORKERS', 2),
+            thread_name_prefix='rule-analysis',
+        )
+    return _executor
+
+
+def queue_analysis(assembly, rules, user=None):
+    """Queue a job analyzing the given rules of an assembly; returns it (None when there are no rules)"""
+    rule_ids = [rule.pk for rule in rules]
+    if not rule_ids:
+        return None
+    job = RuleAnalysisJob.objects.create(
+        assembly=assembly,
+        rule_ids=rule_ids,
+        total=len(rule_ids),
+        created_by=user,
+    )
+    submit_analysis_job(job)
+    return job
+
+
+def submit_analysis_job(job):
+    """
+    Queue a job for the worker pool once the current transaction commits.
+    With ILOGIC_ANALYSIS_WORKERS = 0 the job runs immediately in the calling thread.
+    """
+    if getattr(settings, 'ILOGIC_ANALYSIS_WORKERS', 2) <= 0:
+        run_analysis_job(job.pk)
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+
+
+def recover_stale_job(job):
+    """
+    Rescue a job the worker pool lost, e.g. to a server restart or an on_commit callback
+    that never ran, so the assembly page does not poll it forever.
+    A job still queued after ILOGIC_ANALYSIS_JOB_TIMEOUT seconds is submitted again (the claim in
+    run_analysis_job keeps it from running twice); one running that long is failed.
+    """
+    if job is None or job.is_finished:
+        return
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ILOGIC_ANALYSIS_JOB_TIMEOUT', 600))
+    if job.status == 'queued' and job.created_at < cutoff:
+        if job.pk not in _resubmitted:
+            _resubmitted.add(job.pk)
+            logger.warning('Resubmitting rule analysis job %s, queued since %s', job.pk, job.created_at)
+            submit_analysis_job(job)
+            job.refresh_from_db()
+    elif job.status == 'running' and job.started_at and job.started_at < cutoff:
+        if RuleAnalysisJob.objects.filter(pk=job.pk, status='running').update(
+                status='failed', error='The analysis was interrupted, use Analyze to check the rules again.',
+                finished_at=timezone.now()):
+            logger.warning('Rule analysis job %s running since %s, marked failed', job.pk, job.started_at)
+        job.refresh_from_db()
+
+
+def _run_in_thread(job_id):
+    try:
+        run_analysis_job(job_id)
+    finally:
+        # Worker threads get their own database connections; don't leak them
+        connections.close_all()
+
+
+class JobInterrupted(Exception):
+    """The job is no longer running under the worker, e.g. recover_stale_job failed it"""
+
+
+def update_running_job(job, **fields):
+    """Save progress or the outcome of a running job; raises JobInterrupted if it is no longer running"""
+    if not RuleAnalysisJob.objects.filter(pk=job.pk, status='running').update(**fields):
+        raise JobInterrupted(f'Rule analysis job {job.pk} is no longer running')
+
+
+def run_analysis_job(job_id, chunk_size=ANALYSIS_CHUNK_SIZE):
+    """Analyze the rules of one queued job in chunks, saving progress after each chunk"""
+    # Claim the job so it is never processed twice
+    if not RuleAnalysisJob.objects.filter(pk=job_id, status='queued').update(status='running', started_at=timezone.now()):
+        return
+    job = RuleAnalysisJob.objects.get(pk=job_id)
+
+    try:
+        for start in range(0, len(job.rule_ids), chunk_size):
+            chunk = job.rule_ids[start:start + chunk_size]
+            # A chunk's inconsistencies are only kept if the job was still running once they are written
+            with transaction.atomic():
+                # Rules deleted since the import are skipped
+                rules = Rule.objects.filter(pk__in=chunk).select_related('component')
+                found = analyze_rules(rules, prune=True)
+                update_running_job(job, processed=job.processed + len(chunk), found=job.found + found)
+            job.processed += len(chunk)
+            job.found += found
+        update_running_job(job, status='succeeded', finished_at=timezone.now())
+    except JobInterrupted as e:
+        # Already failed (see recover_stale_job); another run may be analyzing the same rules
+        logger.warning('%s, stopped', e)
+    except Exception as e:
+        logger.exception('Rule analysis job %s failed', job_id)
+        RuleAnalysisJob.objects.filter(pk=job.pk, status='running').update(
+            status='failed', error=str(e), finished_at=timezone.now())
@@ -0,0 +1,65 @@
+"""Bring rule analysis up to date after an analyzer change: manage.py reanalyze_rules [--workers N]"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ilogic.models import Rule
+from ilogic.services import RULE_CODE_FIELDS, analyze_rules, get_analyses, rule_code_fields
+from ilogic.utils import ANALYZER_VERSION, code_hash
+
+
+class Command(BaseCommand):
+    help = ('Re-derive rule types, triggers, part numbers and inconsistencies of rules whose code or '
+            'analyzer version changed since they were last analyzed, analyzing in a process pool')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of analyzer processes (default: one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of rules analyzed and saved per transaction (default: 500)')
+        parser.add_argument('--all', action='store_true',
+                            help='Re-record every rule, not just out-of-date ones (cached analyses are still reused)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rules are out of date')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        # Hashing is cheap next to analyzing, and catches code edited outside the app (e.g. the admin)
+        stale = []
+        total = 0
+        for pk, rule_code, digest, version in Rule.objects.order_by('pk').values_list(
+                'pk', 'rule_code', 'code_hash', 'analyzer_version').iterator(chunk_size=2000):
+            total += 1
+            if options['all'] or version != ANALYZER_VERSION or digest != code_hash(rule_code):
+                stale.append(pk)
+        self.stdout.write(f'{len(stale)} of {total} rule(s) to analyze (analyzer v{ANALYZER_VERSION})...')
+        if options['dry_run'] or not stale:
+            return
+
+        self.analyzed = self.found = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            map_func = partial(executor.map, chunksize=50)
+            for offset in range(0, len(stale), batch_size):
+                self.save_batch(stale[offset:offset + batch_size], map_func)
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'  {self.analyzed}/{len(stale)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Analyzed {self.analyzed} rule(s), {self.found} new inconsistency record(s), '
+            f'in {time.perf_counter() - start:.1f}s.'
+        ))
+
+    def save_batch(self, pks, map_func):
+        rules = list(Rule.objects.filter(pk__in=pks).select_related('component'))
+        analyses = get_analyses((rule.rule_code for rule in rules), map_func=map_func)
+        for rule in rules:
+            for name, value in rule_code_fields(rule.rule_code, analyses[code_hash(rule.rule_code)]).items():
+                setattr(rule, name, value)
+        # Each batch is saved on its own, so an interrupted run resumes where it stopped
+        with transaction.atomic():
+            Rule.objects.bulk_update(rules, [name for name in RULE_CODE_FIELDS if name != 'rule_code'])
+            self.found += analyze_rules(rules, prune=True, analyses=analyses)
+        self.analyzed += len(rules)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ilogic', '0002_rule_analysis_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rule',
+            name='analyzer_version',
+            field=models.PositiveIntegerField(default=0, help_text='Analyzer version those fields were derived with (0: never)'),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='code_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of rule_code when rule_type, triggers and extracted_data were derived', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='RuleAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code_hash', models.CharField(max_length=64)),
+                ('analyzer_version', models.PositiveIntegerField()),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Rule Analysis Cache',
+                'verbose_name_plural': 'Rule Analysis Cache',
+                'constraints': [models.UniqueConstraint(fields=('code_hash', 'analyzer_version'), name='unique_rule_analysis_cache')],
+            },
+        ),
+    ]
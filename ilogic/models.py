@@ -58,6 +58,8 @@ class Rule(models.Model):
     dependencies = models.JSONField(default=list, blank=True, help_text="List of other rules/components this depends on")
     extracted_data = models.JSONField(default=dict, blank=True, help_text="Extracted data: part numbers, parameters, etc.")
     notes = models.TextField(blank=True)
+    code_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of rule_code when rule_type, triggers and extracted_data were derived")
+    analyzer_version = models.PositiveIntegerField(default=0, help_text="Analyzer version those fields were derived with (0: never)")
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -70,6 +72,27 @@ class Rule(models.Model):
         return f"{self.component} > {self.rule_name}"
 
 
+class RuleAnalysisCache(models.Model):
+    """
+    analyze_code output for a rule's code, keyed by its SHA-256 and the analyzer version.
+    Imports only store analyze_code_fields; the analysis job adds the inconsistencies (see get_analyses).
+    """
+    code_hash = models.CharField(max_length=64)
+    analyzer_version = models.PositiveIntegerField()
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Rule Analysis Cache"
+        verbose_name_plural = "Rule Analysis Cache"
+        constraints = [
+            models.UniqueConstraint(fields=['code_hash', 'analyzer_version'], name='unique_rule_analysis_cache'),
+        ]
+    
+    def __str__(self):
+        return f"{self.code_hash[:12]} (analyzer v{self.analyzer_version})"
+
+
 class RuleVersion(models.Model):
     """Version history for rules"""
     rule = models.ForeignKey(Rule, on_delete=models.CASCADE, related_name='versions')
@@ -134,6 +157,44 @@ class Inconsistency(models.Model):
         return f"{self.get_severity_display()}: {self.get_inconsistency_type_display()} - {self.description[:50]}"
 
 
+class RuleAnalysisJob(models.Model):
+    """Imported rules waiting for, or done with, inconsistency analysis in the background"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    assembly = models.ForeignKey(Assembly, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    rule_ids = models.JSONField(default=list, blank=True, help_text="Primary keys of the rules to analyze")
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    found = models.IntegerField(default=0, help_text="Inconsistencies recorded")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Rule Analysis Job"
+        verbose_name_plural = "Rule Analysis Jobs"
+        ordering = ['-created_at']
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+    
+    @property
+    def percent(self):
+        return int(self.processed * 100 / self.total) if self.total else 100
+    
+    def __str__(self):
+        return f"{self.assembly.name}: {self.processed}/{self.total} rules ({self.status})"
+
+
 class Configurator(models.Model):
     """Configurator for simulating rule execution"""
     assembly = models.ForeignKey(Assembly, on_delete=models.CASCADE, related_name='configurators')
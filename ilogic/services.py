@@ -0,0 +1,223 @@
+"""Saving parsed iLogic exports (see parse_markdown_import / parse_structured_import) and rule analysis to the database"""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Assembly, Component, Inconsistency, Rule, RuleAnalysisCache, RuleVersion
+from .utils import ANALYZER_VERSION, analyze_code, analyze_code_fields, code_hash
+
+
+class ImportSummary(NamedTuple):
+    """Outcome of import_rules: the saved Rule rows that were created or updated, and how many were unchanged"""
+    assembly: Assembly
+    created: List[Rule]
+    updated: List[Rule]
+    unchanged: int
+
+
+def get_analyses(codes: Iterable[str], map_func: Callable = map, inconsistencies: bool = True) -> Dict[str, Dict]:
+    """
+    analyze_code output for each of the given codes, keyed by code_hash.
+    Code analyzed before by the same analyzer version is read from RuleAnalysisCache; the rest
+    is analyzed with map_func (e.g. a process pool's map) and cached.
+    Without inconsistencies only analyze_code_fields is run (as import_rules does, leaving
+    inconsistencies to the analysis job); cache entries saved that way are completed when a full
+    analysis is asked for.
+    """
+    codes = {code_hash(code): code for code in codes}
+    hashes = list(codes)
+    analyses = {}
+    # Chunked to stay under the database's query parameter limit
+    for start in range(0, len(hashes), 500):
+        analyses.update(RuleAnalysisCache.objects.filter(
+            analyzer_version=ANALYZER_VERSION, code_hash__in=hashes[start:start + 500],
+        ).values_list('code_hash', 'result'))
+    partial = set()
+    if inconsistencies:
+        partial = {digest for digest, result in analyses.items() if 'inconsistencies' not in result}
+    missing = [digest for digest in hashes if digest not in analyses or digest in partial]
+    analyzer = analyze_code if inconsistencies else analyze_code_fields
+    computed = dict(zip(missing, map_func(analyzer, [codes[digest] for digest in missing])))
+    RuleAnalysisCache.objects.bulk_create(
+        [RuleAnalysisCache(code_hash=digest, analyzer_version=ANALYZER_VERSION, result=result)
+         for digest, result in computed.items() if digest not in partial],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    if partial:
+        RuleAnalysisCache.objects.bulk_create(
+            [RuleAnalysisCache(code_hash=digest, analyzer_version=ANALYZER_VERSION, result=computed[digest])
+             for digest in partial],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['code_hash', 'analyzer_version'],
+            update_fields=['result'],
+        )
+    analyses.update(computed)
+    return analyses
+
+
+def get_analysis(code: str, inconsistencies: bool = True) -> Dict:
+    """analyze_code output for one rule's code, cached (see get_analyses)"""
+    return get_analyses([code], inconsistencies=inconsistencies)[code_hash(code)]
+
+
+# Rule fields set from its code (see rule_code_fields)
+RULE_CODE_FIELDS = ('rule_code', 'code_hash', 'analyzer_version', 'rule_type', 'triggers', 'extracted_data')
+
+
+def rule_code_fields(code: str, analysis: Optional[Dict] = None) -> Dict:
+    """Rule fields derived from its code (as rule_edit sets them), from its analysis (looked up when not given)"""
+    if analysis is None:
+        analysis = get_analysis(code, inconsistencies=False)
+    return {
+        'rule_code': code,
+        'code_hash': code_hash(code),
+        'analyzer_version': ANALYZER_VERSION,
+        'rule_type': analysis['rule_type'],
+        'triggers': analysis['triggers'],
+        'extracted_data': {
+            'part_numbers': analysis['part_numbers'],
+        },
+    }
+
+
+def is_analyzed(rule: Rule, code: Optional[str] = None) -> bool:
+    """Whether the rule's derived fields are up to date for code (default: its own code)"""
+    code = rule.rule_code if code is None else code
+    return rule.analyzer_version == ANALYZER_VERSION and rule.code_hash == code_hash(code)
+
+
+def import_rules(data: Dict, user: Optional[User] = None, batch_size: int = 500) -> ImportSummary:
+    """
+    Save parsed export data ({'assembly_name': ..., 'components': {name: {'rules': [{'name', 'code'}]}}})
+    in one transaction and a handful of queries however many rules there are.
+    The assembly's components and rules are loaded once and compared in memory: new ones are
+    bulk created, rules whose code changed are bulk updated (keeping the previous code as a
+    RuleVersion, like rule_edit) and identical rules are left alone.
+    Rules without code are skipped; a rule repeated for the same component is imported once.
+    """
+    with transaction.atomic():
+        assembly, _ = Assembly.objects.get_or_create(
+            name=data['assembly_name'],
+            defaults={'created_by': user}
+        )
+
+        components = {component.name: component for component in assembly.components.all()}
+        new_components = [Component(assembly=assembly, name=name)
+                          for name in data['components'] if name not in components]
+        Component.objects.bulk_create(new_components, batch_size=batch_size)
+        components.update((component.name, component) for component in new_components)
+
+        existing = {
+            (rule.component_id, rule.rule_name): rule
+            for rule in Rule.objects.filter(component__assembly=assembly).select_related('component')
+        }
+        to_create, to_update, unchanged = [], [], 0
+        seen = set()
+        for comp_name, comp_data in data['components'].items():
+            component = components[comp_name]
+            for rule_data in comp_data['rules']:
+                code = rule_data.get('code')
+                key = (component.pk, rule_data['name'])
+                if not code or key in seen:
+                    continue
+                seen.add(key)
+
+                rule = existing.get(key)
+                if rule is None:
+                    to_create.append((component, rule_data['name'], code))
+                elif rule.rule_code != code:
+                    to_update.append((rule, code))
+                else:
+                    unchanged += 1
+
+        # Code shared by several rules (or seen in an earlier import) is analyzed once; inconsistencies
+        # are left to the analysis job (see queue_analysis)
+        analyses = get_analyses([code for *_, code in to_create] + [code for _, code in to_update],
+                                inconsistencies=False)
+
+        created = [
+            Rule(component=component, rule_name=name, created_by=user,
+                 **rule_code_fields(code, analyses[code_hash(code)]))
+            for component, name, code in to_create
+        ]
+        Rule.objects.bulk_create(created, batch_size=batch_size)
+
+        updated = []
+        if to_update:
+            latest_versions = dict(
+                RuleVersion.objects.filter(rule__component__assembly=assembly)
+                .values_list('rule').annotate(Max('version_number'))
+            )
+            RuleVersion.objects.bulk_create([
+                RuleVersion(
+                    rule=rule,
+                    version_number=latest_versions.get(rule.pk, 0) + 1,
+                    code_snapshot=rule.rule_code,
+                    change_notes='Updated by import',
+                    created_by=user,
+                )
+                for rule, _ in to_update
+            ], batch_size=batch_size)
+            # bulk_update does not touch auto_now fields
+            now = timezone.now()
+            for rule, code in to_update:
+                for name, value in rule_code_fields(code, analyses[code_hash(code)]).items():
+                    setattr(rule, name, value)
+                rule.updated_at = now
+                updated.append(rule)
+            Rule.objects.bulk_update(updated, [*RULE_CODE_FIELDS, 'updated_at'], batch_size=batch_size)
+
+    return ImportSummary(assembly, created, updated, unchanged)
+
+
+def analyze_rules(rules, found_by: Optional[User] = None, prune: bool = False,
+                  analyses: Optional[Dict[str, Dict]] = None, batch_size: int = 500) -> int:
+    """
+    Record the inconsistencies found in each rule's code, as analyze_rule does: one Inconsistency
+    per rule and type, kept if it is already recorded. With prune, open inconsistencies of these
+    rules whose type is no longer found are deleted (fixed and ignored ones are kept).
+    Analyses come from the cache (see get_analyses) unless given, and existing records are read
+    in one query. Returns the number of new Inconsistency rows.
+    Rules should come with select_related('component').
+    """
+    rules = list(rules)
+    if analyses is None:
+        analyses = get_analyses(rule.rule_code for rule in rules)
+    recorded = set(
+        Inconsistency.objects.filter(rule__in=rules).values_list('rule_id', 'inconsistency_type')
+    )
+    found = set()
+    new = []
+    for rule in rules:
+        for inc in analyses[code_hash(rule.rule_code)]['inconsistencies']:
+            key = (rule.pk, inc['type'])
+            found.add(key)
+            if key in recorded:
+                continue
+            recorded.add(key)
+            new.append(Inconsistency(
+                rule=rule,
+                component=rule.component,
+                assembly_id=rule.component.assembly_id,
+                inconsistency_type=inc['type'],
+                severity=inc['severity'],
+                description=inc['description'],
+                code_location=inc.get('code_location', ''),
+                suggested_fix=inc.get('suggested_fix', ''),
+                found_by=found_by,
+            ))
+    if prune:
+        stale = {}
+        for rule_id, inconsistency_type in recorded - found:
+            stale.setdefault(inconsistency_type, []).append(rule_id)
+        for inconsistency_type, rule_ids in stale.items():
+            Inconsistency.objects.filter(
+                rule_id__in=rule_ids, inconsistency_type=inconsistency_type, status='open',
+            ).delete()
+    Inconsistency.objects.bulk_create(new, batch_size=batch_size)
+    return len(new)
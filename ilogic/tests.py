@@ -1,3 +1,403 @@
-from django.test import TestCase
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import io
 
-# Create your tests here.
+from .models import Assembly, Component, Inconsistency, Rule, RuleAnalysisCache, RuleAnalysisJob, RuleVersion
+from .jobs import queue_analysis, run_analysis_job
+from .services import analyze_rules, get_analyses, import_rules
+from .utils import (
+    ANALYZER_VERSION, MarkdownRuleReader, code_hash, parse_markdown_import, tokenize,
+    detect_inconsistencies, extract_part_numbers, extract_triggers, parse_component_name_from_code,
+    NAME, NEWLINE, OP, STRING,
+)
+
+
+SAMPLE_EXPORT = """# Heater Assembly
+
+Exported from Inventor
+
+## Rule: FlangeSize
+*Component: [[RFSO FLANGE 150LB:1]]*
+*Path: `C:\\Work\\RFSO FLANGE 150LB.ipt`*
+
+```vbnet
+If FlangeSize = 2 Then
+    iProperties.Value("Custom", "KEMCO PART NUMBER") = "800-08-009"
+End If
+```
+
+## Rule: Description
+*Component: [[SHELL:1]]*
+```vbnet
+' # not a heading
+iProperties.Value("Project", "Description") = "SHELL"
+```
+
+## Rule: Visibility
+*Component: [[RFSO FLANGE 150LB:1]]*
+
+```vbnet
+Component.IsActive("PIPE:1") = True
+```
+"""
+
+
+class MarkdownImportParserTest(TestCase):
+    """Tests for the single-file markdown export parser"""
+
+    def test_parse_sample_export(self):
+        data = parse_markdown_import(SAMPLE_EXPORT)
+        self.assertEqual(data['assembly_name'], 'Heater Assembly')
+        self.assertEqual(list(data['components']), ['RFSO FLANGE 150LB:1', 'SHELL:1'])
+
+        flange = data['components']['RFSO FLANGE 150LB:1']
+        self.assertEqual(flange['path'], 'C:\\Work\\RFSO FLANGE 150LB.ipt')
+        self.assertEqual([rule['name'] for rule in flange['rules']], ['FlangeSize', 'Visibility'])
+        self.assertEqual(flange['rules'][1]['code'], 'Component.IsActive("PIPE:1") = True')
+
+        # No path line, and a comment that looks like a heading stays in the code
+        shell = data['components']['SHELL:1']
+        self.assertEqual(shell['path'], '')
+        self.assertEqual(shell['rules'][0]['code'],
+                         '\' # not a heading\niProperties.Value("Project", "Description") = "SHELL"')
+
+    def test_crlf_and_byte_lines(self):
+        expected = parse_markdown_import(SAMPLE_EXPORT)
+        crlf = SAMPLE_EXPORT.replace('\n', '\r\n')
+        self.assertEqual(parse_markdown_import(crlf), expected)
+        self.assertEqual(parse_markdown_import(io.BytesIO(crlf.encode('utf-8'))), expected)
+
+    def test_duplicate_rule_keeps_first(self):
+        content = SAMPLE_EXPORT + (
+            "\n## Rule: FlangeSize\n*Component: [[RFSO FLANGE 150LB:1]]*\n```vbnet\nFlangeSize = 4\n```\n"
+        )
+        rules = parse_markdown_import(content)['components']['RFSO FLANGE 150LB:1']['rules']
+        self.assertEqual([rule['name'] for rule in rules], ['FlangeSize', 'Visibility'])
+        self.assertIn('FlangeSize = 2', rules[0]['code'])
+
+    def test_blank_line_before_component(self):
+        content = "# Assembly\n## Rule: Spaced\n\n*Component: [[SHELL:1]]*\n\n```vbnet\nx = 1\n```\n"
+        rules = parse_markdown_import(content)['components']['SHELL:1']['rules']
+        self.assertEqual(rules, [{'name': 'Spaced', 'code': 'x = 1'}])
+
+    def test_rule_without_component_is_skipped(self):
+        content = "# Assembly\n## Rule: Orphan\n```vbnet\nx = 1\n```\n"
+        reader = MarkdownRuleReader(content)
+        self.assertEqual(list(reader), [])
+        self.assertEqual(reader.assembly_name, 'Assembly')
+
+    def test_import_view_reads_upload(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        upload = SimpleUploadedFile('export.md', SAMPLE_EXPORT.encode('utf-8'), content_type='text/markdown')
+
+        response = client.post(reverse('ilogic:import_markdown'), {'file': upload})
+        assembly = Assembly.objects.get(name='Heater Assembly')
+        self.assertRedirects(response, reverse('ilogic:assembly_detail', args=[assembly.pk]))
+        self.assertEqual(Rule.objects.filter(component__assembly=assembly).count(), 3)
+
+
+class ImportRulesTest(TestCase):
+    """Tests for the batched import pipeline"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def make_data(self, components=20, rules=100, code='x = {}'):
+        return {
+            'assembly_name': 'Heater Assembly',
+            'components': {
+                f'PART {c}:1': {
+                    'name': f'PART {c}:1',
+                    'rules': [{'name': f'Rule{r}', 'code': code.format(r)} for r in range(rules)],
+                }
+                for c in range(components)
+            },
+        }
+
+    def test_large_import_uses_few_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            summary = import_rules(self.make_data(), self.user)
+        self.assertEqual(len(summary.created), 2000)
+        self.assertEqual(Rule.objects.count(), 2000)
+        self.assertEqual(Component.objects.count(), 20)
+        # Inserts are batched (SQLite caps a query at 999 parameters), not one query per rule
+        self.assertLess(len(queries), 50)
+        rule = Rule.objects.get(component__name='PART 3:1', rule_name='Rule7')
+        self.assertEqual(rule.rule_code, 'x = 7')
+        self.assertEqual(rule.created_by, self.user)
+
+    def test_reimport_updates_only_changed_rules(self):
+        import_rules(self.make_data(components=2, rules=3), self.user)
+        data = self.make_data(components=2, rules=4)
+        data['components']['PART 1:1']['rules'][0]['code'] = 'x = 100'
+        data['components']['PART 1:1']['rules'].append({'name': 'Empty', 'code': ''})
+
+        summary = import_rules(data, self.user)
+        self.assertEqual(sorted(rule.rule_name for rule in summary.created), ['Rule3', 'Rule3'])
+        self.assertEqual([rule.rule_name for rule in summary.updated], ['Rule0'])
+        self.assertEqual(summary.unchanged, 5)
+        self.assertFalse(Rule.objects.filter(rule_name='Empty').exists())
+
+        rule = Rule.objects.get(component__name='PART 1:1', rule_name='Rule0')
+        self.assertEqual(rule.rule_code, 'x = 100')
+        version = RuleVersion.objects.get(rule=rule)
+        self.assertEqual((version.version_number, version.code_snapshot), (1, 'x = 0'))
+
+    def test_failed_import_writes_nothing(self):
+        data = self.make_data(components=2, rules=3)
+        data['components']['PART 1:1']['rules'].append({'code': 'x = 1'})  # no name
+        with self.assertRaises(KeyError):
+            import_rules(data, self.user)
+        self.assertFalse(Assembly.objects.exists())
+        self.assertFalse(Rule.objects.exists())
+
+
+BROKEN_RULE = 'If x = 1 Then\n    iProperties.Value("Custom", "KEMCO PART NUMBER") = "800-XXX"\n'
+
+
+@override_settings(ILOGIC_ANALYSIS_WORKERS=0)
+class RuleAnalysisJobTest(TestCase):
+    """Tests for background analysis of imported rules"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_import_analyzes_new_rules(self):
+        content = SAMPLE_EXPORT + f"\n## Rule: Broken\n*Component: [[SHELL:1]]*\n```vbnet\n{BROKEN_RULE}```\n"
+        upload = SimpleUploadedFile('export.md', content.encode('utf-8'), content_type='text/markdown')
+        self.client.post(reverse('ilogic:import_markdown'), {'file': upload})
+
+        job = RuleAnalysisJob.objects.get()
+        self.assertEqual((job.status, job.processed, job.total), ('succeeded', 4, 4))
+        self.assertEqual(job.found, Inconsistency.objects.count())
+        broken = Rule.objects.get(rule_name='Broken')
+        self.assertEqual(
+            set(broken.inconsistencies.values_list('inconsistency_type', flat=True)),
+            {'missing_part_number', 'logic_inconsistency'},
+        )
+        self.assertEqual(broken.inconsistencies.first().assembly, job.assembly)
+
+        # Re-importing the same file queues nothing and records nothing twice
+        upload = SimpleUploadedFile('export.md', content.encode('utf-8'), content_type='text/markdown')
+        self.client.post(reverse('ilogic:import_markdown'), {'file': upload})
+        self.assertEqual(RuleAnalysisJob.objects.count(), 1)
+        self.assertEqual(Inconsistency.objects.count(), job.found)
+
+        response = self.client.get(reverse('ilogic:analysis_job_status', args=[job.pk]))
+        self.assertEqual(response.json()['percent'], 100)
+
+    def test_job_runs_in_chunks_once(self):
+        data = {'assembly_name': 'Tank', 'components': {'TANK:1': {'name': 'TANK:1', 'rules': [
+            {'name': f'Rule{i}', 'code': BROKEN_RULE} for i in range(5)
+        ]}}}
+        summary = import_rules(data, self.user)
+        with override_settings(ILOGIC_ANALYSIS_WORKERS=1):
+            # Queued for the pool, which only starts once the transaction commits
+            job = queue_analysis(summary.assembly, summary.created, self.user)
+        self.assertEqual(job.status, 'queued')
+        summary.created[0].delete()
+
+        run_analysis_job(job.pk, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.found), ('succeeded', 5, 8))
+
+        # A finished job is not claimed again
+        run_analysis_job(job.pk)
+        self.assertEqual(Inconsistency.objects.count(), 8)
+
+        response = self.client.get(reverse('ilogic:assembly_detail', args=[summary.assembly.pk]))
+        self.assertNotContains(response, 'Analyzing imported rules')
+
+    def test_worker_stops_when_its_job_was_failed(self):
+        """A worker whose job is no longer running records nothing more, so two runs never overlap"""
+        from unittest.mock import patch
+        from . import jobs
+        data = {'assembly_name': 'Tank', 'components': {'TANK:1': {'name': 'TANK:1', 'rules': [
+            {'name': f'Rule{i}', 'code': BROKEN_RULE} for i in range(5)
+        ]}}}
+        summary = import_rules(data, self.user)
+        with override_settings(ILOGIC_ANALYSIS_WORKERS=1):
+            job = queue_analysis(summary.assembly, summary.created, self.user)
+
+        calls = []
+        analyze = jobs.analyze_rules
+
+        def analyze_then_fail(rules, **kwargs):
+            calls.append(rules)
+            found = analyze(rules, **kwargs)
+            if len(calls) == 2:
+                RuleAnalysisJob.objects.update(status='failed')
+            return found
+
+        with patch('ilogic.jobs.analyze_rules', side_effect=analyze_then_fail), self.assertLogs('ilogic.jobs', 'WARNING'):
+            run_analysis_job(job.pk, chunk_size=2)
+        # The first chunk was kept; the one analyzed after the failure was rolled back and the last never ran
+        self.assertEqual(len(calls), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.processed, job.found), (2, 4))
+        self.assertNotEqual(job.status, 'succeeded')
+        self.assertEqual(Inconsistency.objects.count(), 4)
+
+    def test_lost_jobs_are_recovered_when_polled(self):
+        """A job left queued or running by a restart is resubmitted or failed instead of polling forever"""
+        from datetime import timedelta
+        from django.utils import timezone
+        data = {'assembly_name': 'Tank', 'components': {'TANK:1': {'name': 'TANK:1', 'rules': [
+            {'name': 'Rule0', 'code': BROKEN_RULE}
+        ]}}}
+        summary = import_rules(data, self.user)
+        with override_settings(ILOGIC_ANALYSIS_WORKERS=1):
+            queued = queue_analysis(summary.assembly, summary.created, self.user)
+        running = RuleAnalysisJob.objects.create(assembly=summary.assembly, rule_ids=[], status='running',
+                                                 started_at=timezone.now())
+        status_url = lambda job: reverse('ilogic:analysis_job_status', args=[job.pk])
+
+        # Recent jobs are left alone
+        self.assertEqual(self.client.get(status_url(queued)).json()['status'], 'queued')
+        self.assertEqual(self.client.get(status_url(running)).json()['status'], 'running')
+
+        long_ago = timezone.now() - timedelta(hours=1)
+        RuleAnalysisJob.objects.filter(pk=queued.pk).update(created_at=long_ago)
+        RuleAnalysisJob.objects.filter(pk=running.pk).update(started_at=long_ago)
+        with self.assertLogs('ilogic.jobs', 'WARNING'):
+            self.assertEqual(self.client.get(status_url(queued)).json()['status'], 'succeeded')
+            # The assembly page recovers the latest job too
+            response = self.client.get(reverse('ilogic:assembly_detail', args=[summary.assembly.pk]))
+        self.assertContains(response, 'Analysis of imported rules failed')
+        self.assertNotContains(response, 'Analyzing imported rules')
+        self.assertEqual(Inconsistency.objects.count(), 2)
+
+
+@override_settings(ILOGIC_ANALYSIS_WORKERS=0)
+class RuleAnalysisCacheTest(TestCase):
+    """Tests for the code-hash analysis cache and reanalyze_rules"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.summary = import_rules({'assembly_name': 'Tank', 'components': {
+            f'TANK:{i}': {'name': f'TANK:{i}', 'rules': [{'name': 'PartNumber', 'code': BROKEN_RULE}]}
+            for i in range(3)
+        }}, self.user)
+
+    def test_identical_code_is_analyzed_once(self):
+        self.assertEqual(RuleAnalysisCache.objects.count(), 1)
+        for rule in Rule.objects.all():
+            self.assertEqual((rule.code_hash, rule.analyzer_version), (code_hash(BROKEN_RULE), ANALYZER_VERSION))
+            self.assertEqual(rule.rule_type, 'part_number')
+
+        from unittest.mock import patch
+        with patch('ilogic.services.analyze_code_fields') as analyze_code_fields:
+            get_analyses([BROKEN_RULE], inconsistencies=False)
+        analyze_code_fields.assert_not_called()
+
+    def test_import_leaves_inconsistencies_to_the_job(self):
+        from unittest.mock import patch
+        with patch('ilogic.utils.detect_inconsistencies') as detect_inconsistencies:
+            import_rules({'assembly_name': 'Tank', 'components': {'TANK:9': {'name': 'TANK:9', 'rules': [
+                {'name': 'Other', 'code': BROKEN_RULE + "' edited\n"}
+            ]}}}, self.user)
+        detect_inconsistencies.assert_not_called()
+        self.assertNotIn('inconsistencies', RuleAnalysisCache.objects.first().result)
+
+        # The job completes the cached analysis, which is then reused
+        analyze_rules(Rule.objects.select_related('component'))
+        self.assertEqual(Inconsistency.objects.count(), 8)
+        self.assertEqual(RuleAnalysisCache.objects.count(), 2)
+        with patch('ilogic.services.analyze_code') as analyze_code:
+            analyses = get_analyses([BROKEN_RULE])
+        analyze_code.assert_not_called()
+        self.assertEqual(len(analyses[code_hash(BROKEN_RULE)]['inconsistencies']), 2)
+
+    def test_edit_with_unchanged_code_skips_analysis(self):
+        rule = self.summary.created[0]
+        form = {'rule_name': 'PartNumber', 'rule_code': BROKEN_RULE + 'End If\n', 'notes': ''}
+        from unittest.mock import patch
+        with patch('ilogic.views.analyze_rule') as analyze_rule:
+            self.client.post(reverse('ilogic:rule_edit', args=[rule.pk]), form)
+            analyze_rule.assert_called_once()
+
+            form['notes'] = 'checked'
+            self.client.post(reverse('ilogic:rule_edit', args=[rule.pk]), form)
+            analyze_rule.assert_called_once()
+        rule.refresh_from_db()
+        self.assertEqual((rule.notes, rule.code_hash), ('checked', code_hash(BROKEN_RULE + 'End If')))
+        self.assertEqual(rule.versions.count(), 2)
+
+    def test_reanalyze_only_out_of_date_rules(self):
+        from django.core.management import call_command
+        first, second, third = self.summary.created
+        Rule.objects.filter(pk=first.pk).update(analyzer_version=0, rule_type='other')
+        # Edited outside the app: the stored hash no longer matches the code
+        Rule.objects.filter(pk=second.pk).update(rule_code='Parameter("TANK:2", "Size") = 2')
+        Inconsistency.objects.create(rule=second, inconsistency_type='missing_part_number', description='stale')
+
+        out = io.StringIO()
+        call_command('reanalyze_rules', '--workers', '1', stdout=out)
+        self.assertIn('2 of 3 rule(s) to analyze', out.getvalue())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.rule_type, first.analyzer_version), ('part_number', ANALYZER_VERSION))
+        self.assertEqual(second.rule_type, 'parameter')
+        self.assertEqual(set(first.inconsistencies.values_list('inconsistency_type', flat=True)),
+                         {'missing_part_number', 'logic_inconsistency'})
+        # The open issue the new code no longer has is gone
+        self.assertFalse(second.inconsistencies.exists())
+        self.assertFalse(third.inconsistencies.exists())
+
+        out = io.StringIO()
+        call_command('reanalyze_rules', '--workers', '1', stdout=out)
+        self.assertIn('0 of 3 rule(s) to analyze', out.getvalue())
+
+
+FLANGE_RULE = """' Set the flange part number (was "800-XXX", If ... End If)
+If FlangeSize = 2 Then
+    iProperties.Value("PART 1:1", "Custom", "KEMCO PART NUMBER") = "800-08-009"
+    iProperties.Value("PART 1:1", "Custom", "KEMCO DESCRIPTION") = "FLANGE 2"" SS304"
+ElseIf FlangeSize = 3 Then
+    iProperties.Value("PART 1:1", "Custom", "KEMCO PART NUMBER") = "800-08-009"
+    iProperties.Value("PART 1:1", "Custom", "KEMCO DESCRIPTION") = "FLANGE 3"" SS304"
+End If
+If MATERIAL = "SS316" Then Parameter("RFSO FLANGE 150LB:1", "Thickness") = 2
+MessageBox.Show("If this shows, End If", _
+    "Flange")
+"""
+
+
+class VBALexerTest(TestCase):
+    """Tests for the VBA tokenizer and the extractors built on it"""
+
+    def test_tokenize(self):
+        tokens = tokenize('x = "say ""hi""" \' comment "y"\nMessageBox.Show("a", _\n    "b")\n')
+        self.assertEqual(tokens[:4], [(NAME, 'x'), (OP, '='), (STRING, 'say "hi"'), (NEWLINE, '\n')])
+        # The continued line is one logical line
+        self.assertEqual([token for token in tokens[4:] if token[0] == NEWLINE], [(NEWLINE, '\n')])
+        self.assertNotIn((STRING, 'y'), tokens)
+
+    def test_extractors(self):
+        self.assertEqual(extract_triggers(FLANGE_RULE), ['FlangeSize', 'MATERIAL', 'Thickness'])
+        self.assertEqual(parse_component_name_from_code(FLANGE_RULE), 'PART 1:1')
+        part_numbers = extract_part_numbers(FLANGE_RULE)
+        self.assertEqual([(pn['part_number'], pn['description'], pn['size']) for pn in part_numbers], [
+            ('800-08-009', 'FLANGE 2" SS304', '2'),
+            ('800-08-009', 'FLANGE 3" SS304', '3'),
+        ])
+
+    def test_inconsistencies_ignore_comments_and_strings(self):
+        found = detect_inconsistencies(FLANGE_RULE)
+        # Balanced blocks (the single-line If needs no End If), and the placeholder is only in a comment
+        self.assertEqual(sorted(inc['type'] for inc in found),
+                         ['description_mismatch', 'description_mismatch', 'duplicate_part_number'])
+
+        unbalanced = detect_inconsistencies('If x = 1 Then\n  y = 2\nIf z = 1 Then\nEnd If\n')
+        self.assertEqual([inc['description'] for inc in unbalanced],
+                         ['Mismatched If/End If statements: 2 If, 1 End If'])
@@ -30,6 +30,7 @@ urlpatterns = [
     # Analysis views
     path('analysis/', views.analysis_dashboard, name='analysis_dashboard'),
     path('analysis/assembly/<int:pk>/', views.assembly_analysis, name='assembly_analysis'),
+    path('analysis/jobs/<int:pk>/status/', views.analysis_job_status, name='analysis_job_status'),
     
     # Inconsistency views
     path('inconsistencies/', views.inconsistency_list, name='inconsistency_list'),
@@ -1,46 +1,190 @@
 """
 Utility functions for parsing, analyzing, and processing iLogic rules
 """
+import hashlib
 import re
 import json
-from typing import Dict, List, Tuple, Optional
+from functools import cached_property
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Optional
 
 
-def parse_component_name_from_code(code: str) -> Optional[str]:
+# A token is a (kind, text) pair; string tokens hold the text without quotes
+Token = Tuple[str, str]
+
+# Token kinds
+NAME, STRING, NUMBER, OP, NEWLINE = 'name', 'string', 'number', 'op', 'newline'
+
+# Whitespace, comments and line continuations are matched ahead of each token and dropped
+_TOKEN_PATTERN = re.compile(r'''
+    (?:[ \t]+_[ \t]*(?:\r\n|\r|\n)            # line continuation
+     | (?im:^[ \t]*rem\b[^\r\n]*)              # Rem comment
+     | [ \t\f]+
+     | '[^\r\n]*)*                             # ' comment
+    (?:
+        (?P<newline>\r\n|\r|\n)
+      | "(?P<string>(?:[^"\r\n]|"")*)"?        # an unterminated string runs to the end of the line
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<op><>|<=|>=|\S)
+    )
+''', re.VERBOSE)
+
+_COMPARISONS = {'=', '<', '>', '<>', '<=', '>='}
+_BRANCH_KEYWORDS = {'IF', 'ELSEIF', 'ELSE', 'CASE'}
+_VBA_KEYWORDS = {'dim', 'if', 'then', 'else', 'end', 'sub', 'function', 'as', 'string', 'integer', 'boolean'}
+_PLACEHOLDER = re.compile(r'[\w-]+-XXX', re.IGNORECASE)
+_SIZE_PATTERNS = [
+    re.compile(r'(\d+(?:\.\d+)?)"'),  # e.g., "2"", "1.5""
+    re.compile(r'(\d+(?:\.\d+)?)\s*inch', re.IGNORECASE),
+]
+
+
+class TokenStream(list):
+    """Tokens of one rule's code (see tokenize); the calls in it are found once, on first use"""
+    @cached_property
+    def calls(self) -> List['_Call']:
+        return _calls(self)
+
+
+def tokenize(code: str) -> TokenStream:
+    """
+    Split VBA/iLogic code into (kind, text) tokens in one pass. Comments are dropped and
+    continued lines joined, so extractors never match text inside comments or string literals;
+    every line ends with a NEWLINE token.
+    """
+    tokens = TokenStream()
+    append = tokens.append
+    for match in _TOKEN_PATTERN.finditer(code):
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == STRING and '""' in text:
+            text = text.replace('""', '"')
+        append((kind, text))
+    return tokens
+
+
+def _line_ends(tokens: List[Token]) -> Iterator[Tuple[Token, Token, Token]]:
+    """First, second (or None) and last token of each non-blank line"""
+    start = 0
+    for index, (kind, _) in enumerate(tokens + [(NEWLINE, '')]):
+        if kind == NEWLINE:
+            if index > start:
+                yield tokens[start], tokens[start + 1] if index > start + 1 else None, tokens[index - 1]
+            start = index + 1
+
+
+def _is_name(token: Optional[Token], name: str) -> bool:
+    return token is not None and token[0] == NAME and token[1].upper() == name
+
+
+def _string_arg(arg: List[Token]) -> Optional[str]:
+    """The text of an argument that is a single string literal"""
+    return arg[0][1] if len(arg) == 1 and arg[0][0] == STRING else None
+
+
+class _Call(NamedTuple):
+    """A Parameter(...) or iProperties.Value(...) call"""
+    name: str                   # 'PARAMETER' or 'IPROPERTIES.VALUE'
+    args: List[List[Token]]
+    value: Optional[str]        # String literal assigned to (or compared with) the call
+    branch: int                 # Incremented at every If / ElseIf / Else / Case
+
+
+def _calls(tokens: List[Token]) -> List[_Call]:
+    calls = []
+    branch = 0
+    count = len(tokens)
+    for index, (kind, text) in enumerate(tokens):
+        if kind != NAME:
+            continue
+        key = text.upper()
+        if key in _BRANCH_KEYWORDS:
+            branch += 1
+            continue
+        if key == 'PARAMETER' and index + 1 < count and tokens[index + 1] == (OP, '('):
+            name, end = 'PARAMETER', index + 2
+        elif (key == 'IPROPERTIES' and index + 3 < count and tokens[index + 1] == (OP, '.')
+              and _is_name(tokens[index + 2], 'VALUE') and tokens[index + 3] == (OP, '(')):
+            name, end = 'IPROPERTIES.VALUE', index + 4
+        else:
+            continue
+
+        # Arguments up to the matching parenthesis (nested calls are found on their own later)
+        args = [[]]
+        depth = 1
+        while end < count:
+            token = tokens[end]
+            if token[0] == NEWLINE:
+                break
+            if token[0] == OP:
+                if token[1] == '(':
+                    depth += 1
+                elif token[1] == ')':
+                    depth -= 1
+                    if not depth:
+                        break
+                elif token[1] == ',' and depth == 1:
+                    args.append([])
+                    end += 1
+                    continue
+            args[-1].append(token)
+            end += 1
+        if args == [[]]:
+            args = []
+
+        value = None
+        if end + 2 < count and tokens[end + 1] == (OP, '=') and tokens[end + 2][0] == STRING:
+            value = tokens[end + 2][1]
+        calls.append(_Call(name, args, value, branch))
+    return calls
+
+
+def _property_values(calls: List[_Call], prop: str) -> List[Tuple[str, str, int]]:
+    """
+    (component, value, branch) of each string assigned to an iProperty named prop.
+    component is '' for iProperties.Value(set, prop), the rule's own document.
+    """
+    values = []
+    for call in calls:
+        if call.name != 'IPROPERTIES.VALUE' or not call.value or len(call.args) < 2:
+            continue
+        name = _string_arg(call.args[-1])
+        component = _string_arg(call.args[0]) if len(call.args) >= 3 else ''
+        if name is not None and component is not None and name.upper() == prop:
+            values.append((component, call.value, call.branch))
+    return values
+
+
+def parse_component_name_from_code(code: str, tokens: Optional[TokenStream] = None) -> Optional[str]:
     """
     Extract component name from iLogic code.
-    Looks for patterns like:
+    Looks for the component argument of calls like:
     - Parameter("RFSO FLANGE 150LB:1", ...)
     - iProperties.Value("PIPE SS304 S-5 22.5 DEG.:1", ...)
     """
-    # Pattern to match component names in Parameter() or iProperties.Value() calls
-    patterns = [
-        r'Parameter\("([^"]+)"',
-        r'iProperties\.Value\("([^"]+)"',
-        r'Parameter\([\'"]([^\'"]+)[\'"]',
-        r'iProperties\.Value\([\'"]([^\'"]+)[\'"]',
-    ]
-    
-    component_names = set()
-    for pattern in patterns:
-        matches = re.findall(pattern, code, re.IGNORECASE)
-        component_names.update(matches)
-    
-    # Return the most common component name (if multiple found)
+    if tokens is None:
+        tokens = tokenize(code)
+    
+    component_names = []
+    for call in tokens.calls:
+        # Parameter(component, name) and iProperties.Value(component, set, name)
+        if len(call.args) >= (2 if call.name == 'PARAMETER' else 3):
+            name = _string_arg(call.args[0])
+            if name and name not in component_names:
+                component_names.append(name)
+    
+    # Return the most frequently referenced component (the first one on a tie)
     if component_names:
-        # Count occurrences
         counts = {}
-        for name in component_names:
-            count = code.count(f'"{name}"')
-            counts[name] = count
-        
-        # Return the most frequently referenced component
-        return max(counts.items(), key=lambda x: x[1])[0]
+        for kind, text in tokens:
+            if kind == STRING:
+                counts[text] = counts.get(text, 0) + 1
+        return max(component_names, key=lambda name: counts[name])
     
     return None
 
 
-def extract_triggers(code: str) -> List[str]:
+def extract_triggers(code: str, tokens: Optional[TokenStream] = None) -> List[str]:
     """
     Extract parameter names that trigger rules.
     Looks for patterns like:
@@ -48,54 +192,56 @@ def extract_triggers(code: str) -> List[str]:
     - Parameter("...", "FlangeSize")
     - MATERIAL = "SS304"
     """
+    if tokens is None:
+        tokens = tokenize(code)
     triggers = set()
     
-    # Pattern for If statements with parameters
-    if_pattern = r'If\s+(\w+)\s*[=<>]'
-    matches = re.findall(if_pattern, code, re.IGNORECASE)
-    triggers.update(matches)
-    
-    # Pattern for Parameter() calls
-    param_pattern = r'Parameter\([^,]+,\s*["\'](\w+)["\']'
-    matches = re.findall(param_pattern, code, re.IGNORECASE)
-    triggers.update(matches)
-    
-    # Pattern for variable assignments
-    assign_pattern = r'(\w+)\s*=\s*["\']'
-    matches = re.findall(assign_pattern, code, re.IGNORECASE)
-    # Filter out common VBA keywords
-    vba_keywords = {'dim', 'if', 'then', 'else', 'end', 'sub', 'function', 'as', 'string', 'integer', 'boolean'}
-    triggers.update([m for m in matches if m.lower() not in vba_keywords])
-    
-    return sorted(list(triggers))
+    for (kind, text), following, after in zip(tokens, tokens[1:], tokens[2:]):
+        if kind != NAME:
+            continue
+        # If statements with parameters
+        if text.upper() in ('IF', 'ELSEIF'):
+            if following[0] == NAME and after[0] == OP and after[1] in _COMPARISONS:
+                triggers.add(following[1])
+        # Variable assignments (and comparisons) with a string, ignoring common VBA keywords
+        elif following == (OP, '=') and after[0] == STRING and text.lower() not in _VBA_KEYWORDS:
+            triggers.add(text)
+    
+    # Parameter() calls
+    for call in tokens.calls:
+        if call.name == 'PARAMETER' and len(call.args) >= 2:
+            name = _string_arg(call.args[1])
+            if name and re.fullmatch(r'\w+', name):
+                triggers.add(name)
+    
+    return sorted(triggers)
 
 
-def extract_part_numbers(code: str) -> List[Dict[str, str]]:
+def extract_part_numbers(code: str, tokens: Optional[TokenStream] = None) -> List[Dict[str, str]]:
     """
     Extract part numbers from iLogic code.
     Returns list of dicts with: part_number, component, description, size
     """
-    part_numbers = []
+    if tokens is None:
+        tokens = tokenize(code)
+    calls = tokens.calls
     
-    # Pattern for KEMCO PART NUMBER assignments
-    # iProperties.Value("Component:1", "Custom", "KEMCO PART NUMBER") = "800-08-009"
-    pattern = r'iProperties\.Value\(["\']([^"\']+)["\'][^,]+,\s*["\']KEMCO PART NUMBER["\'][^=]*=\s*["\']([^"\']+)["\']'
-    matches = re.findall(pattern, code, re.IGNORECASE)
+    # A part number's description is the one set for the same component in the same If branch,
+    # or else the first one set for that component
+    descriptions = {}
+    for component, description, branch in _property_values(calls, 'KEMCO DESCRIPTION'):
+        descriptions.setdefault((component, branch), description)
+        descriptions.setdefault(component, description)
     
-    for component, part_num in matches:
-        # Try to extract description
-        desc_pattern = rf'iProperties\.Value\(["\']{re.escape(component)}["\'][^,]+,\s*["\']KEMCO DESCRIPTION["\'][^=]*=\s*["\']([^"\']+)["\']'
-        desc_match = re.search(desc_pattern, code, re.IGNORECASE)
-        description = desc_match.group(1) if desc_match else ''
+    part_numbers = []
+    # iProperties.Value("Component:1", "Custom", "KEMCO PART NUMBER") = "800-08-009"
+    for component, part_num, branch in _property_values(calls, 'KEMCO PART NUMBER'):
+        description = descriptions.get((component, branch), descriptions.get(component, ''))
         
-        # Try to extract size from description or code
+        # Try to extract size from description
         size = None
-        size_patterns = [
-            r'(\d+(?:\.\d+)?)"',  # e.g., "2"", "1.5""
-            r'(\d+(?:\.\d+)?)\s*inch',
-        ]
-        for sp in size_patterns:
-            size_match = re.search(sp, description, re.IGNORECASE)
+        for size_pattern in _SIZE_PATTERNS:
+            size_match = size_pattern.search(description)
             if size_match:
                 size = size_match.group(1)
                 break
@@ -110,32 +256,31 @@ def extract_part_numbers(code: str) -> List[Dict[str, str]]:
     return part_numbers
 
 
-def detect_inconsistencies(code: str, rule_name: str = '') -> List[Dict]:
+def detect_inconsistencies(code: str, rule_name: str = '', tokens: Optional[TokenStream] = None) -> List[Dict]:
     """
     Detect inconsistencies in iLogic code.
     Returns list of inconsistency dicts.
     """
+    if tokens is None:
+        tokens = tokenize(code)
+    strings = [text for kind, text in tokens if kind == STRING]
     inconsistencies = []
     
     # Check for missing part numbers (XXX placeholders)
-    xxx_pattern = r'["\']([\w-]+-XXX)["\']'
-    xxx_matches = re.findall(xxx_pattern, code, re.IGNORECASE)
-    for match in xxx_matches:
-        inconsistencies.append({
-            'type': 'missing_part_number',
-            'severity': 'critical',
-            'description': f'Missing part number placeholder found: {match}',
-            'code_location': f'Contains "{match}"',
-            'suggested_fix': f'Replace {match} with actual part number',
-        })
+    for match in strings:
+        if _PLACEHOLDER.fullmatch(match):
+            inconsistencies.append({
+                'type': 'missing_part_number',
+                'severity': 'critical',
+                'description': f'Missing part number placeholder found: {match}',
+                'code_location': f'Contains "{match}"',
+                'suggested_fix': f'Replace {match} with actual part number',
+            })
     
     # Check for description mismatches (SS316 code saying SS304)
-    if 'SS316' in code.upper() or 'MATERIAL = "SS316"' in code:
-        # Check if descriptions say SS304 when they should say SS316
-        desc_pattern = r'KEMCO DESCRIPTION["\'][^=]*=\s*["\']([^"\']*SS304[^"\']*)["\']'
-        desc_matches = re.findall(desc_pattern, code, re.IGNORECASE)
-        for match in desc_matches:
-            if 'SS316' in code.upper() and 'SS304' in match.upper():
+    if any('SS316' in string.upper() for string in strings):
+        for _, match, _ in _property_values(tokens.calls, 'KEMCO DESCRIPTION'):
+            if 'SS304' in match.upper():
                 inconsistencies.append({
                     'type': 'description_mismatch',
                     'severity': 'warning',
@@ -145,7 +290,7 @@ def detect_inconsistencies(code: str, rule_name: str = '') -> List[Dict]:
                 })
     
     # Check for duplicate part numbers (same part number used for different sizes/materials)
-    part_numbers = extract_part_numbers(code)
+    part_numbers = extract_part_numbers(code, tokens)
     part_num_counts = {}
     for pn in part_numbers:
         key = pn['part_number']
@@ -156,7 +301,7 @@ def detect_inconsistencies(code: str, rule_name: str = '') -> List[Dict]:
     for part_num, occurrences in part_num_counts.items():
         if len(occurrences) > 1:
             # Check if they're for different conditions
-            sizes = set([o.get('size') for o in occurrences if o.get('size')])
+            sizes = sorted(set([o.get('size') for o in occurrences if o.get('size')]))
             if len(sizes) > 1:
                 inconsistencies.append({
                     'type': 'duplicate_part_number',
@@ -166,10 +311,14 @@ def detect_inconsistencies(code: str, rule_name: str = '') -> List[Dict]:
                     'suggested_fix': 'Verify if same part number should be used for different sizes',
                 })
     
-    # Check for missing conditions (e.g., ElseIf without If)
-    if_count = len(re.findall(r'\bIf\b', code, re.IGNORECASE))
-    elseif_count = len(re.findall(r'\bElseIf\b', code, re.IGNORECASE))
-    end_if_count = len(re.findall(r'\bEnd If\b', code, re.IGNORECASE))
+    # Check for unclosed or extra If blocks: a block If is a line starting with If and
+    # ending with Then (a single-line If needs no End If)
+    if_count = end_if_count = 0
+    for first, second, last in _line_ends(tokens):
+        if _is_name(first, 'IF') and _is_name(last, 'THEN'):
+            if_count += 1
+        elif _is_name(first, 'END') and _is_name(second, 'IF'):
+            end_if_count += 1
     
     if if_count != end_if_count:
         inconsistencies.append({
@@ -183,104 +332,128 @@ def detect_inconsistencies(code: str, rule_name: str = '') -> List[Dict]:
     return inconsistencies
 
 
-def parse_markdown_import(content: str) -> Dict:
+class MarkdownRule(NamedTuple):
+    """One rule read from a single-file markdown export"""
+    component: str
+    rule: str
+    path: str
+    code: str
+
+
+_ASSEMBLY_HEADING = re.compile(r'#\s+(.+)$')
+_RULE_HEADING = re.compile(r'## Rule:\s*(.*)$')
+_COMPONENT_LINE = re.compile(r'\*Component:\s*\[\[(.+?)\]\]\*')
+_PATH_LINE = re.compile(r'\*Path:\s*`(.+?)`\*')
+
+
+class MarkdownRuleReader:
     """
-    Parse markdown file from single-file export.
+    Line-by-line reader for single-file markdown exports:
+
+        # Assembly Name
+        ## Rule: RuleName
+        *Component: [[ComponentName]]*
+        *Path: `path`*            (optional)
+        ```vbnet
+        code
+        ```
+
+    Iterating yields a MarkdownRule per rule in one pass over the lines, holding only the
+    current rule's code, so large exports parse in linear time and bounded memory.
+    assembly_name is set once the first "# " heading has been read.
+    lines may be a string, or any iterable of str or bytes lines (e.g. an uploaded file).
+    """
+    # States
+    OUTSIDE, RULE, HEADER, CODE = range(4)
+    
+    def __init__(self, lines):
+        self.lines = lines.splitlines() if isinstance(lines, str) else lines
+        self.assembly_name = ''
+    
+    def __iter__(self) -> Iterator[MarkdownRule]:
+        state = self.OUTSIDE
+        rule_name = component_name = path = ''
+        code_lines = []
+        for line in self.lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='ignore')
+            line = line.rstrip('\r\n')
+            
+            if state == self.CODE:
+                # The block ends at the next fence, even one at the end of a code line
+                fence = line.find('```')
+                if fence < 0:
+                    code_lines.append(line)
+                    continue
+                code_lines.append(line[:fence])
+                state = self.OUTSIDE
+                if component_name and rule_name:
+                    yield MarkdownRule(component_name, rule_name, path, '\n'.join(code_lines).strip())
+                continue
+            
+            match = _RULE_HEADING.match(line)
+            if match:
+                state = self.RULE
+                rule_name, component_name, path = match.group(1).strip(), '', ''
+                continue
+            if state == self.RULE:
+                # The component must be the next non-blank line after the rule heading
+                if not line.strip():
+                    continue
+                match = _COMPONENT_LINE.match(line)
+                if match:
+                    component_name = match.group(1).strip()
+                    state = self.HEADER
+                else:
+                    state = self.OUTSIDE
+                continue
+            if state == self.HEADER:
+                if line.startswith('```'):
+                    code_lines = []
+                    state = self.CODE
+                    continue
+                match = _PATH_LINE.match(line)
+                if match and not path:
+                    path = match.group(1)
+                continue
+            if not self.assembly_name:
+                match = _ASSEMBLY_HEADING.match(line)
+                if match:
+                    self.assembly_name = match.group(1).strip()
+
+
+def parse_markdown_import(content) -> Dict:
+    """
+    Parse markdown file from single-file export (a string or a stream of lines, see MarkdownRuleReader).
     Returns structured data ready for import.
+    A rule repeated for the same component is imported once (the first occurrence).
     """
     data = {
         'assembly_name': '',
         'components': {},
     }
     
-    # Extract assembly name from first heading
-    assembly_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    if assembly_match:
-        data['assembly_name'] = assembly_match.group(1).strip()
-    
-    # Parse rules - more flexible pattern
-    # Pattern: ## Rule: RuleName
-    # *Component: [[ComponentName]]*
-    # *Path: `path`* (optional)
-    # ```vbnet or ```vb or ```
-    # code
-    # ```
-    
-    # Try multiple patterns for flexibility
-    # Pattern 1: Full format with Path (non-greedy to avoid matching too much)
-    rule_pattern1 = r'## Rule:\s*(.+?)\n\*Component:\s*\[\[(.+?)\]\]\*\n(?:\*Path:\s*`(.+?)`\*\n)?\n?```(?:vbnet|vb)?\n(.*?)```'
-    matches1 = re.findall(rule_pattern1, content, re.DOTALL | re.MULTILINE)
-    
-    # Pattern 2: Without Path line
-    rule_pattern2 = r'## Rule:\s*(.+?)\n\*Component:\s*\[\[(.+?)\]\]\*\n\n```(?:vbnet|vb)?\n(.*?)```'
-    matches2 = re.findall(rule_pattern2, content, re.DOTALL | re.MULTILINE)
-    
-    # Pattern 3: More flexible - handle variations in spacing/newlines
-    rule_pattern3 = r'## Rule:\s*(.+?)\n\*Component:\s*\[\[(.+?)\]\]\*.*?```(?:vbnet|vb)?\n(.*?)```'
-    matches3 = re.findall(rule_pattern3, content, re.DOTALL | re.MULTILINE)
-    
-    # Combine matches (avoid duplicates)
-    all_matches = []
+    reader = MarkdownRuleReader(content)
     seen_rules = set()
-    
-    for match in matches1:
-        rule_name = match[0].strip()
-        component_name = match[1].strip()
-        # Handle different match lengths (with or without path)
-        if len(match) == 4:
-            path = match[2] if match[2] else ''
-            code = match[3]
-        elif len(match) == 3:
-            path = ''
-            code = match[2]
-        else:
+    for record in reader:
+        key = (record.rule, record.component)
+        if key in seen_rules:
             continue
+        seen_rules.add(key)
         
-        key = (rule_name, component_name)
-        if key not in seen_rules:
-            seen_rules.add(key)
-            all_matches.append((rule_name, component_name, path, code))
-    
-    for match in matches2:
-        rule_name = match[0].strip()
-        component_name = match[1].strip()
-        code = match[2] if len(match) > 2 else ''
-        path = ''
-        
-        key = (rule_name, component_name)
-        if key not in seen_rules:
-            seen_rules.add(key)
-            all_matches.append((rule_name, component_name, path, code))
-    
-    # Add pattern 3 matches
-    for match in matches3:
-        rule_name = match[0].strip()
-        component_name = match[1].strip()
-        code = match[2] if len(match) > 2 else ''
-        path = ''
-        
-        key = (rule_name, component_name)
-        if key not in seen_rules:
-            seen_rules.add(key)
-            all_matches.append((rule_name, component_name, path, code))
-    
-    # Process matches
-    for rule_name, component_name, path, code in all_matches:
-        if not component_name or not rule_name:
-            continue
-            
-        if component_name not in data['components']:
-            data['components'][component_name] = {
-                'name': component_name,
-                'path': path,
+        if record.component not in data['components']:
+            data['components'][record.component] = {
+                'name': record.component,
+                'path': record.path,
                 'rules': [],
             }
         
-        data['components'][component_name]['rules'].append({
-            'name': rule_name.strip(),
-            'code': code.strip(),
+        data['components'][record.component]['rules'].append({
+            'name': record.rule,
+            'code': record.code,
         })
     
+    data['assembly_name'] = reader.assembly_name
     return data
 
 
@@ -389,3 +562,36 @@ def determine_rule_type(code: str) -> str:
     else:
         return 'other'
 
+
+# Bump whenever the output of the analyzers (analyze_code) changes, so cached analyses are redone
+ANALYZER_VERSION = 2
+
+
+def code_hash(code: str) -> str:
+    """SHA-256 hex digest of a rule's code, the key of its cached analysis"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def analyze_code_fields(code: str, tokens: Optional[TokenStream] = None) -> Dict:
+    """
+    The part of analyze_code stored on the rule itself: rule_type, triggers and part_numbers.
+    Cheap enough to run while importing; inconsistencies are left to the analysis job.
+    """
+    tokens = tokenize(code) if tokens is None else tokens
+    return {
+        'rule_type': determine_rule_type(code),
+        'triggers': extract_triggers(code, tokens),
+        'part_numbers': extract_part_numbers(code, tokens),
+    }
+
+
+def analyze_code(code: str) -> Dict:
+    """
+    Everything derived from a rule's code, in one JSON-serializable dict:
+    analyze_code_fields plus inconsistencies. The code is tokenized once for all of them.
+    """
+    tokens = tokenize(code)
+    return {
+        **analyze_code_fields(code, tokens),
+        'inconsistencies': detect_inconsistencies(code, tokens=tokens),
+    }
@@ -1,21 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.db.models import Q, Count
-from .models import Assembly, Component, Rule, RuleVersion, Inconsistency, Configurator
+from django.db.models import Count
+from .models import Assembly, Component, Rule, RuleVersion, Inconsistency, Configurator, RuleAnalysisJob
 from .utils import (
     parse_component_name_from_code,
-    extract_triggers,
     extract_part_numbers,
-    detect_inconsistencies,
     parse_markdown_import,
     parse_structured_import,
-    determine_rule_type,
 )
-import os
-import json
+from .services import import_rules, analyze_rules, get_analysis, is_analyzed, rule_code_fields
+from .jobs import queue_analysis, recover_stale_job
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
@@ -50,12 +50,33 @@ def assembly_detail(request, pk):
         assembly=assembly,
         status='open'
     ).count()
+    analysis_job = assembly.analysis_jobs.first()
+    recover_stale_job(analysis_job)
     
     return render(request, 'ilogic/assembly_detail.html', {
         'assembly': assembly,
         'components': components,
         'total_rules': total_rules,
         'open_inconsistencies': open_inconsistencies,
+        'analysis_job': analysis_job,
+    })
+
+
+@login_required
+def analysis_job_status(request, pk):
+    """JSON progress of a background rule analysis, polled by the assembly page"""
+    job = get_object_or_404(RuleAnalysisJob, pk=pk)
+    recover_stale_job(job)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'processed': job.processed,
+        'total': job.total,
+        'percent': job.percent,
+        'found': job.found,
+        'error': job.error,
     })
 
 
@@ -203,18 +224,18 @@ def rule_edit(request, pk):
         )
         
         # Update rule
+        rule_code = request.POST.get('rule_code', '').strip()
+        needs_analysis = not is_analyzed(rule, rule_code)
         rule.rule_name = request.POST.get('rule_name', '').strip()
-        rule.rule_code = request.POST.get('rule_code', '').strip()
-        rule.rule_type = determine_rule_type(rule.rule_code)
-        rule.triggers = extract_triggers(rule.rule_code)
-        rule.extracted_data = {
-            'part_numbers': extract_part_numbers(rule.rule_code),
-        }
+        if needs_analysis:
+            for name, value in rule_code_fields(rule_code).items():
+                setattr(rule, name, value)
         rule.notes = request.POST.get('notes', '').strip()
         rule.save()
         
-        # Re-analyze for inconsistencies
-        analyze_rule(rule)
+        # Re-analyze for inconsistencies (unchanged code was analyzed already)
+        if needs_analysis:
+            analyze_rule(rule)
         
         messages.success(request, f'Rule "{rule.rule_name}" updated successfully.')
         return redirect('ilogic:rule_detail', pk=rule.pk)
@@ -240,22 +261,11 @@ def rule_analyze(request, pk):
     """Analyze a rule for inconsistencies"""
     rule = get_object_or_404(Rule, pk=pk)
     
-    # Run analysis
-    inconsistencies = detect_inconsistencies(rule.rule_code, rule.rule_name)
+    # Run analysis (cached by code hash, see get_analysis)
+    inconsistencies = get_analysis(rule.rule_code)['inconsistencies']
     
     # Save inconsistencies to database
-    for inc in inconsistencies:
-        Inconsistency.objects.get_or_create(
-            rule=rule,
-            inconsistency_type=inc['type'],
-            defaults={
-                'severity': inc['severity'],
-                'description': inc['description'],
-                'code_location': inc.get('code_location', ''),
-                'suggested_fix': inc.get('suggested_fix', ''),
-                'found_by': request.user,
-            }
-        )
+    analyze_rules([rule], found_by=request.user)
     
     messages.success(request, f'Analysis complete. Found {len(inconsistencies)} inconsistencies.')
     return redirect('ilogic:rule_detail', pk=rule.pk)
@@ -263,21 +273,7 @@ def rule_analyze(request, pk):
 
 def analyze_rule(rule):
     """Helper function to analyze a rule and create inconsistency records"""
-    inconsistencies = detect_inconsistencies(rule.rule_code, rule.rule_name)
-    
-    for inc in inconsistencies:
-        Inconsistency.objects.get_or_create(
-            rule=rule,
-            component=rule.component,
-            assembly=rule.component.assembly,
-            inconsistency_type=inc['type'],
-            defaults={
-                'severity': inc['severity'],
-                'description': inc['description'],
-                'code_location': inc.get('code_location', ''),
-                'suggested_fix': inc.get('suggested_fix', ''),
-            }
-        )
+    analyze_rules([rule])
 
 
 @login_required
@@ -308,22 +304,18 @@ def import_paste(request):
         
         # Create rule
         rule_name = request.POST.get('rule_name', 'Imported Rule').strip()
+        analysis = get_analysis(code)
         rule = Rule.objects.create(
             component=component,
             rule_name=rule_name,
-            rule_code=code,
-            rule_type=determine_rule_type(code),
-            triggers=extract_triggers(code),
-            extracted_data={
-                'part_numbers': extract_part_numbers(code),
-            },
             created_by=request.user,
+            **rule_code_fields(code, analysis),
         )
         
         # Analyze for inconsistencies
         analyze_rule(rule)
         
-        messages.success(request, f'Rule imported successfully. Found {len(detect_inconsistencies(code))} potential issues.')
+        messages.success(request, f'Rule imported successfully. Found {len(analysis["inconsistencies"])} potential issues.')
         return redirect('ilogic:rule_detail', pk=rule.pk)
     
     return render(request, 'ilogic/import_paste.html')
@@ -339,116 +331,73 @@ def import_markdown(request):
         
         try:
             file = request.FILES['file']
-            content = file.read().decode('utf-8', errors='ignore')
-            
-            # Debug: log file size
-            print(f"Markdown import: File size: {len(content)} chars")
-            print(f"Markdown import: File name: {file.name}")
-            print(f"Markdown import: First 500 chars: {content[:500]}")
+            logger.debug("Markdown import: file %s, %s bytes", file.name, file.size)
             
-            # Parse markdown (this can take time for large files)
-            print(f"Markdown import: Starting parse...")
+            # Parse markdown straight from the upload, one line at a time
             import time
             start_time = time.time()
-            data = parse_markdown_import(content)
+            data = parse_markdown_import(file)
             parse_time = time.time() - start_time
-            print(f"Markdown import: Parse completed in {parse_time:.2f} seconds")
-            print(f"Markdown import: Parsed assembly: '{data['assembly_name']}', Components: {len(data['components'])}")
+            logger.debug("Markdown import: parsed in %.3f seconds", parse_time)
+            logger.debug("Markdown import: assembly %r, %s component(s)", data['assembly_name'], len(data['components']))
             for comp_name, comp_data in data['components'].items():
-                print(f"Markdown import: Component '{comp_name}' has {len(comp_data['rules'])} rule(s)")
+                logger.debug("Markdown import: component %r has %s rule(s)", comp_name, len(comp_data['rules']))
             
             if not data['assembly_name']:
                 error_msg = 'Could not parse assembly name from file. Make sure the file starts with "# Assembly Name"'
-                print(f"Markdown import ERROR: {error_msg}")
+                logger.debug("Markdown import: %s", error_msg)
                 messages.error(request, error_msg)
+                file.seek(0)
                 return render(request, 'ilogic/import_markdown.html', {
                     'debug_info': {
-                        'file_size': len(content),
-                        'first_chars': content[:200],
+                        'file_size': file.size,
+                        'first_chars': file.read(200).decode('utf-8', errors='ignore'),
                         'assembly_found': False,
                     }
                 })
             
             if not data['components']:
                 error_msg = 'No rules found in file. Make sure the file contains rules in the format: "## Rule: RuleName" followed by code blocks.'
-                print(f"Markdown import ERROR: {error_msg}")
+                logger.debug("Markdown import: %s", error_msg)
                 messages.error(request, error_msg)
                 return render(request, 'ilogic/import_markdown.html', {
                     'debug_info': {
-                        'file_size': len(content),
+                        'file_size': file.size,
                         'assembly_name': data['assembly_name'],
                         'components_found': 0,
                     }
                 })
             
-            # Get or create assembly
-            assembly, created = Assembly.objects.get_or_create(
-                name=data['assembly_name'],
-                defaults={'created_by': request.user}
-            )
-            
-            imported_count = 0
             total_rules = sum(len(comp_data['rules']) for comp_data in data['components'].values())
-            print(f"Markdown import: Processing {total_rules} total rule(s) across {len(data['components'])} component(s)")
+            logger.debug("Markdown import: saving %s rule(s) across %s component(s)", total_rules, len(data['components']))
             
+            # One transaction; existing rules are compared in memory (see import_rules)
             process_start = time.time()
-            for idx, (comp_name, comp_data) in enumerate(data['components'].items(), 1):
-                print(f"Markdown import: Processing component {idx}/{len(data['components'])}: {comp_name}")
-                
-                # Get or create component
-                component, comp_created = Component.objects.get_or_create(
-                    assembly=assembly,
-                    name=comp_name
-                )
-                
-                # Create rules
-                for rule_idx, rule_data in enumerate(comp_data['rules'], 1):
-                    if not rule_data.get('code'):
-                        continue
-                    
-                    if rule_idx % 10 == 0:
-                        print(f"Markdown import: Processing rule {rule_idx}/{len(comp_data['rules'])} for {comp_name}")
-                        
-                    rule, rule_created = Rule.objects.get_or_create(
-                        component=component,
-                        rule_name=rule_data['name'],
-                        defaults={
-                            'rule_code': rule_data['code'],
-                            'rule_type': determine_rule_type(rule_data['code']),
-                            'triggers': extract_triggers(rule_data['code']),
-                            'extracted_data': {
-                                'part_numbers': extract_part_numbers(rule_data['code']),
-                            },
-                            'created_by': request.user,
-                        }
-                    )
-                    
-                    if rule_created:
-                        imported_count += 1
-                        # Analyze for inconsistencies (this can be slow, do it in background or skip for now)
-                        # analyze_rule(rule)  # Commented out to speed up import
-            
+            summary = import_rules(data, request.user)
+            assembly = summary.assembly
             process_time = time.time() - process_start
-            print(f"Markdown import: Processing completed in {process_time:.2f} seconds")
+            logger.debug("Markdown import: saved in %.2f seconds", process_time)
+            
+            # New and changed rules are analyzed in the background (progress shows on the assembly page)
+            queue_analysis(assembly, summary.created + summary.updated, request.user)
             
-            if imported_count == 0:
-                warning_msg = 'No new rules were imported. Rules may already exist.'
-                print(f"Markdown import WARNING: {warning_msg}")
+            if not summary.created and not summary.updated:
+                warning_msg = f'No new or changed rules were imported. {summary.unchanged} rule(s) unchanged.'
+                logger.debug("Markdown import: %s", warning_msg)
                 messages.warning(request, warning_msg)
             else:
-                success_msg = f'Imported {imported_count} rule(s) from markdown file.'
-                print(f"Markdown import SUCCESS: {success_msg}")
+                success_msg = (f'Imported {len(summary.created)} new rule(s) from markdown file, '
+                               f'updated {len(summary.updated)}, {summary.unchanged} unchanged.')
+                logger.debug("Markdown import: %s", success_msg)
                 messages.success(request, success_msg)
             
-            print(f"Markdown import: Redirecting to assembly {assembly.pk}")
             return redirect('ilogic:assembly_detail', pk=assembly.pk)
         
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
             error_msg = f'Error importing markdown file: {str(e)}'
-            print(f"Markdown import EXCEPTION: {error_msg}")
-            print(f"Markdown import TRACEBACK: {error_trace}")
+            logger.exception("Markdown import of %s failed", request.FILES['file'].name)
             messages.error(request, error_msg)
             return render(request, 'ilogic/import_markdown.html', {
                 'error_details': str(e),
@@ -462,33 +411,30 @@ def import_markdown(request):
 def import_structured(request):
     """Import from structured folder (folder selection)"""
     if request.method == 'POST':
-        print(f"Structured import: POST request received")
-        print(f"Structured import: FILES keys: {list(request.FILES.keys())}")
-        
         if 'files' not in request.FILES:
             error_msg = 'Please select a folder.'
-            print(f"Structured import ERROR: {error_msg}")
+            logger.debug("Structured import: %s", error_msg)
             messages.error(request, error_msg)
             return render(request, 'ilogic/import_structured.html')
         
         uploaded_files = request.FILES.getlist('files')
-        print(f"Structured import: Received {len(uploaded_files)} file(s)")
+        logger.debug("Structured import: received %s file(s)", len(uploaded_files))
         
         if not uploaded_files:
             error_msg = 'No files selected. Please select the root folder from your export.'
-            print(f"Structured import ERROR: {error_msg}")
+            logger.debug("Structured import: %s", error_msg)
             messages.error(request, error_msg)
             return render(request, 'ilogic/import_structured.html')
         
         try:
             # Filter to only .txt files
             txt_files = [f for f in uploaded_files if f.name.endswith('.txt')]
-            print(f"Structured import: Found {len(txt_files)} .txt file(s) out of {len(uploaded_files)} total")
+            logger.debug("Structured import: %s .txt file(s) out of %s", len(txt_files), len(uploaded_files))
             
             if not txt_files:
                 error_msg = f'No .txt rule files found in the selected folder. Found {len(uploaded_files)} file(s) but none were .txt files.'
-                print(f"Structured import ERROR: {error_msg}")
-                print(f"Structured import: File names: {[f.name for f in uploaded_files[:10]]}")
+                logger.debug("Structured import: %s", error_msg)
+                logger.debug("Structured import: file names %s", [f.name for f in uploaded_files[:10]])
                 messages.error(request, error_msg)
                 return render(request, 'ilogic/import_structured.html')
             
@@ -509,61 +455,28 @@ def import_structured(request):
                 file_contents[rel_path] = content
             
             # Parse structure
-            print(f"Structured import: Parsing {len(file_paths)} file paths")
+            logger.debug("Structured import: parsing %s file path(s)", len(file_paths))
             data = parse_structured_import(file_paths)
-            print(f"Structured import: Parsed assembly: '{data['assembly_name']}', Components: {len(data['components'])}")
+            logger.debug("Structured import: assembly %r, %s component(s)", data['assembly_name'], len(data['components']))
             
             if not data['assembly_name']:
                 error_msg = f'Could not determine assembly name from folder structure. File paths: {file_paths[:5]}'
-                print(f"Structured import ERROR: {error_msg}")
+                logger.debug("Structured import: %s", error_msg)
                 messages.error(request, error_msg)
                 return render(request, 'ilogic/import_structured.html')
             
-            # Get or create assembly
-            assembly, created = Assembly.objects.get_or_create(
-                name=data['assembly_name'],
-                defaults={'created_by': request.user}
-            )
-            
-            imported_count = 0
-            
-            # Process each component
-            for comp_name, comp_data in data['components'].items():
-                # Get or create component
-                component, comp_created = Component.objects.get_or_create(
-                    assembly=assembly,
-                    name=comp_name
-                )
-                
-                # Read and process each rule file
+            # Attach the file content we already read to each rule
+            for comp_data in data['components'].values():
                 for rule_data in comp_data['rules']:
-                    # Get the file content we already read
-                    rule_file_path = rule_data.get('file_path')
-                    if rule_file_path and rule_file_path in file_contents:
-                        rule_code = file_contents[rule_file_path]
-                        
-                        # Create rule
-                        rule, rule_created = Rule.objects.get_or_create(
-                            component=component,
-                            rule_name=rule_data['name'],
-                            defaults={
-                                'rule_code': rule_code,
-                                'rule_type': determine_rule_type(rule_code),
-                                'triggers': extract_triggers(rule_code),
-                                'extracted_data': {
-                                    'part_numbers': extract_part_numbers(rule_code),
-                                },
-                                'created_by': request.user,
-                            }
-                        )
-                        
-                        if rule_created:
-                            imported_count += 1
-                            # Analyze for inconsistencies (can be slow - do after import or in background)
-                            # analyze_rule(rule)  # Commented out to speed up import
+                    rule_data['code'] = file_contents.get(rule_data.get('file_path'))
+            
+            summary = import_rules(data, request.user)
+            assembly = summary.assembly
+            queue_analysis(assembly, summary.created + summary.updated, request.user)
             
-            success_msg = f'Imported {imported_count} rule(s) from structured folder.'
-            print(f"Structured import SUCCESS: {success_msg}")
+            success_msg = (f'Imported {len(summary.created)} new rule(s) from structured folder, '
+                           f'updated {len(summary.updated)}, {summary.unchanged} unchanged.')
+            logger.debug("Structured import: %s", success_msg)
             messages.success(request, success_msg)
             return redirect('ilogic:assembly_detail', pk=assembly.pk)
         
@@ -571,8 +484,7 @@ def import_structured(request):
             import traceback
             error_trace = traceback.format_exc()
             error_msg = f'Error importing structured folder: {str(e)}'
-            print(f"Structured import EXCEPTION: {error_msg}")
-            print(f"Structured import TRACEBACK: {error_trace}")
+            logger.exception("Structured import failed")
             messages.error(request, error_msg)
             return render(request, 'ilogic/import_structured.html', {
                 'error_details': str(e),
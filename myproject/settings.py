@@ -165,6 +165,19 @@ else:
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background KOM imports: worker threads per process (0 runs imports inside the request)
+KOM_IMPORT_WORKERS = int(os.getenv('KOM_IMPORT_WORKERS', '2'))
+# Seconds before a KOM import job the pool lost (e.g. to a restart) is resubmitted, or failed if it had started
+KOM_IMPORT_JOB_TIMEOUT = int(os.getenv('KOM_IMPORT_JOB_TIMEOUT', '300'))
+
+# Background analysis of imported iLogic rules: worker threads per process (0 analyzes inside the request)
+ILOGIC_ANALYSIS_WORKERS = int(os.getenv('ILOGIC_ANALYSIS_WORKERS', '2'))
+# Seconds before an analysis job the pool lost (e.g. to a restart) is resubmitted, or failed if it had started
+ILOGIC_ANALYSIS_JOB_TIMEOUT = int(os.getenv('ILOGIC_ANALYSIS_JOB_TIMEOUT', '600'))
+
+# Record per-section parse timings in each imported KOM's raw_data (_profile), see /customer/kom/profile/
+KOM_PARSE_PROFILE = os.getenv('KOM_PARSE_PROFILE', 'False').lower() == 'true'
+
 # Login settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -245,68 +245,15 @@ def delete_equipment_note(request, equipment_note_id):
     return redirect('project_notes:job_detail', job_number=job_number)
 
 
-@login_required
-@require_http_methods(["POST"])
-def save_equipment_line_items(request, kom_pk):
-    """Save equipment and line items from KOM to notes"""
-    from customer.models import KOMForm
-    
-    kom_form = get_object_or_404(KOMForm, pk=kom_pk)
-    
-    # Extract 5-digit job number - try stored job_number first, then proposal_number
-    stored_job_number = str(kom_form.job_number).strip() if kom_form.job_number else ''
-    proposal_number = str(kom_form.proposal_number).strip() if kom_form.proposal_number else ''
-    
-    job_number = None
-    
-    # Try to extract from stored job_number first
-    if stored_job_number:
-        job_number = extract_job_number(stored_job_number)
-        if not job_number or len(job_number) != 5:
-            # Stored job_number didn't yield a valid 5-digit number, try proposal_number
-            job_number = None
-    
-    # If we still don't have a valid job number, try proposal_number
-    if not job_number or len(job_number) != 5:
-        if proposal_number:
-            job_number = extract_job_number(proposal_number)
-    
-    # Final validation
-    if not job_number or len(job_number) != 5:
-        error_msg = f'Could not extract 5-digit job number. Stored job_number: "{stored_job_number}", Proposal number: "{proposal_number}"'
-        messages.error(request, error_msg)
-        print(f"ERROR in save_equipment_line_items: {error_msg}")  # Debug logging
-        return redirect('customer:kom_detail', pk=kom_pk)
-    
-    # Ensure job_number is exactly 5 digits
-    job_number = job_number[:5] if len(job_number) > 5 else job_number
-    
-    # Get or create job
-    job, created = Job.objects.get_or_create(
-        job_number=job_number,
-        defaults={
-            'customer_name': kom_form.bill_to_company or kom_form.ship_to_company or '',
-            'project_name': kom_form.project_name or '',
-        }
-    )
-    
-    # Update job info if we have better data
-    if kom_form.bill_to_company or kom_form.ship_to_company:
-        customer_name = kom_form.bill_to_company or kom_form.ship_to_company
-        if customer_name and not job.customer_name:
-            job.customer_name = customer_name
-            job.save()
-    
-    if kom_form.project_name and not job.project_name:
-        job.project_name = kom_form.project_name
-        job.save()
-    
+def build_equipment_note_data(kom_form):
+    """
+    Build EquipmentNote (equipment_data, line_items_data) from a KOM form.
+    Rows come from kom_form.equipment_required / line_items, so a form loaded with
+    prefetch_related (as save_equipment_line_items does) needs no further queries.
+    """
     # Collect equipment data (only populated fields)
     equipment_data = {}
-    from customer.models import KOMEquipmentRequired
-    equipment_required = KOMEquipmentRequired.objects.filter(kom_form=kom_form)
-    
-    for eq in equipment_required:
+    for eq in kom_form.equipment_required.all():
         eq_type = eq.equipment_type
         if eq_type:
             eq_info = {}
@@ -464,16 +411,74 @@ def save_equipment_line_items(request, kom_pk):
     
     # Collect line items (Item# and Description only)
     line_items_data = []
-    from customer.models import KOMLineItem
-    line_items = KOMLineItem.objects.filter(kom_form=kom_form)
-    
-    for item in line_items:
+    for item in kom_form.line_items.all():
         if item.item_number or item.description:
             line_items_data.append({
                 'item_number': item.item_number or '',
                 'description': item.description or '',
             })
     
+    return equipment_data, line_items_data
+
+
+@login_required
+@require_http_methods(["POST"])
+def save_equipment_line_items(request, kom_pk):
+    """Save equipment and line items from KOM to notes"""
+    from customer.models import KOMForm
+    
+    kom_form = get_object_or_404(KOMForm.objects.prefetch_related('line_items', 'equipment_required'), pk=kom_pk)
+    
+    # Extract 5-digit job number - try stored job_number first, then proposal_number
+    stored_job_number = str(kom_form.job_number).strip() if kom_form.job_number else ''
+    proposal_number = str(kom_form.proposal_number).strip() if kom_form.proposal_number else ''
+    
+    job_number = None
+    
+    # Try to extract from stored job_number first
+    if stored_job_number:
+        job_number = extract_job_number(stored_job_number)
+        if not job_number or len(job_number) != 5:
+            # Stored job_number didn't yield a valid 5-digit number, try proposal_number
+            job_number = None
+    
+    # If we still don't have a valid job number, try proposal_number
+    if not job_number or len(job_number) != 5:
+        if proposal_number:
+            job_number = extract_job_number(proposal_number)
+    
+    # Final validation
+    if not job_number or len(job_number) != 5:
+        error_msg = f'Could not extract 5-digit job number. Stored job_number: "{stored_job_number}", Proposal number: "{proposal_number}"'
+        messages.error(request, error_msg)
+        print(f"ERROR in save_equipment_line_items: {error_msg}")  # Debug logging
+        return redirect('customer:kom_detail', pk=kom_pk)
+    
+    # Ensure job_number is exactly 5 digits
+    job_number = job_number[:5] if len(job_number) > 5 else job_number
+    
+    # Get or create job
+    job, created = Job.objects.get_or_create(
+        job_number=job_number,
+        defaults={
+            'customer_name': kom_form.bill_to_company or kom_form.ship_to_company or '',
+            'project_name': kom_form.project_name or '',
+        }
+    )
+    
+    # Update job info if we have better data
+    if kom_form.bill_to_company or kom_form.ship_to_company:
+        customer_name = kom_form.bill_to_company or kom_form.ship_to_company
+        if customer_name and not job.customer_name:
+            job.customer_name = customer_name
+            job.save()
+    
+    if kom_form.project_name and not job.project_name:
+        job.project_name = kom_form.project_name
+        job.save()
+    
+    equipment_data, line_items_data = build_equipment_note_data(kom_form)
+    
     # Create or update equipment note
     equipment_note, created = EquipmentNote.objects.update_or_create(
         job=job,